@@ -2,10 +2,10 @@ from typing import Dict
 
 from django.http import HttpRequest
 
-from .services import CartServices
+from .services import get_cart
 
 
 def cart_price(request: HttpRequest) -> Dict:
     "Взвращает данные для отбражения в бвзовом шаблоне"
 
-    return {"cart_data": CartServices(request)}
+    return {"cart_data": get_cart(request)}
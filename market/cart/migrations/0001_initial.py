@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("shops", "0001_initial"),
+        ("products", "0007_banner_weight"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartItem",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("cart_key", models.CharField(max_length=40, verbose_name="ключ корзины")),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10, verbose_name="цена")),
+                ("quantity", models.PositiveIntegerField(default=0, verbose_name="количество")),
+                (
+                    "offer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="cart_items", to="shops.offer"
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="cart_items", to="products.product"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Позиция корзины",
+                "verbose_name_plural": "Позиции корзины",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                models.F("cart_key"), models.F("product"), name="unique_product_in_cart"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class CartItem(models.Model):
+    """Позиция корзины при хранении корзины в базе данных"""
+
+    class Meta:
+        constraints = [models.UniqueConstraint("cart_key", "product", name="unique_product_in_cart")]
+        verbose_name = _("Позиция корзины")
+        verbose_name_plural = _("Позиции корзины")
+
+    cart_key = models.CharField(max_length=40, verbose_name=_("ключ корзины"))
+    product = models.ForeignKey("products.Product", on_delete=models.CASCADE, related_name="cart_items")
+    offer = models.ForeignKey("shops.Offer", on_delete=models.CASCADE, related_name="cart_items")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("цена"))
+    quantity = models.PositiveIntegerField(default=0, verbose_name=_("количество"))
+
+    def __str__(self) -> str:
+        return f"CartItem(cart_key={self.cart_key}, product={self.product_id}, quantity={self.quantity})"
@@ -1,30 +1,169 @@
+import copy
 from decimal import Decimal
+from typing import Dict, List
 
 from django.conf import settings
 from django.contrib.sessions.backends.base import SessionBase
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
 from django.http import HttpRequest
+from django.utils.module_loading import import_string
 
-from products.models import Product
+from products.models import Product, ProductImage
 from shops.models import Shop, Offer
-from discounts.discount import calculate_discount
+from discounts.services import calculate_discount
+from .models import CartItem
 import random
 
 
-class CartServices:
-    _instance = None
+class SessionCartBackend:
+    """Хранение корзины в сессии пользователя"""
+
+    def __init__(self, request: HttpRequest) -> None:
+        self.session: SessionBase = request.session
+
+    def load(self) -> Dict[str, dict]:
+        """Возвращает копию позиций корзины: product_id - quantity, price, offers"""
 
-    def __new__(cls, request: HttpRequest, *args, **kwargs):
-        """Создает корзину"""
+        return copy.deepcopy(self.session.get(settings.CART_SESSION_ID) or {})
 
-        cls.session: SessionBase = request.session
-        cart = cls.session.get(settings.CART_SESSION_ID)
+    def _get_cart(self) -> Dict[str, dict]:
+        cart = self.session.get(settings.CART_SESSION_ID)
         if not cart:
-            cart = cls.session[settings.CART_SESSION_ID] = {}
-        cls.cart = cart
-        if not CartServices._instance:
-            CartServices._instance = super(CartServices, cls).__new__(cls, *args, **kwargs)
+            cart = self.session[settings.CART_SESSION_ID] = {}
+        return cart
+
+    def _save(self) -> None:
+        self.session.modified = True
+
+    def set_quantity(self, product_id: str, offer: Offer, quantity: int) -> None:
+        """Устанавливает количество товара, новый товар добавляется по цене предложения"""
+
+        cart = self._get_cart()
+        cart.setdefault(product_id, {"quantity": 0, "price": str(offer.price), "offers": str(offer.id)})
+        cart[product_id]["quantity"] = quantity
+        self._save()
+
+    def increment(self, product_id: str, offer: Offer, quantity: int) -> None:
+        """Увеличивает количество товара, новый товар добавляется по цене предложения"""
+
+        cart = self._get_cart()
+        cart.setdefault(product_id, {"quantity": 0, "price": str(offer.price), "offers": str(offer.id)})
+        cart[product_id]["quantity"] += quantity
+        self._save()
+
+    def remove(self, product_id: str) -> None:
+        """Удаляет товар из корзины"""
+
+        cart = self._get_cart()
+        if product_id in cart:
+            del cart[product_id]
+            self._save()
+
+    def clear(self) -> None:
+        """Очищает корзину"""
+
+        self.session[settings.CART_SESSION_ID] = {}
+        self._save()
+
+
+class DatabaseCartBackend:
+    """
+    Хранение корзины в таблице CartItem по ключу сессии.
+    Увеличение количества выполняется одним UPDATE в базе, поэтому параллельные запросы не теряют изменения.
+    Сессия сохраняется только при добавлении первого товара, чтение пустой корзины не пишет в базу.
+    """
+
+    def __init__(self, request: HttpRequest) -> None:
+        self.session: SessionBase = request.session
+
+    @property
+    def cart_key(self) -> str:
+        """Ключ корзины - ключ сессии, None, если сессия ещё не сохранена"""
+
+        return self.session.session_key
+
+    def _create_cart_key(self) -> str:
+        """Сохраняет новую сессию при добавлении первого товара, чтобы получить ключ корзины"""
+
+        if self.session.session_key is None:
+            self.session.save()
+        return self.session.session_key
+
+    def load(self) -> Dict[str, dict]:
+        """Возвращает позиции корзины: product_id - quantity, price, offers"""
+
+        if self.cart_key is None:
+            return {}
+        items = CartItem.objects.filter(cart_key=self.cart_key).values_list(
+            "product_id", "offer_id", "price", "quantity"
+        )
+        return {
+            str(product_id): {"quantity": quantity, "price": str(price), "offers": str(offer_id)}
+            for product_id, offer_id, price, quantity in items
+        }
+
+    def _get_or_create(self, product_id: str, offer: Offer, quantity: int) -> bool:
+        _, created = CartItem.objects.get_or_create(
+            cart_key=self._create_cart_key(),
+            product_id=int(product_id),
+            defaults={"offer": offer, "price": offer.price, "quantity": quantity},
+        )
+        return created
 
-        return CartServices._instance
+    def set_quantity(self, product_id: str, offer: Offer, quantity: int) -> None:
+        """Устанавливает количество товара, новый товар добавляется по цене предложения"""
+
+        with transaction.atomic():
+            if not self._get_or_create(product_id, offer, quantity):
+                CartItem.objects.filter(cart_key=self.cart_key, product_id=int(product_id)).update(quantity=quantity)
+
+    def increment(self, product_id: str, offer: Offer, quantity: int) -> None:
+        """Атомарно увеличивает количество товара, новый товар добавляется по цене предложения"""
+
+        with transaction.atomic():
+            if not self._get_or_create(product_id, offer, quantity):
+                CartItem.objects.filter(cart_key=self.cart_key, product_id=int(product_id)).update(
+                    quantity=F("quantity") + quantity
+                )
+
+    def remove(self, product_id: str) -> None:
+        """Удаляет товар из корзины"""
+
+        CartItem.objects.filter(cart_key=self.cart_key, product_id=int(product_id)).delete()
+
+    def clear(self) -> None:
+        """Очищает корзину"""
+
+        CartItem.objects.filter(cart_key=self.cart_key).delete()
+
+
+def get_cart(request: HttpRequest) -> "CartServices":
+    """
+    Возвращает корзину текущего запроса, создавая её при первом обращении.
+    Корзина хранится на объекте запроса, поэтому не разделяется между потоками и запросами.
+    """
+
+    cart = getattr(request, "_cart", None)
+    if cart is None:
+        cart = request._cart = CartServices(request)
+    return cart
+
+
+class CartServices:
+    """
+    Корзина пользователя в пределах одного запроса
+
+    Args:
+        request (HttpRequest): запрос
+        backend: хранилище корзины, по умолчанию - класс из settings.CART_BACKEND
+    """
+
+    def __init__(self, request: HttpRequest, backend=None) -> None:
+        self.request = request
+        self.backend = backend or import_string(settings.CART_BACKEND)(request)
+        self.cart: Dict[str, dict] = self.backend.load()
+        self._items = None
 
     def add(self, product: Product, shop: None, quantity=1, update_quantity=False) -> None:
         """Добавление товара в корзину или обновление его количества."""
@@ -34,98 +173,115 @@ class CartServices:
             shop = random.choice(shops)
         product_id = str(product.id)
         offer = Offer.objects.get(product=product, shop__name=shop)
-        if product_id not in self.cart:
-            self.cart[product_id] = {"quantity": 0, "price": str(offer.price), "offers": str(offer.id)}
         if update_quantity:
-            self.cart[product_id]["quantity"] += quantity
+            self.backend.increment(product_id, offer, quantity)
         else:
-            self.cart[product_id]["quantity"] = quantity
-        self.save()
-
-    def save(self) -> None:
-        self.session[settings.CART_SESSION_ID] = self.cart
-        self.session.modified = True
+            self.backend.set_quantity(product_id, offer, quantity)
+        self.cart = self.backend.load()
+        self._items = None
 
     def remove(self, product: Product) -> None:
         """Удаление товара из корзины."""
 
         product_id = str(product.id)
         if product_id in self.cart:
+            self.backend.remove(product_id)
             del self.cart[product_id]
-            self.save()
+            self._items = None
 
-    def __iter__(self):
-        """Проходим по товарам корзины и получаем соответствующие объекты.
-        :return: dict
-        quantity: количество товра
-        price: цена за единицу товра
-        offers: id предлжения
+    def get_items(self) -> List[dict]:
+        """
+        Возвращает позиции корзины с товарами, предложениями, магазинами и первым изображением товара.
+        Позиции собираются одним запросом при первом обращении и переиспользуются до изменения корзины.
+        :return: список словарей
+        quantity: количество товара
+        price: цена за единицу товара
+        offers: id предложения
+        offer: предложение
         product: товар
-        price: общая цена за единицу товра
-        update_quantity_form: форма для обновления товара
+        shop: магазин
+        image: url первого изображения товара
+        total_price: общая цена позиции
         """
 
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        for product in products:
-            self.cart[str(product.id)]["product"] = product
+        if self._items is None:
+            first_image = ProductImage.objects.filter(product=OuterRef("product_id")).order_by("sort_image")
+            offers = (
+                Offer.objects.filter(id__in=[item["offers"] for item in self.cart.values()])
+                .select_related("product__category", "shop")
+                .annotate(image=Subquery(first_image.values("image")[:1]))
+            )
+            offers = {str(offer.product_id): offer for offer in offers}
+            self._items = []
+            for product_id, item in self.cart.items():
+                offer = offers.get(product_id)
+                if offer is None:
+                    continue
+                price = Decimal(item["price"])
+                self._items.append(
+                    {
+                        **item,
+                        "price": price,
+                        "offer": offer,
+                        "product": offer.product,
+                        "shop": offer.shop,
+                        "image": f"{settings.MEDIA_URL}{offer.image}" if offer.image else "",
+                        "total_price": price * item["quantity"],
+                    }
+                )
+        return self._items
+
+    def __iter__(self):
+        """Проходим по позициям корзины, см. get_items"""
 
-        for item in self.cart.values():
-            item["price"] = Decimal(item["price"])
-            item["total_price"] = item["price"] * item["quantity"]
-            yield item
+        return iter(self.get_items())
 
     def __len__(self) -> int:
         """Возвращает общее количество товаров в корзине."""
 
         return sum(item["quantity"] for item in self.cart.values())
 
-    @classmethod
-    def get_total_price(cls) -> Decimal:
+    def get_total_price(self) -> Decimal:
         """Возвращает общую стоимость товаров в корзине."""
 
-        total_price = sum(Decimal(item["price"]) * item["quantity"] for item in cls.cart.values())
+        total_price = sum(Decimal(item["price"]) * item["quantity"] for item in self.cart.values())
 
         return total_price
 
-    @classmethod
-    def get_total_price_with_discount(cls) -> Decimal:
+    def get_total_price_with_discount(self) -> Decimal:
         """Возвращает общую стоимость товаров в корзине c учетом скидки."""
 
-        total_price = calculate_discount()
+        total_price = calculate_discount(self)
 
         return total_price
 
-    @classmethod
-    def get_products_in_cart(cls) -> list:
+    def get_quantity(self, product: Product) -> int:
+        """Возвращает количество товара в корзине."""
+
+        return self.cart[str(product.pk)]["quantity"]
+
+    def get_products_in_cart(self) -> list:
         """Возвращает список экземпляров модели Product корзины."""
 
-        product_ids = cls.cart.keys()
-        products_in_cart = Product.objects.filter(id__in=product_ids)
-        return products_in_cart
+        return [item["product"] for item in self.get_items()]
 
-    @classmethod
-    def get_offers_in_cart(cls) -> list:
+    def get_offers_in_cart(self) -> list:
         """Возвращает список экземпляров модели Offer корзины."""
 
-        offer_ids = (item["offers"] for item in cls.cart.values())
-        offers_in_cart = Offer.objects.filter(id__in=offer_ids)
-        return offers_in_cart
+        return [item["offer"] for item in self.get_items()]
 
-    @classmethod
-    def get_shops_in_cart(cls) -> list:
+    def get_shops_in_cart(self) -> list:
         """Возвращает список магазинов корзины."""
 
-        offer_ids = (item["offers"] for item in cls.cart.values())
-        offers_in_cart = Offer.objects.filter(id__in=offer_ids)
         shops_in_cart = []
-        for item in offers_in_cart:
-            if item.shop not in shops_in_cart:
-                shops_in_cart.append(item.shop)
+        for item in self.get_items():
+            if item["shop"] not in shops_in_cart:
+                shops_in_cart.append(item["shop"])
         return shops_in_cart
 
     def clear(self) -> None:
         """Очистка корзины."""
 
+        self.backend.clear()
         self.cart = {}
-        self.save()
+        self._items = None
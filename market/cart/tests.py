@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory, TestCase, override_settings
+
+from cart.models import CartItem
+from cart.services import CartServices, get_cart
+from products.models import Product
+from shops.models import Offer
+
+
+class CartServicesTest(TestCase):
+    """Класс тестов корзины"""
+
+    fixtures = [
+        "fixtures/04-shops.json",
+        "fixtures/05-categories.json",
+        "fixtures/06-products.json",
+        "fixtures/08-offers.json",
+    ]
+
+    def make_request(self):
+        request = RequestFactory().get("/")
+        SessionMiddleware(lambda request: None).process_request(request)
+        return request
+
+    def setUp(self) -> None:
+        self.offer = Offer.objects.select_related("product", "shop").first()
+        self.product = self.offer.product
+
+    def test_carts_not_shared_between_requests(self):
+        """Проверка, что корзины разных запросов независимы"""
+
+        first, second = self.make_request(), self.make_request()
+        get_cart(first).add(self.product, self.offer.shop, quantity=2)
+        self.assertEqual(len(get_cart(first)), 2)
+        self.assertEqual(len(get_cart(second)), 0)
+        self.assertIs(get_cart(first), get_cart(first))
+
+    def test_add_and_total_price(self):
+        """Проверка добавления, увеличения количества и стоимости корзины"""
+
+        request = self.make_request()
+        cart = get_cart(request)
+        cart.add(self.product, self.offer.shop, quantity=1)
+        cart.add(self.product, self.offer.shop, quantity=2, update_quantity=True)
+        self.assertEqual(len(cart), 3)
+        self.assertEqual(cart.get_total_price(), self.offer.price * 3)
+        self.assertEqual(len(CartServices(request)), 3)
+
+        cart.remove(self.product)
+        self.assertEqual(len(CartServices(request)), 0)
+
+    @override_settings(CART_BACKEND="cart.services.DatabaseCartBackend")
+    def test_database_backend(self):
+        """Проверка хранения корзины в базе и атомарного увеличения количества"""
+
+        request = self.make_request()
+        first, second = CartServices(request), CartServices(request)
+        first.add(self.product, self.offer.shop, quantity=1, update_quantity=True)
+        second.add(self.product, self.offer.shop, quantity=2, update_quantity=True)
+
+        item = CartItem.objects.get(cart_key=request.session.session_key, product=self.product)
+        self.assertEqual(item.quantity, 3)
+        self.assertEqual(item.price, self.offer.price)
+        self.assertEqual(CartServices(request).get_total_price(), self.offer.price * 3)
+
+        second.clear()
+        self.assertFalse(CartItem.objects.exists())
+
+    @override_settings(CART_BACKEND="cart.services.DatabaseCartBackend")
+    def test_database_backend_session_created_on_first_item(self):
+        """Проверка, что чтение пустой корзины не сохраняет сессию, а первый товар создаёт её"""
+
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            cart = CartServices(request)
+            self.assertEqual(len(cart), 0)
+        self.assertIsNone(request.session.session_key)
+
+        cart.add(self.product, self.offer.shop, quantity=1)
+        self.assertIsNotNone(request.session.session_key)
+        self.assertEqual(len(CartServices(request)), 1)
+
+    def test_items_hydrated_once(self):
+        """Проверка, что позиции корзины собираются одним запросом и переиспользуются"""
+
+        request = self.make_request()
+        cart = get_cart(request)
+        for offer in Offer.objects.select_related("shop")[:3]:
+            cart.add(offer.product, offer.shop, quantity=1)
+        cart = CartServices(request)
+        with self.assertNumQueries(1):
+            items = list(cart)
+            list(cart)
+            cart.get_shops_in_cart()
+            cart.get_products_in_cart()
+        self.assertEqual(len(items), 3)
+        for item in items:
+            self.assertEqual(item["product"].pk, item["offer"].product_id)
+            self.assertEqual(item["total_price"], item["price"] * item["quantity"])
+
+    def test_total_price_with_discount(self):
+        """Проверка расчёта стоимости со скидками по переданной корзине"""
+
+        cart = get_cart(self.make_request())
+        product = Product.objects.get(pk=self.product.pk)
+        cart.add(product, self.offer.shop, quantity=1)
+        self.assertIsInstance(cart.get_total_price_with_discount(), Decimal)
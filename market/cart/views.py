@@ -3,7 +3,7 @@ from django.shortcuts import redirect, get_object_or_404
 from django.views.decorators.http import require_POST
 from django.views.generic import TemplateView
 from cart.forms import CartAddProductForm
-from cart.services import CartServices
+from cart.services import get_cart
 from products.models import Product
 
 
@@ -12,7 +12,7 @@ class CartDetail(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cart = CartServices(self.request)
+        cart = get_cart(self.request)
         context["cart"] = cart
         for item in cart:
             item["update_quantity_form"] = CartAddProductForm(initial={"quantity": item["quantity"], "update": False})
@@ -23,7 +23,7 @@ class CartDetail(TemplateView):
 def cart_add(request: HttpRequest, pk: int) -> HttpResponse:
     """Добавление товара в корзину"""
 
-    cart = CartServices(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=pk)
     form = CartAddProductForm(request.POST)
     if form.is_valid():
@@ -35,7 +35,7 @@ def cart_add(request: HttpRequest, pk: int) -> HttpResponse:
 def cart_remove(request: HttpRequest, pk: int) -> HttpResponse:
     """Удаление товара в корзины"""
 
-    cart = CartServices(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=pk)
     cart.remove(product)
     return redirect("cart:cart_detail")
@@ -13,7 +13,7 @@ import os
 from datetime import timedelta  # noqa
 from pathlib import Path
 
-from celery.schedules import crontab  # noqa
+from celery.schedules import crontab
 from dotenv import dotenv_values
 from django.utils.translation import gettext_lazy as _
 
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "django_jinja",
     "products",
     "shops",
@@ -74,6 +75,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.middleware.locale.LocaleMiddleware",
+    "settings.middleware.SingletonVersionMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -89,7 +91,9 @@ TEMPLATES = [
             "match_regex": None,
             "app_dirname": "templates",
             "constants": {},
-            "globals": {},
+            "globals": {
+                "get_price_quotes": "discounts.services.get_price_quotes",
+            },
             "context_processors": [
                 # "context_processors.categories_context.categories",
                 # "context_processors.cart_context.cart",
@@ -215,6 +219,20 @@ EMAIL_HOST_PASSWORD = config["EMAIL_HOST_PASSWORD"]
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 CART_SESSION_ID = "cart"
+CART_BACKEND = "cart.services.SessionCartBackend"
+
+ORDER_RESERVATION_TTL = timedelta(minutes=30)  # резерв товаров неоплаченного заказа
+
+PAYMENT_EVENTS_BACKEND = "payment.events.RedisPaymentEvents"
+# Long-poll статуса оплаты держит поток WSGI-воркера, поэтому ожидание короткое, а страница повторяет запрос
+PAYMENT_STATUS_TIMEOUT = 3
+
+# Лог строк импорта продуктов, пишется фоновым потоком пачками
+IMPORT_LOG_FILE = os.path.join(BASE_DIR, "logs", "import", "products-import.log")
+IMPORT_LOG_FORMAT = "text"  # "text" или "json" (JSON Lines)
+IMPORT_LOG_SAMPLE_RATE = 1  # в лог попадает каждая N-я успешная строка
+IMPORT_LOG_SAMPLE_LEVEL = "WARNING"  # строки с ошибками пишутся всегда
+IMPORT_LOG_FLUSH_EVERY = 500
 
 # CELERY
 CELERY_BROKER_URL = config["REDIS_URL"]
@@ -235,6 +253,16 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": timedelta(seconds=15),
         "args": (),
     },
+    "release_reservations": {
+        "task": "orders.tasks.release_reservations",
+        "schedule": crontab(minute="*/5"),
+        "args": (),
+    },
+    "refresh_effective_prices": {
+        "task": "discounts.tasks.refresh_effective_prices",
+        "schedule": crontab(minute="*/10"),
+        "args": (),
+    },
 }
 
 CACHE_TTL = 10
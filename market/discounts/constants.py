@@ -0,0 +1,4 @@
+KEY_FOR_CACHE_DISCOUNT_RULES = "discount_rules"
+KEY_FOR_CACHE_DISCOUNT_RULES_VERSION = "discount_rules_version"
+KEY_FOR_CACHE_PRICE_QUOTES = "price_quotes"
+KEY_FOR_CACHE_EFFECTIVE_PRICES_STATE = "effective_prices_state"
@@ -1,75 +1,177 @@
+import bisect
+import datetime
 from _decimal import Decimal
-from typing import Tuple
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from django.core.cache import cache
 from django.utils import timezone
 
+from discounts.constants import KEY_FOR_CACHE_DISCOUNT_RULES, KEY_FOR_CACHE_DISCOUNT_RULES_VERSION
 from discounts.models import DiscountCart, DiscountProduct, DiscountSet
-import cart.services
-from products.models import Product
-from shops.models import Offer
+from products.utils import get_cache_version
 
 
-def calculate_set(products: list) -> Tuple[Decimal, int]:
+class CartDiscountIndex:
+    """
+    Интервальный индекс диапазонов цен скидок на корзину.
+    Границы всех диапазонов сортируются, для каждой границы и для промежутка после неё заранее выбирается
+    скидка с наибольшим весом (при равном весе - созданная позже), поэтому поиск - один бинарный поиск.
+
+    Args:
+        bands (list): цена от, цена до, вес и процент скидок на корзину в порядке pk
+    """
+
+    def __init__(self, bands: List[Tuple[Decimal, Decimal, Decimal, int]]) -> None:
+        self.bounds = sorted({price for band in bands for price in band[:2]})
+        self.at_bound: List[Optional[tuple]] = [None] * len(self.bounds)
+        self.after_bound: List[Optional[tuple]] = [None] * len(self.bounds)
+
+        for order, (price_from, price_to, weight, percentage) in enumerate(bands):
+            if price_from > price_to:
+                continue
+            candidate = (weight, order, percentage)
+            first = bisect.bisect_left(self.bounds, price_from)
+            last = bisect.bisect_left(self.bounds, price_to)
+            for index in range(first, last + 1):
+                if self.at_bound[index] is None or candidate > self.at_bound[index]:
+                    self.at_bound[index] = candidate
+            for index in range(first, last):
+                if self.after_bound[index] is None or candidate > self.after_bound[index]:
+                    self.after_bound[index] = candidate
+
+    def find(self, price: Decimal) -> Tuple[Decimal, int]:
+        """
+        Возвращает вес и процент скидки на корзину для стоимости price
+        :param price: стоимость корзины
+        :return: вес и процент скидки, нули если скидка не найдена
+        """
+
+        index = bisect.bisect_left(self.bounds, price)
+        if index < len(self.bounds) and self.bounds[index] == price:
+            found = self.at_bound[index]
+        elif index > 0:
+            found = self.after_bound[index - 1]
+        else:
+            found = None
+        if found is None:
+            return 0, 0
+        weight, _, percentage = found
+        return weight, percentage
+
+
+class DiscountRules:
+    """
+    Скомпилированные правила скидок, активных в заданный день
+
+    Args:
+        product_discounts (dict): id товара - проценты скидок на товар
+        set_discounts (list): вес, процент и id категорий скидок на набор в порядке pk
+        cart_index (CartDiscountIndex): индекс диапазонов цен скидок на корзину
+    """
+
+    def __init__(
+        self,
+        product_discounts: Dict[int, List[int]],
+        set_discounts: List[Tuple[Decimal, int, frozenset]],
+        cart_index: CartDiscountIndex,
+    ) -> None:
+        self.product_discounts = product_discounts
+        self.set_discounts = set_discounts
+        self.cart_index = cart_index
+
+    @classmethod
+    def compile(cls, day: datetime.date) -> "DiscountRules":
+        """
+        Собирает правила скидок, активных в день day, четырьмя запросами
+        :param day: день действия скидок
+        :return: правила скидок
+        """
+
+        product_discounts = defaultdict(list)
+        product_rows = (
+            DiscountProduct.products.through.objects.filter(
+                discountproduct__start_date__lte=day, discountproduct__end_date__gte=day
+            )
+            .order_by("discountproduct_id")
+            .values_list("product_id", "discountproduct__percentage")
+        )
+        for product_id, percentage in product_rows:
+            product_discounts[product_id].append(percentage)
+
+        set_categories = defaultdict(set)
+        category_rows = DiscountSet.categories.through.objects.filter(
+            discountset__start_date__lte=day, discountset__end_date__gte=day
+        ).values_list("discountset_id", "category_id")
+        for set_id, category_id in category_rows:
+            set_categories[set_id].add(category_id)
+        set_discounts = [
+            (weight, percentage, frozenset(set_categories[set_id]))
+            for set_id, weight, percentage in DiscountSet.objects.filter(start_date__lte=day, end_date__gte=day)
+            .order_by("pk")
+            .values_list("pk", "weight", "percentage")
+        ]
+
+        cart_bands = list(
+            DiscountCart.objects.filter(start_date__lte=day, end_date__gte=day)
+            .order_by("pk")
+            .values_list("price_from", "price_to", "weight", "percentage")
+        )
+        return cls(dict(product_discounts), set_discounts, CartDiscountIndex(cart_bands))
+
+    def get_product_percentages(self, product_id: int) -> List[int]:
+        """Возвращает проценты скидок на товар"""
+
+        return self.product_discounts.get(product_id, [])
+
+    def get_set_discount(self, category_ids: Iterable[Optional[int]]) -> Tuple[Decimal, int]:
+        """
+        Возвращает вес и процент скидки на набор, в категории которой входят все товары корзины.
+        Из подходящих скидок, как и прежде, выбирается созданная последней. В отличие от прежнего цикла
+        по скидкам, который применял скидку на набор, если в её категории входил уже первый товар корзины,
+        скидка применяется только тогда, когда в её категории входят все товары.
+        :param category_ids: id категорий товаров корзины
+        :return: вес и процент скидки, нули если скидка не найдена
+        """
+
+        category_ids = set(category_ids)
+        result = (0, 0)
+        if not category_ids:
+            return result
+        for weight, percentage, categories in self.set_discounts:
+            if category_ids <= categories:
+                result = (weight, percentage)
+        return result
+
+    def get_cart_discount(self, price: Decimal) -> Tuple[Decimal, int]:
+        """
+        Возвращает вес и процент скидки на корзину, в диапазон цен которой попадает price.
+        Из пересекающихся диапазонов выбирается скидка с наибольшим весом.
+        :param price: стоимость корзины
+        :return: вес и процент скидки, нули если скидка не найдена
+        """
+
+        return self.cart_index.find(price)
+
+
+def get_discount_rules() -> DiscountRules:
+    """
+    Возвращает правила скидок на сегодня из кэша.
+    Ключ кэша содержит дату и версию, увеличиваемую при любом изменении скидок.
+    """
+
+    day = timezone.now().date()
+    key = f"{KEY_FOR_CACHE_DISCOUNT_RULES}:{day.isoformat()}:{get_cache_version(KEY_FOR_CACHE_DISCOUNT_RULES_VERSION)}"
+    return cache.get_or_set(key, lambda: DiscountRules.compile(day), 86400)
+
+
+def calculate_set(products: list, rules: DiscountRules) -> Tuple[Decimal, int]:
     """Возвращает вес скидки и скидку на набор товаров"""
 
-    discount_sets = DiscountSet.objects.filter(
-        start_date__lte=timezone.now().date(), end_date__gte=timezone.now().date()
-    )
-    flag = False
-    for set in discount_sets:
-        if set.is_active:
-            for product in products:
-                if product.category in set.categories.all():
-                    weigth_set = set.weight
-                    percentage_set = set.percentage
-                    flag = True
-                else:
-                    break
-    if not flag:
-        weigth_set = 0
-        percentage_set = 0
-    return weigth_set, percentage_set
-
-
-def calculate_cart(price: Decimal) -> Tuple[Decimal, int]:
+    return rules.get_set_discount(product.category_id for product in products)
+
+
+def calculate_cart(price: Decimal, rules: DiscountRules) -> Tuple[Decimal, int]:
     """Возвращает вес скидки и скидку на корзину"""
 
-    carts = DiscountCart.objects.filter(start_date__lte=timezone.now().date(), end_date__gte=timezone.now().date())
-    weigth_cart = 0
-    percentage_cart = 0
-    for cart_discount in carts:
-        if cart_discount.price_from <= price <= cart_discount.price_to and cart_discount.is_active:
-            weigth_cart = cart_discount.weight
-            percentage_cart = cart_discount.percentage
-    return weigth_cart, percentage_cart
-
-
-def calculate_products(price: Decimal, offer_product: Product, offer_price: Offer) -> Decimal:
-    """Возвращает общую стоимость корзины с учетом скидки на товар"""
-
-    discount_products = DiscountProduct.objects.filter(
-        start_date__lte=timezone.now().date(), end_date__gte=timezone.now().date()
-    )
-    for product in discount_products:
-        if offer_product in product.products.all():
-            carts = cart.services.CartServices.cart
-            quantity = carts[str(offer_product.pk)]["quantity"]
-            price = price - ((offer_price * quantity) * product.percentage / 100)
-    return price
-
-
-def calculate_discount() -> Decimal:
-    """Возвращает общую корзину с учетом всех скидок"""
-    total_price = cart.services.CartServices.get_total_price()
-    products = cart.services.CartServices.get_products_in_cart()
-    offers = cart.services.CartServices.get_offers_in_cart()
-    for offer in offers:
-        total_price = calculate_products(total_price, offer.product, offer.price)
-    weigth_cart, percentage_cart = calculate_cart(total_price)
-    weigth_set, percentage_set = calculate_set(products)
-
-    if weigth_set > weigth_cart:
-        total_price = total_price - (total_price * percentage_set / 100)
-    else:
-        total_price = total_price - (total_price * percentage_cart / 100)
-    return total_price
+    return rules.get_cart_discount(price)
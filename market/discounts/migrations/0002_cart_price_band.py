@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+
+def create_price_band_index(apps, schema_editor):
+    """Создание GiST-индекса по диапазонам цены и периода скидок на корзину, только для PostgreSQL"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS discount_cart_price_band_gist_idx ON discounts_discountcart "
+        "USING gist (numrange(price_from, price_to, '[]'), daterange(start_date, end_date, '[]'))"
+    )
+
+
+def drop_price_band_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS discount_cart_price_band_gist_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("discounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="discountcart",
+            constraint=models.CheckConstraint(
+                check=models.Q(("price_from__lte", models.F("price_to"))), name="discount_cart_price_band_valid"
+            ),
+        ),
+        migrations.RunPython(create_price_band_index, drop_price_band_index),
+    ]
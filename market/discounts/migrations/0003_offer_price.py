@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_summary_discounted_price"),
+        ("shops", "0001_initial"),
+        ("discounts", "0002_cart_price_band"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OfferPrice",
+            fields=[
+                (
+                    "offer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="effective",
+                        serialize=False,
+                        to="shops.offer",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="день расчёта")),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10, verbose_name="цена")),
+                (
+                    "effective_price",
+                    models.DecimalField(decimal_places=2, max_digits=10, verbose_name="цена со скидкой"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="offer_prices", to="products.product"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Цена предложения со скидкой",
+                "verbose_name_plural": "Цены предложений со скидкой",
+                "indexes": [models.Index(fields=["product", "effective_price"], name="offer_price_product_idx")],
+            },
+        ),
+    ]
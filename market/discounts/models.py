@@ -1,12 +1,37 @@
+from django.contrib.postgres.fields import DateRangeField, DecimalRangeField
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 
-from django.db import models
+from django.db import connection, models
+from django.db.models import F, Func, Q, QuerySet, Value, signals
+from django.db.backends.postgresql.psycopg_any import DateRange, NumericRange
 from django.utils.translation import gettext_lazy as _
+from discounts.constants import KEY_FOR_CACHE_DISCOUNT_RULES_VERSION
 from products.models import Product, Category
+from products.utils import bump_cache_version
 
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+def bump_discount_rules_version(**kwargs) -> None:
+    """Сброс кэша скомпилированных правил скидок"""
+    bump_cache_version(KEY_FOR_CACHE_DISCOUNT_RULES_VERSION)
+
+
+def refresh_offer_price(instance, **kwargs) -> None:
+    """Пересчёт цены со скидкой для сохранённого предложения"""
+    from discounts.services import EffectivePriceService
+
+    EffectivePriceService().refresh_offers([instance.pk])
+
+
+def remove_offer_price(instance, **kwargs) -> None:
+    """Удаление цены со скидкой удалённого предложения и пересчёт цены со скидкой в сводке товара"""
+    from discounts.services import EffectivePriceService
+
+    EffectivePriceService().remove_offer(instance.pk, instance.product_id)
+
+
 class DiscountBase(models.Model):
     """Базовая модель скидок"""
 
@@ -52,6 +77,33 @@ class DiscountSet(DiscountBase):
         verbose_name_plural = _("Скидки на наборов")
 
 
+class DiscountCartQuerySet(QuerySet):
+    """Выборка скидок на корзину"""
+
+    def overlapping(self, price_from, price_to, start_date, end_date) -> "DiscountCartQuerySet":
+        """
+        Возвращает скидки, диапазон цен и период действия которых пересекаются с заданными.
+        На PostgreSQL условие строится на диапазонах numrange и daterange и использует GiST-индекс.
+        """
+
+        if connection.vendor == "postgresql":
+            return self.annotate(
+                price_band=Func(
+                    F("price_from"), F("price_to"), Value("[]"), function="numrange", output_field=DecimalRangeField()
+                ),
+                period=Func(
+                    F("start_date"), F("end_date"), Value("[]"), function="daterange", output_field=DateRangeField()
+                ),
+            ).filter(
+                price_band__overlap=NumericRange(price_from, price_to, "[]"),
+                period__overlap=DateRange(start_date, end_date, "[]"),
+            )
+        return self.filter(
+            Q(price_from__lte=price_to, price_to__gte=price_from)
+            & Q(start_date__lte=end_date, end_date__gte=start_date)
+        )
+
+
 class DiscountCart(DiscountBase):
     """Скидка на корзину"""
 
@@ -64,6 +116,63 @@ class DiscountCart(DiscountBase):
     price_from = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("диапазон цены от"))
     price_to = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("диапазон цены до"))
 
+    objects = DiscountCartQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Скидка для корзины")
         verbose_name_plural = _("Скидки для корзины")
+        constraints = [
+            models.CheckConstraint(check=Q(price_from__lte=F("price_to")), name="discount_cart_price_band_valid")
+        ]
+
+    def clean(self) -> None:
+        """
+        Проверяет диапазон цен. Пересекающиеся скидки разрешаются по весу,
+        поэтому запрещено только пересечение со скидкой того же веса в тот же период.
+        """
+
+        super().clean()
+        if None in (self.price_from, self.price_to, self.start_date, self.end_date, self.weight):
+            return
+        if self.price_from > self.price_to:
+            raise ValidationError({"price_to": _("Верхняя граница диапазона цены меньше нижней")})
+        conflicts = (
+            DiscountCart.objects.overlapping(self.price_from, self.price_to, self.start_date, self.end_date)
+            .filter(weight=self.weight)
+            .exclude(pk=self.pk)
+        )
+        conflict = conflicts.first()
+        if conflict is not None:
+            raise ValidationError(
+                _("Диапазон цены пересекается со скидкой «%(name)s» с тем же весом") % {"name": conflict.name}
+            )
+
+
+class OfferPrice(models.Model):
+    """
+    Цена предложения с учётом скидок на товар, действующих в день day.
+    Таблица заполняется задачей discounts.tasks.refresh_effective_prices при начале и окончании скидок.
+    """
+
+    class Meta:
+        verbose_name = _("Цена предложения со скидкой")
+        verbose_name_plural = _("Цены предложений со скидкой")
+        indexes = [models.Index(fields=["product", "effective_price"], name="offer_price_product_idx")]
+
+    offer = models.OneToOneField("shops.Offer", on_delete=models.CASCADE, primary_key=True, related_name="effective")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="offer_prices")
+    day = models.DateField(verbose_name=_("день расчёта"))
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("цена"))
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("цена со скидкой"))
+
+    def __str__(self) -> str:
+        return f"OfferPrice(offer={self.offer_id}, effective_price={self.effective_price})"
+
+
+for model in (DiscountProduct, DiscountSet, DiscountCart):
+    signals.post_save.connect(receiver=bump_discount_rules_version, sender=model)
+    signals.post_delete.connect(receiver=bump_discount_rules_version, sender=model)
+signals.m2m_changed.connect(receiver=bump_discount_rules_version, sender=DiscountProduct.products.through)
+signals.m2m_changed.connect(receiver=bump_discount_rules_version, sender=DiscountSet.categories.through)
+signals.post_save.connect(receiver=refresh_offer_price, sender="shops.Offer")
+signals.post_delete.connect(receiver=remove_offer_price, sender="shops.Offer")
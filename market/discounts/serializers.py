@@ -0,0 +1,27 @@
+from rest_framework import serializers
+
+
+class PriceQuoteItemSerializer(serializers.Serializer):
+    """Позиция запроса расчёта цен"""
+
+    product = serializers.IntegerField(min_value=1)
+    offer = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class PriceQuoteRequestSerializer(serializers.Serializer):
+    """Запрос расчёта цен со скидками"""
+
+    items = PriceQuoteItemSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class PriceQuoteSerializer(serializers.Serializer):
+    """Цена позиции со скидкой на товар"""
+
+    product = serializers.IntegerField(source="product_id")
+    offer = serializers.IntegerField(source="offer_id")
+    quantity = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    unit_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    line_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2)
@@ -0,0 +1,253 @@
+import hashlib
+import itertools
+from _decimal import Decimal
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min, OuterRef, Subquery
+from django.utils import timezone
+
+from discounts.constants import (
+    KEY_FOR_CACHE_DISCOUNT_RULES_VERSION,
+    KEY_FOR_CACHE_EFFECTIVE_PRICES_STATE,
+    KEY_FOR_CACHE_PRICE_QUOTES,
+)
+from discounts.discount import DiscountRules, get_discount_rules
+from discounts.models import OfferPrice
+from products.models import ProductSummary
+from products.utils import bump_products_cache_version, get_cache_version, get_products_cache_version
+from shops.models import Offer
+
+PriceLine = namedtuple("PriceLine", ("product_id", "offer_id", "category_id", "price", "quantity"))
+PriceQuote = namedtuple(
+    "PriceQuote", ("product_id", "offer_id", "quantity", "price", "unit_price", "line_price", "line_total")
+)
+
+
+class PriceQuoteService:
+    """
+    Сервис расчёта цен со скидками для набора позиций (товар, предложение, количество).
+    Правила скидок берутся из скомпилированного индекса, цены предложений - одним запросом на весь набор.
+
+    Args:
+        rules (DiscountRules): правила скидок, по умолчанию - правила на сегодня из кэша
+    """
+
+    def __init__(self, rules: Optional[DiscountRules] = None) -> None:
+        self.rules = rules or get_discount_rules()
+
+    @staticmethod
+    def get_lines(items: Iterable[Tuple[int, Optional[int], int]]) -> List[PriceLine]:
+        """
+        Находит предложения для позиций одним запросом.
+        Если предложение не указано, берётся самое дешёвое предложение товара.
+        :param items: позиции (id товара, id предложения или None, количество)
+        :return: позиции с ценой и категорией товара, позиции без предложения пропускаются
+        """
+
+        items = list(items)
+        product_ids = {product_id for product_id, _, _ in items}
+        offers = (
+            Offer.objects.filter(product_id__in=product_ids)
+            .order_by("product_id", "price", "pk")
+            .values_list("pk", "product_id", "product__category_id", "price")
+        )
+        by_pk, cheapest = {}, {}
+        for offer in offers:
+            by_pk[offer[0]] = offer
+            cheapest.setdefault(offer[1], offer)
+
+        lines = []
+        for product_id, offer_id, quantity in items:
+            offer = by_pk.get(offer_id) if offer_id else cheapest.get(product_id)
+            if offer is None or offer[1] != product_id:
+                continue
+            lines.append(PriceLine(product_id, offer[0], offer[2], offer[3], quantity))
+        return lines
+
+    def price_lines(self, lines: Iterable[PriceLine]) -> Tuple[List[PriceQuote], Decimal]:
+        """
+        Считает цены со скидками на товар для каждой позиции и итог со скидкой на набор или корзину
+        :param lines: позиции с ценой предложения
+        :return: цены позиций и итоговая стоимость
+        """
+
+        quotes = []
+        total_price = Decimal(0)
+        category_ids = []
+        for line in lines:
+            line_price = line.price * line.quantity
+            line_total = line_price
+            for percentage in self.rules.get_product_percentages(line.product_id):
+                line_total = line_total - line_price * percentage / 100
+            unit_price = line_total / line.quantity if line.quantity else line.price
+            quotes.append(
+                PriceQuote(
+                    line.product_id, line.offer_id, line.quantity, line.price, unit_price, line_price, line_total
+                )
+            )
+            total_price += line_total
+            category_ids.append(line.category_id)
+
+        weigth_cart, percentage_cart = self.rules.get_cart_discount(total_price)
+        weigth_set, percentage_set = self.rules.get_set_discount(category_ids)
+        if weigth_set > weigth_cart:
+            total_price = total_price - (total_price * percentage_set / 100)
+        else:
+            total_price = total_price - (total_price * percentage_cart / 100)
+        return quotes, total_price
+
+    def quote(self, items: Iterable[Tuple[int, Optional[int], int]]) -> Tuple[List[PriceQuote], Decimal]:
+        """
+        Считает цены со скидками для позиций
+        :param items: позиции (id товара, id предложения или None, количество)
+        :return: цены позиций и итоговая стоимость
+        """
+
+        return self.price_lines(self.get_lines(items))
+
+
+def calculate_discount(cart, rules: Optional[DiscountRules] = None) -> Decimal:
+    """
+    Возвращает общую корзину с учетом всех скидок
+    :param cart: корзина текущего запроса (cart.services.CartServices)
+    :param rules: правила скидок, по умолчанию - правила на сегодня из кэша
+    """
+    lines = [
+        PriceLine(offer.product.pk, offer.pk, offer.product.category_id, offer.price, cart.get_quantity(offer.product))
+        for offer in cart.get_offers_in_cart()
+    ]
+    _, total_price = PriceQuoteService(rules).price_lines(lines)
+    return total_price
+
+
+def get_price_quotes(products: Iterable) -> Dict[int, PriceQuote]:
+    """
+    Jinja2-функция: цены со скидкой на товар за единицу по самому дешёвому предложению для страницы товаров.
+    Результат кэшируется до изменения цен, скидок или наступления следующего дня.
+    :param products: товары или строки каталога с атрибутом pk
+    :return: словарь id товара - цена
+    """
+
+    product_ids = sorted({product.pk for product in products})
+    if not product_ids:
+        return {}
+    key = "{}:{}:{}:{}:{}".format(
+        KEY_FOR_CACHE_PRICE_QUOTES,
+        timezone.now().date().isoformat(),
+        get_products_cache_version(),
+        get_cache_version(KEY_FOR_CACHE_DISCOUNT_RULES_VERSION),
+        hashlib.md5(",".join(map(str, product_ids)).encode("utf-8")).hexdigest(),
+    )
+
+    def quote() -> Dict[int, PriceQuote]:
+        quotes, _ = PriceQuoteService().quote((product_id, None, 1) for product_id in product_ids)
+        return {quote.product_id: quote for quote in quotes}
+
+    return cache.get_or_set(key, quote, 86400)
+
+
+class EffectivePriceService:
+    """
+    Сервис таблицы цен предложений со скидками на товар (OfferPrice) и минимальной цены со скидкой
+    в сводке каталога (ProductSummary.discounted_price), по которой каталог сортирует и фильтрует товары.
+    """
+
+    batch_size = 1000
+
+    @staticmethod
+    def get_state() -> str:
+        """Возвращает состояние, при смене которого таблицу нужно пересчитать: день и версия правил скидок"""
+
+        return f"{timezone.now().date().isoformat()}:{get_cache_version(KEY_FOR_CACHE_DISCOUNT_RULES_VERSION)}"
+
+    @staticmethod
+    def get_effective_price(rules: DiscountRules, product_id: int, price: Decimal) -> Decimal:
+        """Возвращает цену предложения со скидками на товар"""
+
+        effective_price = price
+        for percentage in rules.get_product_percentages(product_id):
+            effective_price = effective_price - price * percentage / 100
+        return max(effective_price, Decimal(0)).quantize(Decimal("0.01"))
+
+    def save_prices(self, rows: Iterable[Tuple[int, int, Decimal]], rules: DiscountRules) -> Set[int]:
+        """
+        Сохраняет цены со скидкой для предложений
+        :param rows: id предложения, id товара и цена
+        :param rules: правила скидок
+        :return: id товаров, цены которых пересчитаны
+        """
+
+        day = timezone.now().date()
+        prices = [
+            OfferPrice(
+                offer_id=offer_id,
+                product_id=product_id,
+                day=day,
+                price=price,
+                effective_price=self.get_effective_price(rules, product_id, price),
+            )
+            for offer_id, product_id, price in rows
+        ]
+        OfferPrice.objects.bulk_create(
+            prices,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=["offer"],
+            update_fields=["product", "day", "price", "effective_price"],
+        )
+        return {price.product_id for price in prices}
+
+    @staticmethod
+    def update_summary(product_ids: Optional[Set[int]] = None) -> None:
+        """Обновляет минимальную цену со скидкой в сводке каталога"""
+
+        min_price = (
+            OfferPrice.objects.filter(product=OuterRef("product"))
+            .values("product")
+            .annotate(min_price=Min("effective_price"))
+            .values("min_price")
+        )
+        summaries = ProductSummary.objects.all()
+        if product_ids is not None:
+            summaries = summaries.filter(product_id__in=product_ids)
+        summaries.update(discounted_price=Subquery(min_price))
+
+    def refresh_offers(self, offer_ids: List[int]) -> None:
+        """Пересчитывает цены со скидкой для отдельных предложений, например после изменения цены"""
+
+        rows = Offer.objects.filter(pk__in=offer_ids).values_list("pk", "product_id", "price")
+        with transaction.atomic():
+            product_ids = self.save_prices(rows, get_discount_rules())
+            self.update_summary(product_ids)
+
+    def remove_offer(self, offer_id: int, product_id: int) -> None:
+        """Удаляет цену со скидкой удалённого предложения и пересчитывает сводку его товара"""
+
+        with transaction.atomic():
+            OfferPrice.objects.filter(offer_id=offer_id).delete()
+            self.update_summary({product_id})
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Пересчитывает цены со скидкой для всех предложений, если с прошлого расчёта сменился день
+        (началась или закончилась скидка) или изменились скидки
+        :param force: пересчитать независимо от состояния
+        :return: был ли выполнен пересчёт
+        """
+
+        state = self.get_state()
+        if not force and cache.get(KEY_FOR_CACHE_EFFECTIVE_PRICES_STATE) == state:
+            return False
+
+        rules = DiscountRules.compile(timezone.now().date())
+        rows = Offer.objects.order_by("pk").values_list("pk", "product_id", "price").iterator(self.batch_size)
+        with transaction.atomic():
+            while chunk := list(itertools.islice(rows, self.batch_size)):
+                self.save_prices(chunk, rules)
+            self.update_summary()
+        cache.set(KEY_FOR_CACHE_EFFECTIVE_PRICES_STATE, state, timeout=None)
+        bump_products_cache_version()
+        return True
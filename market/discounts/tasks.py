@@ -0,0 +1,10 @@
+from celery import shared_task
+
+from discounts.services import EffectivePriceService
+
+
+@shared_task
+def refresh_effective_prices(force: bool = False) -> bool:
+    """Задача пересчёта цен предложений со скидкой при начале и окончании скидок или их изменении"""
+
+    return EffectivePriceService().refresh(force)
@@ -0,0 +1,272 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from discounts.discount import CartDiscountIndex, DiscountRules, get_discount_rules
+from discounts.models import OfferPrice
+from discounts.services import EffectivePriceService, calculate_discount
+from discounts.tasks import refresh_effective_prices
+from discounts.models import DiscountCart, DiscountProduct, DiscountSet
+from products.models import Category, Product
+from shops.models import Offer, Shop
+
+
+class CartStub:
+    """Корзина с заданными позициями: товар, цена, количество"""
+
+    def __init__(self, items):
+        self.items = items
+
+    def get_total_price(self):
+        return sum(price * quantity for _, price, quantity in self.items)
+
+    def get_products_in_cart(self):
+        return [product for product, _, _ in self.items]
+
+    def get_offers_in_cart(self):
+        return [
+            type("OfferStub", (), {"pk": product.pk, "product": product, "price": price})
+            for product, price, _ in self.items
+        ]
+
+    def get_quantity(self, product):
+        return next(quantity for item, _, quantity in self.items if item == product)
+
+
+def get_legacy_set_discount(products: list) -> tuple:
+    """Прежний выбор скидки на набор: скидка подходила, если в её категории входил первый товар корзины"""
+
+    today = timezone.now().date()
+    result = (0, 0)
+    for discount_set in DiscountSet.objects.filter(start_date__lte=today, end_date__gte=today).order_by("pk"):
+        categories = set(discount_set.categories.all())
+        for product in products:
+            if product.category not in categories:
+                break
+            result = (discount_set.weight, discount_set.percentage)
+    return result
+
+
+class DiscountTestCase(TestCase):
+    """Базовый класс тестов скидок: товары, предложения и скидки, действующие сегодня"""
+
+    def setUp(self):
+        cache.clear()
+        today = timezone.now().date()
+        self.period = {"start_date": today - timedelta(days=1), "end_date": today + timedelta(days=1)}
+        self.category = Category.objects.create(name="Category")
+        self.other_category = Category.objects.create(name="Other category")
+        self.product = Product.objects.create(name="Product", category=self.category)
+        self.other_product = Product.objects.create(name="Other product", category=self.other_category)
+
+        discount_product = DiscountProduct.objects.create(name="product", percentage=10, **self.period)
+        discount_product.products.add(self.product)
+        expired = DiscountProduct.objects.create(
+            name="expired", percentage=50, start_date=self.period["start_date"], end_date=self.period["start_date"]
+        )
+        expired.products.add(self.product)
+        discount_set = DiscountSet.objects.create(name="set", percentage=5, weight=Decimal("0.50"), **self.period)
+        discount_set.categories.add(self.category)
+        DiscountCart.objects.create(
+            name="cart",
+            percentage=20,
+            weight=Decimal("0.30"),
+            price_from=Decimal("100"),
+            price_to=Decimal("1000"),
+            **self.period,
+        )
+        shop = Shop.objects.create(name="Shop", description="", phone="", address="", email="shop@example.com")
+        other_shop = Shop.objects.create(
+            name="Other shop", description="", phone="", address="", email="other@example.com"
+        )
+        self.offer = Offer.objects.create(shop=shop, product=self.product, price=Decimal("100"))
+        Offer.objects.create(shop=other_shop, product=self.product, price=Decimal("120"))
+        self.other_offer = Offer.objects.create(shop=shop, product=self.other_product, price=Decimal("50"))
+
+
+class DiscountRulesTest(DiscountTestCase):
+    """Класс тестов скомпилированных правил скидок"""
+
+    def test_compile(self):
+        rules = DiscountRules.compile(timezone.now().date())
+        self.assertEqual(rules.get_product_percentages(self.product.pk), [10])
+        self.assertEqual(rules.get_product_percentages(self.other_product.pk), [])
+        self.assertEqual(rules.get_set_discount([self.category.pk]), (Decimal("0.50"), 5))
+        self.assertEqual(rules.get_set_discount([self.category.pk, self.other_category.pk]), (0, 0))
+        self.assertEqual(rules.get_cart_discount(Decimal("500")), (Decimal("0.30"), 20))
+        self.assertEqual(rules.get_cart_discount(Decimal("50")), (0, 0))
+
+    def test_set_discount_compared_with_legacy(self):
+        """
+        Проверка выбора скидки на набор при пересекающихся наборах: результат совпадает с прежним,
+        кроме корзины, в категории скидки которой входит только первый товар
+        """
+
+        wide = DiscountSet.objects.create(name="wide", percentage=7, weight=Decimal("0.60"), **self.period)
+        wide.categories.add(self.category, self.other_category)
+        narrow = DiscountSet.objects.create(name="narrow", percentage=3, weight=Decimal("0.40"), **self.period)
+        narrow.categories.add(self.category)
+        rules = DiscountRules.compile(timezone.now().date())
+
+        def get_set_discount(products: list) -> tuple:
+            return rules.get_set_discount(product.category_id for product in products)
+
+        for products in ([self.product], [self.other_product], [self.other_product, self.product], []):
+            with self.subTest(products=products):
+                self.assertEqual(get_set_discount(products), get_legacy_set_discount(products))
+
+        products = [self.product, self.other_product]
+        self.assertEqual(get_legacy_set_discount(products), (Decimal("0.40"), 3))
+        self.assertEqual(get_set_discount(products), (Decimal("0.60"), 7))
+
+    def test_calculate_discount_without_queries(self):
+        cart = CartStub([(self.product, Decimal("100"), 2), (self.other_product, Decimal("50"), 1)])
+        get_discount_rules()
+        with self.assertNumQueries(0):
+            total_price = calculate_discount(cart)
+        # 250 - 10% от 200 = 230, скидка на корзину 20%
+        self.assertEqual(total_price, Decimal("184"))
+
+    def test_rules_invalidated_on_change(self):
+        get_discount_rules()
+        DiscountProduct.objects.create(name="new", percentage=15, **self.period).products.add(self.other_product)
+        self.assertEqual(get_discount_rules().get_product_percentages(self.other_product.pk), [15])
+
+
+class CartDiscountIndexTest(TestCase):
+    """Класс тестов интервального индекса скидок на корзину"""
+
+    def test_find(self):
+        index = CartDiscountIndex(
+            [
+                (Decimal("100"), Decimal("500"), Decimal("0.10"), 5),
+                (Decimal("300"), Decimal("1000"), Decimal("0.50"), 15),
+                (Decimal("400"), Decimal("450"), Decimal("0.20"), 7),
+                (Decimal("2000"), Decimal("3000"), Decimal("0.10"), 25),
+            ]
+        )
+        cases = {
+            "50": (0, 0),
+            "100": (Decimal("0.10"), 5),
+            "299.99": (Decimal("0.10"), 5),
+            "300": (Decimal("0.50"), 15),
+            "420": (Decimal("0.50"), 15),
+            "1000": (Decimal("0.50"), 15),
+            "1500": (0, 0),
+            "3000": (Decimal("0.10"), 25),
+            "3000.01": (0, 0),
+        }
+        for price, expected in cases.items():
+            with self.subTest(price=price):
+                self.assertEqual(index.find(Decimal(price)), expected)
+
+    def test_equal_weight_resolved_by_latest(self):
+        index = CartDiscountIndex(
+            [
+                (Decimal("100"), Decimal("500"), Decimal("0.10"), 5),
+                (Decimal("200"), Decimal("300"), Decimal("0.10"), 9),
+            ]
+        )
+        self.assertEqual(index.find(Decimal("250")), (Decimal("0.10"), 9))
+        self.assertEqual(index.find(Decimal("400")), (Decimal("0.10"), 5))
+
+
+class DiscountCartValidationTest(TestCase):
+    """Класс тестов проверки пересечения диапазонов скидок на корзину"""
+
+    def setUp(self):
+        today = timezone.now().date()
+        self.period = {"start_date": today, "end_date": today + timedelta(days=7)}
+        DiscountCart.objects.create(
+            name="first", percentage=5, weight=Decimal("0.10"), price_from=100, price_to=500, **self.period
+        )
+
+    def make_discount(self, weight, price_from, price_to):
+        return DiscountCart(
+            name="second", percentage=10, weight=weight, price_from=price_from, price_to=price_to, **self.period
+        )
+
+    def test_overlap_with_same_weight(self):
+        with self.assertRaises(ValidationError):
+            self.make_discount(Decimal("0.10"), 400, 800).full_clean()
+
+    def test_overlap_with_other_weight(self):
+        self.make_discount(Decimal("0.20"), 400, 800).full_clean()
+        self.make_discount(Decimal("0.10"), 501, 800).full_clean()
+
+    def test_invalid_band(self):
+        with self.assertRaises(ValidationError):
+            self.make_discount(Decimal("0.20"), 800, 400).full_clean()
+
+
+class PriceQuoteAPITest(DiscountTestCase):
+    """Класс тестов API расчёта цен со скидками"""
+
+    def test_quote(self):
+        items = [
+            {"product": self.product.pk, "quantity": 2},
+            {"product": self.other_product.pk, "offer": self.other_offer.pk},
+        ]
+        get_discount_rules()
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse("discounts:price-quotes"), {"items": items}, "application/json")
+        self.assertEqual(response.status_code, 200)
+        first, second = response.json()["items"]
+        self.assertEqual(first["offer"], self.offer.pk)
+        self.assertEqual((first["unit_price"], first["line_total"]), ("90.00", "180.00"))
+        self.assertEqual((second["unit_price"], second["line_total"]), ("50.00", "50.00"))
+        self.assertEqual(response.json()["total_price"], "184.00")
+
+    def test_quote_invalid(self):
+        response = self.client.post(reverse("discounts:price-quotes"), {"items": []}, "application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_catalog_shows_discounted_price(self):
+        response = self.client.get(reverse("products:product-list"))
+        self.assertContains(response, '<span class="Card-priceOld">100.00</span>')
+
+
+class EffectivePriceTest(DiscountTestCase):
+    """Класс тестов таблицы цен предложений со скидкой"""
+
+    def test_refresh(self):
+        self.assertTrue(refresh_effective_prices(force=True))
+        self.assertFalse(refresh_effective_prices())
+        self.assertEqual(OfferPrice.objects.get(offer=self.offer).effective_price, Decimal("90.00"))
+        self.assertEqual(OfferPrice.objects.get(offer=self.other_offer).effective_price, Decimal("50.00"))
+        self.product.summary.refresh_from_db()
+        self.assertEqual(self.product.summary.discounted_price, Decimal("90.00"))
+
+        DiscountProduct.objects.create(name="new", percentage=20, **self.period).products.add(self.other_product)
+        self.assertTrue(EffectivePriceService().refresh())
+        self.assertEqual(OfferPrice.objects.get(offer=self.other_offer).effective_price, Decimal("40.00"))
+
+    def test_offer_price_updated_on_save(self):
+        self.offer.price = Decimal("200")
+        self.offer.save()
+        self.assertEqual(OfferPrice.objects.get(offer=self.offer).effective_price, Decimal("180.00"))
+
+    def test_offer_price_removed_on_delete(self):
+        refresh_effective_prices(force=True)
+        offer_id = self.offer.pk
+        self.offer.delete()
+        self.assertFalse(OfferPrice.objects.filter(offer_id=offer_id).exists())
+        self.product.summary.refresh_from_db()
+        self.assertEqual(self.product.summary.discounted_price, Decimal("108.00"))
+
+    def test_catalog_sorted_by_discounted_price(self):
+        refresh_effective_prices(force=True)
+        url = reverse("products:product-list") + "?o=discounted_price&discounted_price__lte=100"
+        response = self.client.get(url)
+        self.assertEqual(
+            [product.pk for product in response.context_data["object_list"]][:2],
+            [
+                self.other_product.pk,
+                self.product.pk,
+            ],
+        )
@@ -1,5 +1,11 @@
 from django.urls import path
-from .views import DiscountListView, DiscountProductDetailView, DiscountSetDetailView, DiscountCartDetailView
+from .views import (
+    DiscountListView,
+    DiscountProductDetailView,
+    DiscountSetDetailView,
+    DiscountCartDetailView,
+    PriceQuoteAPIView,
+)
 
 app_name = "discounts"
 
@@ -9,4 +15,5 @@ urlpatterns = [
     path("product/<int:pk>/", DiscountProductDetailView.as_view(), name="discount-product"),
     path("set/<int:pk>/", DiscountSetDetailView.as_view(), name="discount-set"),
     path("cart/<int:pk>/", DiscountCartDetailView.as_view(), name="discount-cart"),
+    path("api/quotes/", PriceQuoteAPIView.as_view(), name="price-quotes"),
 ]
@@ -1,8 +1,15 @@
+from decimal import Decimal
+
 from django.views.generic import ListView, DetailView
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from django.conf import settings
 
 from discounts.models import DiscountProduct, DiscountSet, DiscountCart
+from discounts.serializers import PriceQuoteRequestSerializer, PriceQuoteSerializer
+from discounts.services import PriceQuoteService
 
 
 class DiscountListView(ListView):
@@ -44,3 +51,19 @@ class DiscountSetDetailView(DetailView):
     template_name = "discounts/discount-sets.jinja2"
     model = DiscountSet
     context_object_name = "discount_set"
+
+
+class PriceQuoteAPIView(APIView):
+    """API расчёта цен со скидками для набора позиций (товар, предложение, количество)"""
+
+    def post(self, request: Request) -> Response:
+        serializer = PriceQuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = ((item["product"], item.get("offer"), item["quantity"]) for item in serializer.validated_data["items"])
+        quotes, total_price = PriceQuoteService().quote(items)
+        return Response(
+            {
+                "items": PriceQuoteSerializer(quotes, many=True).data,
+                "total_price": str(total_price.quantize(Decimal("0.01"))),
+            }
+        )
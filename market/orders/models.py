@@ -58,6 +58,10 @@ class Order(models.Model):
         max_length=15, choices=Status.choices, default=Status.STATUS_CREATED, verbose_name=_("статус")
     )
     total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("итоговая цена"))
+    idempotency_key = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False, verbose_name=_("ключ идемпотентности")
+    )
+    stock_reserved = models.BooleanField(default=False, verbose_name=_("товары зарезервированы"))
 
 
 class OrderItem(models.Model):
@@ -1,27 +1,177 @@
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
 from _decimal import Decimal
 
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Sum, Value, When
 from django.http import HttpRequest
+from django.utils import timezone
 
 from cart.services import CartServices
+from orders.models import Order, OrderItem
+from payment.models import BankTransaction
 from settings.models import SiteSetting
+from shops.models import Offer
+
+
+class OutOfStockError(Exception):
+    """Недостаточно товара на складе для оформления заказа"""
+
+    def __init__(self, offers: List[Offer], missing_ids: Iterable[int] = ()) -> None:
+        self.offers = offers
+        self.missing_ids = sorted(missing_ids)
+        message = "Недостаточно товара на складе"
+        if offers:
+            message += ": " + ", ".join(offer.product.name for offer in offers)
+        if self.missing_ids:
+            message += ". Некоторые предложения больше не продаются"
+        super().__init__(message)
+
+
+def get_quantity_expression(quantities: Dict[int, int]) -> Case:
+    """Возвращает выражение CASE WHEN с количеством товара заказа для каждого предложения"""
+
+    return Case(
+        *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def get_order_quantities(order_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Возвращает суммарное количество товара заказов по предложениям
+    :param order_ids: id заказов
+    :return: словарь id предложения - количество
+    """
+
+    items = OrderItem.objects.filter(order__in=list(order_ids)).values("offer_id").annotate(quantity=Sum("quantity"))
+    return {item["offer_id"]: item["quantity"] for item in items.order_by("offer_id")}
+
+
+def release_expired_reservations(ttl: timedelta, batch_size: int = 100) -> int:
+    """
+    Снимает резерв товаров заказов, которые не оплачены за ttl после оформления.
+    Заказы с оплатой в очереди пропускаются, их резерв снимет или спишет оплата.
+    Заказы и предложения блокируются в порядке pk, как при оплате, заказы, заблокированные оплатой, пропускаются.
+    :param ttl: время жизни резерва
+    :param batch_size: наибольшее количество заказов за один вызов
+    :return: количество заказов, резерв которых снят
+    """
+
+    pending_payments = BankTransaction.objects.filter(order=OuterRef("pk"), is_success=None)
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(stock_reserved=True, created_at__lt=timezone.now() - ttl)
+            .exclude(Exists(pending_payments))
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+        quantities = get_order_quantities(order_ids)
+        list(Offer.objects.select_for_update().filter(pk__in=quantities).order_by("pk").values_list("pk"))
+        Offer.objects.filter(pk__in=quantities).update(reserved=F("reserved") - get_quantity_expression(quantities))
+        Order.objects.filter(pk__in=order_ids).update(stock_reserved=False)
+    return len(order_ids)
 
 
 class OrderService:
     """Сервис для работы с заказами"""
 
-    def __init__(self, request: HttpRequest) -> None:
+    def __init__(self, request: HttpRequest, cart: CartServices) -> None:
         self.request = request
+        self.cart = cart
 
     def get_total_price(self) -> Decimal:
         """
         Получение стоимости заказа с учетом выбранного типа доставки
         :return: стоимость заказа
         """
-        total_price = CartServices.get_total_price_with_discount()
-        shops = CartServices.get_shops_in_cart()
+        total_price = self.cart.get_total_price_with_discount()
+        shops = self.cart.get_shops_in_cart()
+        site_setting = SiteSetting.load()
         if self.request.session["delivery"] == "express":
-            total_price += SiteSetting.objects.first().express_order_price
+            total_price += site_setting.express_order_price
         else:
-            if total_price < SiteSetting.objects.first().min_order_price_for_free_shipping or len(shops) > 1:
-                total_price += SiteSetting.objects.first().standard_order_price
+            if total_price < site_setting.min_order_price_for_free_shipping or len(shops) > 1:
+                total_price += site_setting.standard_order_price
         return total_price
+
+    def get_existing_order(self, idempotency_key: str) -> Optional[Order]:
+        """Возвращает заказ пользователя, уже созданный с этим ключом идемпотентности"""
+
+        return Order.objects.filter(idempotency_key=idempotency_key, email=self.request.user.email).first()
+
+    def reserve_stock(self, quantities: Dict[int, int]) -> Dict[int, Offer]:
+        """
+        Резервирует товары заказа. Строки предложений блокируются в порядке pk,
+        чтобы параллельные оформления заказов не приводили к взаимоблокировкам.
+        Должен вызываться внутри транзакции.
+        :param quantities: словарь id предложения - количество
+        :return: словарь id предложения - предложение
+        :raises: OutOfStockError
+        """
+
+        locked = (
+            Offer.objects.select_for_update(of=("self",))
+            .select_related("product")
+            .filter(pk__in=list(quantities))
+            .order_by("pk")
+        )
+        offers = {offer.pk: offer for offer in locked}
+        short = [offer for pk, offer in offers.items() if offer.remains - offer.reserved < quantities[pk]]
+        missing_ids = quantities.keys() - offers.keys()
+        if short or missing_ids:
+            raise OutOfStockError(short, missing_ids)
+        for pk, offer in offers.items():
+            offer.reserved += quantities[pk]
+        Offer.objects.bulk_update(offers.values(), ["reserved"])
+        return offers
+
+    def create_order(self, idempotency_key: str) -> Order:
+        """
+        Создаёт заказ из корзины одной транзакцией: блокирует и резервирует предложения,
+        создаёт заказ и все его позиции одним запросом.
+        Повторная отправка с тем же ключом идемпотентности возвращает уже созданный заказ.
+        :param idempotency_key: ключ идемпотентности формы подтверждения заказа
+        :return: заказ
+        :raises: OutOfStockError
+        """
+
+        order = self.get_existing_order(idempotency_key)
+        if order is not None:
+            return order
+
+        items = {int(item["offers"]): item for item in self.cart.cart.values()}
+        total_price = self.get_total_price()
+        user = self.request.user
+        session = self.request.session
+        try:
+            with transaction.atomic():
+                offers = self.reserve_stock({pk: item["quantity"] for pk, item in items.items()})
+                order = Order.objects.create(
+                    phone_number=user.phone_number,
+                    full_name=user.full_name,
+                    email=user.email,
+                    delivery_type=session["delivery"],
+                    city=session["city"],
+                    address=session["address"],
+                    payment_type=session["payment"],
+                    total_price=total_price,
+                    idempotency_key=idempotency_key,
+                    stock_reserved=True,
+                )
+                OrderItem.objects.bulk_create(
+                    OrderItem(
+                        order=order, offer=offer, price=Decimal(items[pk]["price"]), quantity=items[pk]["quantity"]
+                    )
+                    for pk, offer in offers.items()
+                )
+        except IntegrityError:
+            order = self.get_existing_order(idempotency_key)
+            if order is None:
+                raise
+        return order
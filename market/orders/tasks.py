@@ -0,0 +1,26 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from orders.services import release_expired_reservations
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def release_reservations(batch_size: int = 100) -> int:
+    """
+    Задача снятия резерва товаров с заказов, не оплаченных за ORDER_RESERVATION_TTL.
+    Снимает резерв пачками, пока не останется просроченных заказов.
+    :return: количество заказов, резерв которых снят
+    """
+
+    released = 0
+    while count := release_expired_reservations(settings.ORDER_RESERVATION_TTL, batch_size):
+        released += count
+        if count < batch_size:
+            break
+    if released:
+        logger.info("Снят резерв товаров с %s неоплаченных заказов", released)
+    return released
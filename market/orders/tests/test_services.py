@@ -0,0 +1,74 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from orders.services import OrderService, OutOfStockError
+from orders.tasks import release_reservations
+from payment.models import BankTransaction
+from products.models import Category, Product
+from shops.models import Offer, Shop
+
+
+class OrderStockTestCase(TestCase):
+    """Базовый класс тестов резервирования товаров заказа"""
+
+    def setUp(self):
+        category = Category.objects.create(name="Category")
+        shop = Shop.objects.create(name="Shop", description="", phone="", address="", email="shop@example.com")
+        self.offers = [
+            Offer.objects.create(
+                shop=shop,
+                product=Product.objects.create(name=f"Product {i}", category=category),
+                price=Decimal("100"),
+                remains=5,
+                reserved=2,
+            )
+            for i in range(2)
+        ]
+
+    def create_order(self, minutes_ago: int) -> Order:
+        order = Order.objects.create(
+            full_name="Buyer", email="buyer@example.com", phone_number="+79990000000", stock_reserved=True
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(minutes=minutes_ago))
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, offer=offer, price=offer.price, quantity=1) for offer in self.offers
+        )
+        return order
+
+
+class ReserveStockTest(OrderStockTestCase):
+    """Класс тестов резервирования товаров при оформлении заказа"""
+
+    def test_missing_offer(self):
+        """Проверка, что снятое с продажи предложение не пропускается молча"""
+
+        quantities = {self.offers[0].pk: 1, self.offers[-1].pk + 100: 1}
+        with self.assertRaisesMessage(OutOfStockError, "Некоторые предложения больше не продаются"):
+            with transaction.atomic():
+                OrderService(None, None).reserve_stock(quantities)
+        self.offers[0].refresh_from_db()
+        self.assertEqual(self.offers[0].reserved, 2)
+
+
+class ReleaseReservationsTest(OrderStockTestCase):
+    """Класс тестов снятия резерва товаров неоплаченных заказов"""
+
+    def test_release_expired(self):
+        """Проверка, что резерв снимается только с просроченных заказов без оплаты в очереди"""
+
+        expired = self.create_order(minutes_ago=60)
+        fresh = self.create_order(minutes_ago=1)
+        paying = self.create_order(minutes_ago=60)
+        BankTransaction.objects.create(order=paying, card_number="12345678", total_price=Decimal("200"))
+        Offer.objects.update(reserved=3)
+
+        self.assertEqual(release_reservations(), 1)
+        self.assertEqual(list(Order.objects.filter(stock_reserved=False).values_list("pk", flat=True)), [expired.pk])
+        self.assertEqual(Order.objects.filter(pk__in=[fresh.pk, paying.pk], stock_reserved=True).count(), 2)
+        self.assertEqual(set(Offer.objects.values_list("reserved", flat=True)), {2})
+        self.assertEqual(release_reservations(), 0)
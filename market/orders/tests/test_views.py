@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from shops.models import Offer, Shop
+
+
+class OrderStepFourViewTest(TestCase):
+    """Класс тестов оформления заказа на четвертом шаге"""
+
+    fixtures = ["fixtures/25-site-settings.json"]
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="buyer@example.com", password="password", full_name="Buyer", phone_number="+79990000000"
+        )
+        self.client.force_login(user)
+        category = Category.objects.create(name="Category")
+        shop = Shop.objects.create(name="Shop", description="", phone="", address="", email="shop@example.com")
+        self.offers = [
+            Offer.objects.create(
+                shop=shop,
+                product=Product.objects.create(name=f"Product {i}", category=category),
+                price=Decimal("100"),
+                remains=5,
+            )
+            for i in range(3)
+        ]
+        for offer in self.offers:
+            self.client.post(reverse("cart:cart_add", kwargs={"pk": offer.product_id}), {"quantity": 2})
+        session = self.client.session
+        session.update({"delivery": "regular", "city": "City", "address": "Address", "payment": "card"})
+        session.save()
+        self.url = reverse("orders:order-step-4")
+
+    def test_create_order(self):
+        """Проверка создания заказа с позициями и резервированием товаров"""
+
+        response = self.client.post(self.url, {"idempotency_key": "key"})
+        order = Order.objects.get()
+        self.assertRedirects(
+            response,
+            f"{reverse('payment:payment_with_card')}?order={order.pk}&total_price={order.total_price}",
+            fetch_redirect_response=False,
+        )
+        self.assertTrue(order.stock_reserved)
+        self.assertEqual(OrderItem.objects.filter(order=order, quantity=2).count(), 3)
+        for offer in self.offers:
+            offer.refresh_from_db()
+            self.assertEqual((offer.remains, offer.reserved), (5, 2))
+
+    def test_double_submit_returns_existing_order(self):
+        """Проверка, что повторная отправка формы не создаёт второй заказ"""
+
+        first = self.client.post(self.url, {"idempotency_key": "key"})
+        second = self.client.post(self.url, {"idempotency_key": "key"})
+        self.assertEqual(first["Location"], second["Location"])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 3)
+        self.offers[0].refresh_from_db()
+        self.assertEqual(self.offers[0].reserved, 2)
+
+    def test_out_of_stock(self):
+        """Проверка, что заказ не создаётся частично, если товара не хватает"""
+
+        Offer.objects.filter(pk=self.offers[-1].pk).update(reserved=4)
+        response = self.client.post(self.url, {"idempotency_key": "key"})
+        self.assertContains(response, "Недостаточно товара на складе: Product 2")
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Offer.objects.filter(reserved=2).exists())
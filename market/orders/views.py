@@ -1,3 +1,5 @@
+import uuid
+
 from django.urls import reverse, reverse_lazy
 from django.shortcuts import redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -7,11 +9,9 @@ from django.views.generic import TemplateView, ListView, DetailView
 
 from accounts.views import MyRegisterView
 from orders.forms import OrderStepTwoForm, OrderStepThreeForm
-from orders.models import Order, OrderItem
-from shops.models import Offer
-from orders.services import OrderService
-from cart.services import CartServices
-from products.models import ProductImage
+from orders.models import Order
+from orders.services import OrderService, OutOfStockError
+from cart.services import get_cart
 
 
 class OrderStepOneView(MyRegisterView):
@@ -95,26 +95,14 @@ class OrderStepFourView(LoginRequiredMixin, TemplateView):
     template_name = "orders/order_step_4.jinja2"
 
     def post(self, request, *args, **kwargs):
-        cart = CartServices(self.request)
-        order_service = OrderService(self.request)
-        order = Order.objects.create(
-            phone_number=request.user.phone_number,
-            full_name=request.user.full_name,
-            email=request.user.email,
-            delivery_type=request.session["delivery"],
-            city=request.session["city"],
-            address=request.session["address"],
-            payment_type=request.session["payment"],
-            total_price=order_service.get_total_price(),
-        )
-        for item in cart:
-            OrderItem.objects.create(
-                order=order,
-                offer=Offer.objects.get(id=int(item["offers"])),
-                price=item["price"],
-                quantity=item["quantity"],
-            )
-        if request.session["payment"] == "card":
+        cart = get_cart(self.request)
+        order_service = OrderService(self.request, cart)
+        idempotency_key = request.POST.get("idempotency_key") or uuid.uuid4().hex
+        try:
+            order = order_service.create_order(idempotency_key)
+        except OutOfStockError as exc:
+            return self.render_to_response(self.get_context_data(error=str(exc)))
+        if order.payment_type == "card":
             url = reverse("payment:payment_with_card")
             return HttpResponseRedirect(f"{url}?order={order.pk}&total_price={order.total_price}")
 
@@ -122,16 +110,15 @@ class OrderStepFourView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        order_service = OrderService(self.request)
-        cart = CartServices(self.request)
+        cart = get_cart(self.request)
+        order_service = OrderService(self.request, cart)
         context["cart"] = cart
-        for item in cart:
-            item["images"] = ProductImage.objects.filter(product=item["product"].pk)
         context["delivery"] = self.request.session["delivery"]
         context["city"] = self.request.session["city"]
         context["address"] = self.request.session["address"]
         context["payment"] = self.request.session["payment"]
         context["total_price"] = order_service.get_total_price()
+        context["idempotency_key"] = uuid.uuid4().hex
         return context
 
 
@@ -0,0 +1,123 @@
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import redis
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class RedisPaymentSubscription:
+    """Подписка на результат оплаты заказа в Redis pub/sub"""
+
+    def __init__(self, client: redis.Redis, channel: str) -> None:
+        self.pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(channel)
+
+    def wait(self, timeout: float) -> Optional[str]:
+        """
+        Ждёт публикации результата оплаты
+        :param timeout: время ожидания в секундах
+        :return: статус заказа или None, если результат не пришёл
+        """
+
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = self.pubsub.get_message(timeout=remaining)
+            if message is not None and message["type"] == "message":
+                return message["data"].decode("utf-8")
+        return None
+
+    def close(self) -> None:
+        self.pubsub.close()
+
+    def __enter__(self) -> "RedisPaymentSubscription":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class RedisPaymentEvents:
+    """Публикация результатов оплаты заказов через Redis pub/sub"""
+
+    channel_prefix = "payment:order"
+
+    def __init__(self) -> None:
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+
+    def get_channel(self, order_id: int) -> str:
+        return f"{self.channel_prefix}:{order_id}"
+
+    def publish(self, order_id: int, status: str) -> None:
+        """Публикует статус оплаченного заказа, недоступность Redis не прерывает оплату"""
+
+        try:
+            self.client.publish(self.get_channel(order_id), status)
+        except redis.RedisError:
+            logger.exception("Не удалось опубликовать результат оплаты заказа %s", order_id)
+
+    def subscribe(self, order_id: int) -> RedisPaymentSubscription:
+        return RedisPaymentSubscription(self.client, self.get_channel(order_id))
+
+
+class LocalPaymentSubscription:
+    """Подписка на результат оплаты заказа внутри процесса"""
+
+    def __init__(self, events: "LocalPaymentEvents", order_id: int) -> None:
+        self.events = events
+        self.order_id = order_id
+        self.queue: queue.Queue = queue.Queue()
+        with events.lock:
+            events.subscribers[order_id].append(self.queue)
+
+    def wait(self, timeout: float) -> Optional[str]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        with self.events.lock:
+            self.events.subscribers[self.order_id].remove(self.queue)
+            if not self.events.subscribers[self.order_id]:
+                del self.events.subscribers[self.order_id]
+
+    def __enter__(self) -> "LocalPaymentSubscription":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class LocalPaymentEvents:
+    """Публикация результатов оплаты внутри процесса для разработки и тестов без Redis"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.subscribers: Dict[int, List[queue.Queue]] = defaultdict(list)
+
+    def publish(self, order_id: int, status: str) -> None:
+        with self.lock:
+            for subscriber in self.subscribers.get(order_id, ()):
+                subscriber.put(status)
+
+    def subscribe(self, order_id: int) -> LocalPaymentSubscription:
+        return LocalPaymentSubscription(self, order_id)
+
+
+_backends = {}
+
+
+def get_payment_events():
+    """Возвращает бэкенд публикации результатов оплаты, указанный в настройке PAYMENT_EVENTS_BACKEND"""
+
+    path = settings.PAYMENT_EVENTS_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:42
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payment", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="banktransaction",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="banktransaction",
+            name="processed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="banktransaction",
+            index=models.Index(
+                condition=models.Q(("is_success__isnull", True)), fields=["id"], name="bank_transaction_pending_idx"
+            ),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models  # noqa
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 from orders.models import Order
 
@@ -9,11 +11,16 @@ class BankTransaction(models.Model):
     class Meta:
         verbose_name = "Оплата заказа"
         verbose_name_plural = "Оплата заказов"
+        indexes = [
+            models.Index(fields=["id"], condition=Q(is_success__isnull=True), name="bank_transaction_pending_idx"),
+        ]
 
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     card_number = models.CharField(max_length=9)
     total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     is_success = models.BooleanField(null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.is_success} - {self.total_price} - {self.order.id} - {self.card_number}"
@@ -1,8 +1,22 @@
+import logging
+import time
+from collections import namedtuple
 from decimal import Decimal
+from functools import partial
+from typing import Dict, List
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
 from orders.models import Order, Status, OrderItem
+from orders.services import OutOfStockError, get_order_quantities, get_quantity_expression
+from payment.events import get_payment_events
 from payment.models import BankTransaction
 from payment.utils import card_number_is_valid
+from shops.models import Offer
+
+logger = logging.getLogger(__name__)
 
 
 class PaymentService:
@@ -22,31 +36,247 @@ class PaymentService:
         self.total_price = total_price
         self.transaction = transaction
 
+    def lock_order(self) -> None:
+        """Блокирует строку заказа до конца транзакции и перечитывает его статус"""
+
+        locked = Order.objects.select_for_update().only("status", "stock_reserved").get(pk=self.order.pk)
+        self.order.status = locked.status
+        self.order.stock_reserved = locked.stock_reserved
+
+    def get_quantities(self) -> Dict[int, int]:
+        """
+        Возвращает количество товара заказа по предложениям
+        :return: словарь id предложения - количество
+        """
+
+        return get_order_quantities([self.order.pk])
+
+    def write_off_stock(self, quantities: Dict[int, int]) -> None:
+        """
+        Списывает остатки всех предложений заказа одним запросом UPDATE.
+        Строки предложений блокируются в порядке pk, как и при оформлении заказа, чтобы параллельные оплаты
+        не приводили к взаимоблокировкам. Списание выполняется только для предложений с достаточным остатком,
+        если остатка не хватает хотя бы одного предложения, изменения откатываются.
+        :param quantities: словарь id предложения - количество
+        :raises: OutOfStockError
+        """
+
+        offers = list(
+            Offer.objects.select_for_update(of=("self",))
+            .select_related("product")
+            .filter(pk__in=quantities)
+            .order_by("pk")
+        )
+        quantity = get_quantity_expression(quantities)
+        fields = {"remains": F("remains") - quantity}
+        if self.order.stock_reserved:
+            fields["reserved"] = F("reserved") - quantity
+        with transaction.atomic():
+            updated = Offer.objects.filter(pk__in=quantities, remains__gte=quantity).update(**fields)
+            if updated != len(offers):
+                raise OutOfStockError([offer for offer in offers if offer.remains < quantities[offer.pk]])
+
+    def release_stock(self, quantities: Dict[int, int]) -> None:
+        """Снимает резерв товаров заказа одним запросом UPDATE"""
+
+        if self.order.stock_reserved:
+            Offer.objects.filter(pk__in=quantities).update(
+                reserved=F("reserved") - get_quantity_expression(quantities)
+            )
+
+    def finish_transaction(self, is_success: bool) -> None:
+        """Отмечает оплату обработанной, чтобы она больше не попадала в очередь"""
+
+        self.transaction.is_success = is_success
+        self.transaction.processed_at = timezone.now()
+        self.transaction.save(update_fields=["is_success", "processed_at"])
+
+    def complete(self, quantities: Dict[int, int], is_success: bool) -> None:
+        """
+        Сохраняет итог оплаты: при отказе снимает резерв товаров, ставит статус заказа,
+        отмечает оплату обработанной и публикует статус для страницы ожидания оплаты
+        """
+
+        if not is_success:
+            self.release_stock(quantities)
+        self.order.status = Status.STATUS_PAID if is_success else Status.STATUS_NOT_PAID
+        self.order.stock_reserved = False
+        self.order.save(update_fields=["status", "stock_reserved"])
+        self.finish_transaction(is_success)
+        transaction.on_commit(partial(get_payment_events().publish, self.order.pk, self.order.status))
+
+    def decline(self) -> None:
+        """Отклоняет оплату после непредвиденной ошибки так же, как оплату с невалидной картой"""
+
+        with transaction.atomic():
+            self.lock_order()
+            if self.order.status == Status.STATUS_PAID:
+                self.finish_transaction(is_success=False)
+            else:
+                self.complete(self.get_quantities(), is_success=False)
+
     def pay(self) -> str:
         """
         Метод оплаты заказа, проверяет валидность номера карты,
         ставит соответствующий статус заказа,
-        статус в модели оплаты и уменьшает остатки продуктов на складе
+        статус в модели оплаты и уменьшает остатки продуктов на складе.
+        Вся оплата выполняется в одной транзакции с блокировкой заказа и его предложений.
         :return: str
         """
-        if card_number_is_valid(self.card_number):
-            self.order.status = Status.STATUS_PAID
-            self.order.save()
-            self.transaction.is_success = True
-            self.transaction.save()
+        with transaction.atomic():
+            self.lock_order()
+            if self.order.status == Status.STATUS_PAID:
+                self.finish_transaction(is_success=False)
+                return f"Заказ №{self.order.id} уже оплачен"
+
+            quantities = self.get_quantities()
+            reason = None
+            if not card_number_is_valid(self.card_number):
+                reason = "номер карты невалидный"
+            else:
+                try:
+                    self.write_off_stock(quantities)
+                except OutOfStockError as exc:
+                    reason = str(exc)
 
-            for item in OrderItem.objects.filter(order=self.order):
-                item.offer.remains -= item.quantity
-                item.offer.save()
+            self.complete(quantities, is_success=reason is None)
 
+        if reason is None:
             return f"Оплата заказа №{self.order.id} с карты {self.card_number} на сумму ${self.total_price}"
+        return (
+            f"Не удалось оплатить заказ №{self.order.id} с карты {self.card_number} на сумму ${self.total_price}. "
+            f"Причина: {reason}"
+        )
+
+
+PaymentStats = namedtuple("PaymentStats", ("processed", "seconds", "throughput", "max_lag", "pending"))
+
+
+class PaymentProcessor:
+    """
+    Обработчик очереди оплат. Забирает необработанные оплаты пачками через SELECT ... FOR UPDATE SKIP LOCKED,
+    поэтому несколько воркеров и пересекающиеся запуски задачи обрабатывают разные оплаты
+    и ни одна оплата не обрабатывается дважды.
 
-        else:
-            self.order.status = Status.STATUS_NOT_PAID
-            self.order.save()
-            self.transaction.is_success = False
-            self.transaction.save()
-            return (
-                f"Не удалось оплатить заказ №{self.order.id} с карты {self.card_number} на сумму ${self.total_price}. "
-                f"Причина: номер карты невалидный"
+    Args:
+        batch_size (int): размер пачки оплат
+        time_limit (float): время работы в секундах, после которого новые пачки не забираются
+    """
+
+    def __init__(self, batch_size: int = 100, time_limit: float = 10) -> None:
+        self.batch_size = batch_size
+        self.time_limit = time_limit
+
+    def claim(self) -> List[BankTransaction]:
+        """
+        Забирает пачку необработанных оплат неоплаченных заказов, заблокированные другими воркерами строки
+        пропускаются. Должен вызываться внутри транзакции, блокировки держатся до её завершения.
+        :return: список оплат
+        """
+
+        return list(
+            BankTransaction.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("order")
+            .filter(is_success=None)
+            .exclude(order__status=Status.STATUS_PAID)
+            .order_by("pk")[: self.batch_size]
+        )
+
+    def discard_paid(self) -> int:
+        """
+        Отмечает неуспешными необработанные оплаты уже оплаченных заказов, не забирая их в пачку.
+        Заблокированные другими воркерами строки пропускаются.
+        :return: количество отмеченных оплат
+        """
+
+        with transaction.atomic():
+            duplicates = list(
+                BankTransaction.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(is_success=None, order__status=Status.STATUS_PAID)
+                .values_list("pk", flat=True)
             )
+            return BankTransaction.objects.filter(pk__in=duplicates).update(
+                is_success=False, processed_at=timezone.now()
+            )
+
+    def process_batch(self) -> List[BankTransaction]:
+        """
+        Забирает и оплачивает пачку оплат в одной транзакции
+        :return: обработанные оплаты
+        """
+
+        with transaction.atomic():
+            transactions = self.claim()
+            self.lock_batch(transactions)
+            for bank_transaction in transactions:
+                self.process(bank_transaction)
+        return transactions
+
+    @staticmethod
+    def lock_batch(transactions: List[BankTransaction]) -> None:
+        """
+        Блокирует заказы и предложения всей пачки в порядке pk до начала оплаты.
+        Оплата каждого заказа затем берёт уже удерживаемые блокировки, поэтому пачки разных воркеров
+        с общими заказами или предложениями не приводят к взаимоблокировкам.
+        """
+
+        order_ids = sorted({bank_transaction.order_id for bank_transaction in transactions})
+        list(Order.objects.select_for_update().filter(pk__in=order_ids).order_by("pk").values_list("pk"))
+        list(
+            Offer.objects.select_for_update()
+            .filter(pk__in=OrderItem.objects.filter(order__in=order_ids).values("offer_id"))
+            .order_by("pk")
+            .values_list("pk")
+        )
+
+    @staticmethod
+    def process(bank_transaction: BankTransaction) -> bool:
+        """
+        Оплачивает заказ, ошибка оплаты отклоняет оплату и не прерывает обработку пачки
+        :return: отмечена ли оплата обработанной
+        """
+
+        service = PaymentService(
+            bank_transaction.order,
+            bank_transaction.card_number,
+            bank_transaction.total_price,
+            bank_transaction,
+        )
+        try:
+            with transaction.atomic():
+                service.pay()
+        except Exception:
+            logger.exception("Ошибка обработки оплаты %s", bank_transaction.pk)
+            try:
+                service.decline()
+            except Exception:
+                logger.exception("Не удалось отклонить оплату %s", bank_transaction.pk)
+        return bank_transaction.processed_at is not None
+
+    def run(self) -> PaymentStats:
+        """
+        Обрабатывает очередь пачками, пока она не опустеет или не выйдет время
+        :return: количество обработанных оплат, время работы, пропускная способность в оплатах в секунду,
+            наибольшее время ожидания оплаты в очереди в секундах и количество оставшихся оплат
+        """
+
+        started = time.monotonic()
+        processed = self.discard_paid()
+        max_lag = 0.0
+        while time.monotonic() - started < self.time_limit:
+            transactions = self.process_batch()
+            finished = [bank_transaction for bank_transaction in transactions if bank_transaction.processed_at]
+            processed += len(finished)
+            for bank_transaction in finished:
+                lag = (bank_transaction.processed_at - bank_transaction.created_at).total_seconds()
+                max_lag = max(max_lag, lag)
+            if len(transactions) < self.batch_size or len(finished) < len(transactions):
+                break
+        seconds = time.monotonic() - started
+        return PaymentStats(
+            processed=processed,
+            seconds=seconds,
+            throughput=processed / seconds if seconds else 0.0,
+            max_lag=max_lag,
+            pending=BankTransaction.objects.filter(is_success=None).count(),
+        )
@@ -1,13 +1,23 @@
+import logging
+
 from celery import shared_task
 
-from payment.models import BankTransaction
-from payment.services import PaymentService
+from payment.services import PaymentProcessor
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
-def pay():
-    """Задача оплаты заказа, проверяет модели со статусом None"""
+def pay(batch_size: int = 100) -> dict:
+    """
+    Задача оплаты заказа, обрабатывает оплаты со статусом None.
+    Оплаты забираются пачками с пропуском заблокированных строк, поэтому задачу можно запускать
+    на нескольких воркерах одновременно.
+    """
 
-    for transaction in BankTransaction.objects.filter(is_success=None):
-        payment = PaymentService(transaction.order, transaction.card_number, transaction.total_price, transaction)
-        payment.pay()
+    stats = PaymentProcessor(batch_size=batch_size).run()
+    logger.info(
+        "Обработано оплат: %s за %.2f с (%.1f в секунду), наибольшее ожидание %.1f с, в очереди: %s",
+        *stats,
+    )
+    return stats._asdict()
@@ -1,11 +1,16 @@
 from decimal import Decimal
 from typing import List
+from unittest import mock
 
+from django.db import connection, transaction
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from orders.models import Status, Order, OrderItem
 from payment.models import BankTransaction
-from payment.services import PaymentService
+from payment.services import PaymentProcessor, PaymentService
+from payment.tasks import pay
 from shops.models import Offer
 
 success_response: str = "Оплата заказа №5 с карты 4444 4444 на сумму $100.00"
@@ -64,3 +69,123 @@ class PaymentServiceTestCase(TestCase):
     #     self.assertEqual(result, failed_response)
     #     self.assertEqual(self.order.status, Status.STATUS_NOT_PAID)
     #     self.assertFalse(self.transaction.is_success)
+
+    def test_payment_queries_do_not_depend_on_items_count(self):
+        """Тест, что остатки всех позиций заказа списываются одним запросом"""
+        with CaptureQueriesContext(connection) as context:
+            PaymentService(self.order, "4444 4444", Decimal("100.00"), self.transaction).pay()
+        updates = [query for query in context.captured_queries if query["sql"].startswith('UPDATE "shops_offer"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.order.status, Status.STATUS_PAID)
+
+    def test_oversell(self):
+        """Тест, что оплата не проходит и остатки не меняются, если товара не хватает"""
+        item: OrderItem = self.order_item.last()
+        Offer.objects.filter(pk=item.offer_id).update(remains=item.quantity - 1)
+        before_remains = dict(Offer.objects.values_list("pk", "remains"))
+
+        result: str = PaymentService(self.order, "4444 4444", Decimal("100.00"), self.transaction).pay()
+
+        self.assertIn("Недостаточно товара на складе", result)
+        self.assertEqual(self.order.status, Status.STATUS_NOT_PAID)
+        self.assertFalse(self.transaction.is_success)
+        self.assertEqual(dict(Offer.objects.values_list("pk", "remains")), before_remains)
+
+    def test_reservation_released(self):
+        """Тест снятия резерва с товаров заказа после оплаты"""
+        Offer.objects.filter(order_items__order=self.order).update(reserved=F("reserved") + 5)
+        Order.objects.filter(pk=self.order.pk).update(stock_reserved=True)
+
+        PaymentService(self.order, "4444 4444", Decimal("100.00"), self.transaction).pay()
+        PaymentService(self.order, "4444 4444", Decimal("100.00"), self.transaction).pay()
+
+        for item in self.order_item:
+            offer: Offer = Offer.objects.get(pk=item.offer_id)
+            self.assertEqual(offer.reserved, 5 - item.quantity)
+        self.assertFalse(Order.objects.get(pk=self.order.pk).stock_reserved)
+
+    def test_pay_already_paid_order(self):
+        """Тест, что повторная оплата оплаченного заказа отмечается обработанной и не списывает остатки"""
+        PaymentService(self.order, "4444 4444", Decimal("100.00"), self.transaction).pay()
+        remains = dict(Offer.objects.values_list("pk", "remains"))
+        duplicate = BankTransaction.objects.create(order=self.order, card_number="4444 4444", total_price=100.00)
+
+        result: str = PaymentService(self.order, "4444 4444", Decimal("100.00"), duplicate).pay()
+
+        self.assertEqual(result, f"Заказ №{self.order.pk} уже оплачен")
+        duplicate.refresh_from_db()
+        self.assertFalse(duplicate.is_success)
+        self.assertIsNotNone(duplicate.processed_at)
+        self.assertEqual(dict(Offer.objects.values_list("pk", "remains")), remains)
+        self.assertFalse(BankTransaction.objects.filter(is_success=None).exists())
+
+
+class PaymentProcessorTestCase(TestCase):
+    """Класс тестов обработчика очереди оплат"""
+
+    fixtures = [
+        "04-shops.json",
+        "05-categories.json",
+        "06-products.json",
+        "08-offers.json",
+        "23-orders.json",
+        "24-orders_item.json",
+    ]
+
+    def setUp(self):
+        self.transactions: List[BankTransaction] = [
+            BankTransaction.objects.create(order=order, card_number=card_number, total_price=100.00)
+            for order, card_number in zip(Order.objects.order_by("pk")[:3], ("4444 4444", "0000 0000", "2222 2222"))
+        ]
+
+    def test_pay_task(self):
+        """Тест обработки всей очереди пачками и метрик обработки"""
+        stats: dict = pay(batch_size=2)
+
+        self.assertEqual(stats["processed"], 3)
+        self.assertEqual(stats["pending"], 0)
+        self.assertGreaterEqual(stats["max_lag"], 0)
+        self.assertEqual(
+            list(BankTransaction.objects.order_by("pk").values_list("is_success", flat=True)), [True, False, True]
+        )
+        self.assertFalse(BankTransaction.objects.filter(processed_at=None).exists())
+        self.assertEqual(PaymentProcessor().run().processed, 0)
+
+    def test_failed_payment_does_not_stop_batch(self):
+        """Тест, что ошибка оплаты одного заказа отклоняет оплату, снимает резерв и не прерывает обработку пачки"""
+        order: Order = self.transactions[0].order
+        Order.objects.filter(pk=order.pk).update(stock_reserved=True)
+        Offer.objects.filter(order_items__order=order).update(reserved=F("reserved") + 5)
+
+        with mock.patch.object(PaymentService, "write_off_stock", side_effect=[RuntimeError, None]):
+            with self.assertLogs("payment.services", level="ERROR"):
+                stats = PaymentProcessor().run()
+
+        self.assertEqual(stats.processed, 3)
+        self.assertFalse(BankTransaction.objects.get(pk=self.transactions[0].pk).is_success)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.stock_reserved), (Status.STATUS_NOT_PAID, False))
+        for item in OrderItem.objects.filter(order=order):
+            self.assertEqual(Offer.objects.get(pk=item.offer_id).reserved, 5 - item.quantity)
+
+    def test_paid_orders_are_not_claimed(self):
+        """Тест, что оплаты оплаченных заказов отмечаются неуспешными, не забираются повторно и не занимают пачку"""
+        Order.objects.filter(pk=self.transactions[0].order_id).update(status=Status.STATUS_PAID)
+        duplicates = [
+            BankTransaction.objects.create(order=self.transactions[0].order, card_number="4444 4444", total_price=1)
+            for _ in range(3)
+        ]
+
+        with transaction.atomic():
+            claimed = PaymentProcessor(batch_size=2).claim()
+        self.assertEqual([item.pk for item in claimed], [item.pk for item in self.transactions[1:]])
+
+        stats = PaymentProcessor(batch_size=1).run()
+        self.assertEqual(stats.processed, 6)
+        self.assertEqual(stats.pending, 0)
+        self.assertFalse(
+            BankTransaction.objects.filter(pk__in=[item.pk for item in duplicates + self.transactions[:1]])
+            .exclude(is_success=False)
+            .exists()
+        )
+        self.assertFalse(BankTransaction.objects.filter(processed_at=None).exists())
@@ -1,11 +1,18 @@
+import threading
+import time
+from decimal import Decimal
 from typing import Dict, Union
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
 from rest_framework.response import Response
 from rest_framework.test import APIClient
 
-from orders.models import Order
+from orders.models import Order, Status
+from payment.events import get_payment_events
 from payment.models import BankTransaction
+from payment.services import PaymentService
 
 
 class BankTransactionAPITest(TestCase):
@@ -91,3 +98,66 @@ class BankTransactionAPITest(TestCase):
 
         self.assertEqual(response.status_code, 204)
         self.assertEqual(BankTransaction.objects.count(), 0)
+
+
+@override_settings(PAYMENT_EVENTS_BACKEND="payment.events.LocalPaymentEvents", PAYMENT_STATUS_TIMEOUT=5)
+class PaymentStatusViewTest(TestCase):
+    """Класс тестов long-poll статуса оплаты заказа"""
+
+    fixtures = [
+        "04-shops.json",
+        "05-categories.json",
+        "06-products.json",
+        "08-offers.json",
+        "23-orders.json",
+        "24-orders_item.json",
+    ]
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="tolkach@mail.ru", password="password", full_name="Tolkach", phone_number="+79990000000"
+        )
+        self.client.force_login(user)
+        self.order: Order = Order.objects.get(pk=5)
+        self.url: str = reverse("payment:payment_status", kwargs={"pk": self.order.pk})
+
+    def test_final_status_returned_immediately(self):
+        """Тест ответа без ожидания для уже оплаченного заказа"""
+        Order.objects.filter(pk=self.order.pk).update(status=Status.STATUS_PAID)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.json(), {"status": "paid", "final": True})
+
+    def test_status_pushed_by_worker(self):
+        """Тест, что ожидающий запрос сразу получает опубликованный воркером результат"""
+        timer = threading.Timer(0.1, get_payment_events().publish, args=(self.order.pk, Status.STATUS_PAID))
+        timer.start()
+        started = time.monotonic()
+        response = self.client.get(self.url)
+        timer.join()
+
+        self.assertEqual(response.json(), {"status": "paid", "final": True})
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_payment_publishes_result(self):
+        """Тест публикации результата после фиксации оплаты"""
+        bank_transaction = BankTransaction.objects.create(order=self.order, card_number="0000 0000", total_price=100)
+
+        with get_payment_events().subscribe(self.order.pk) as subscription:
+            with self.captureOnCommitCallbacks(execute=True):
+                PaymentService(self.order, "0000 0000", Decimal("100.00"), bank_transaction).pay()
+            self.assertEqual(subscription.wait(0.1), Status.STATUS_NOT_PAID)
+
+    @override_settings(PAYMENT_STATUS_TIMEOUT=0.05)
+    def test_timeout(self):
+        """Тест ответа с текущим статусом, если результат оплаты не пришёл"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.json(), {"status": "created", "final": False})
+
+    def test_foreign_order(self):
+        """Тест, что статус чужого заказа недоступен"""
+        response = self.client.get(reverse("payment:payment_status", kwargs={"pk": 7}))
+
+        self.assertEqual(response.status_code, 404)
@@ -4,6 +4,7 @@ from rest_framework.routers import DefaultRouter
 from payment.views import (
     PaymentWithCardView,
     ProgressPaymentView,
+    PaymentStatusView,
     BankTransactionViewSet,
 )
 
@@ -16,4 +17,5 @@ urlpatterns = [
     path("api/", include(routers.urls)),
     path("with-card/", PaymentWithCardView.as_view(), name="payment_with_card"),
     path("progress/", ProgressPaymentView.as_view(), name="progress_payment"),
+    path("status/<int:pk>/", PaymentStatusView.as_view(), name="payment_status"),
 ]
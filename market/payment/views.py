@@ -1,16 +1,23 @@
 from decimal import Decimal, ROUND_DOWN
 from typing import Union, Dict
 
-from django.http import HttpResponseRedirect
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.http import HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.views import View
 from django.views.generic import TemplateView
 from rest_framework.viewsets import ModelViewSet
 
+from orders.models import Order, Status
+from payment.events import get_payment_events
 from payment.forms import PaymentForm
 from payment.models import BankTransaction
 from payment.serializers import BankTransactionSerializer
-from cart.services import CartServices
+from payment.tasks import pay
+from cart.services import get_cart
 
 
 class BankTransactionViewSet(ModelViewSet):
@@ -32,7 +39,7 @@ class PaymentWithCardView(TemplateView):
             card_number: str = form.cleaned_data["card_number"]
             total_price: Decimal = Decimal(request.GET.get("total_price"))
             rounded_total_price: Decimal = total_price.quantize(Decimal("0.00"), rounding=ROUND_DOWN)
-            cart = CartServices(request)
+            cart = get_cart(request)
 
             data: Dict[str, Union[str, int, Decimal]] = {
                 "order": order,
@@ -44,10 +51,11 @@ class PaymentWithCardView(TemplateView):
             if serializer.is_valid():
                 serializer.save()
                 cart.clear()
+                transaction.on_commit(pay.delay)
             else:
                 print(serializer.errors)
 
-            return HttpResponseRedirect(reverse("payment:progress_payment"))
+            return HttpResponseRedirect(f"{reverse('payment:progress_payment')}?order={order}")
         return render(
             request=self.request,
             template_name="payment/payment_with_card.jinja2",
@@ -64,3 +72,33 @@ class ProgressPaymentView(TemplateView):
     """Представление прогресса оплаты заказа"""
 
     template_name = "payment/progress_payment.jinja2"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        order = self.request.GET.get("order")
+        if order and order.isdigit():
+            context["status_url"] = reverse("payment:payment_status", kwargs={"pk": order})
+        return context
+
+
+class PaymentStatusView(LoginRequiredMixin, View):
+    """
+    Long-poll статуса оплаты заказа: ответ возвращается сразу, если заказ уже оплачен или оплата не прошла,
+    иначе запрос ждёт публикации результата воркером оплаты не дольше PAYMENT_STATUS_TIMEOUT секунд.
+    Ожидание занимает поток WSGI-воркера, поэтому таймаут короткий, а страница ожидания повторяет запрос,
+    пока статус не станет окончательным.
+    """
+
+    final_statuses = (Status.STATUS_PAID, Status.STATUS_NOT_PAID)
+
+    def get_status(self, pk: int) -> str:
+        return get_object_or_404(Order.objects.only("status"), pk=pk, email=self.request.user.email).status
+
+    def get(self, request, pk: int, *args, **kwargs):
+        status = self.get_status(pk)
+        if status not in self.final_statuses:
+            with get_payment_events().subscribe(pk) as subscription:
+                status = self.get_status(pk)
+                if status not in self.final_statuses:
+                    status = subscription.wait(settings.PAYMENT_STATUS_TIMEOUT) or status
+        return JsonResponse({"status": status, "final": status in self.final_statuses})
@@ -1,10 +1,8 @@
-import logging
-import os.path
 import time  # noqa
 
 from django.contrib import admin  # noqa F401
-from django.http import HttpResponse, HttpRequest
-from django.shortcuts import render
+from django.http import HttpResponse, HttpRequest, JsonResponse
+from django.shortcuts import get_object_or_404, render
 from django.urls import path
 
 from .forms import ProductImportForm
@@ -18,17 +16,9 @@ from .models import (
     Detail,
     ProductsViews,
     ProductImport,
+    ImportJob,
 )  # noqa
-from .tasks import import_products, get_import_status  # noqa
-
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-file_handler = logging.FileHandler(os.path.join("logs/import/products-import.log"))
-formatter = logging.Formatter("%(asctime)s - %(product)s - %(category)s - %(is_success)s", datefmt="%d-%b-%y %H:%M:%S")
-
-logger.addHandler(file_handler)
-file_handler.setFormatter(formatter)
+from .tasks import create_import_job, import_products, get_import_status  # noqa
 
 
 @admin.register(Category)
@@ -46,16 +36,10 @@ class ProductAdmin(admin.ModelAdmin):
     def import_json(self, request: HttpRequest) -> HttpResponse:
         if request.method == "GET":
             form = ProductImportForm()
-            status = get_import_status()
-            if status == "В процессе выполнения":
-                context = {
-                    "status": "Предыдущий импорт ещё не выполнен. Пожалуйста, дождитесь его окончания",
-                }
-                return render(request, "admin/product-import-form.html", context)
-
             context = {
                 "form": form,
-                "status": status,
+                "status": get_import_status(),
+                "jobs": ImportJob.objects.all()[:10],
             }
             return render(request, "admin/product-import-form.html", context)
 
@@ -71,19 +55,33 @@ class ProductAdmin(admin.ModelAdmin):
                     file_obj = ProductImport.objects.create(file=file)
                     files_objs.append(file_obj)
 
-                import_products.delay(file_ids=[file_obj.id for file_obj in files_objs], email=email)
+                file_ids = [file_obj.id for file_obj in files_objs]
+                job = create_import_job(file_ids, email)
+                import_products.delay(file_ids=file_ids, email=email, job_id=job.pk)
 
-            status = get_import_status()
             context = {
                 "form": form,
-                "status": status,
+                "status": get_import_status(),
+                "jobs": ImportJob.objects.all()[:10],
             }
 
             return render(request, "admin/product-import-form.html", context)
 
+    def import_job_progress(self, request: HttpRequest, pk: int) -> JsonResponse:
+        """JSON с прогрессом задания импорта для опроса со страницы импорта"""
+
+        return JsonResponse(get_object_or_404(ImportJob, pk=pk).as_dict())
+
     def get_urls(self):
         urls = super().get_urls()
-        new_urls = [path("import-products/", self.import_json, name="import_products")]
+        new_urls = [
+            path("import-products/", self.import_json, name="import_products"),
+            path(
+                "import-products/<int:pk>/progress/",
+                self.admin_site.admin_view(self.import_job_progress),
+                name="import_job_progress",
+            ),
+        ]
         return new_urls + urls
 
 
@@ -119,3 +117,10 @@ class ProductDetailAdmin(admin.ModelAdmin):
 class ProductsViewsAdmin(admin.ModelAdmin):
     list_display = "product", "user", "created_at"
     list_display_links = "product", "user"
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = "pk", "status", "files_done", "files_total", "rows_parsed", "rows_failed", "created_at"
+    list_display_links = ("pk",)
+    readonly_fields = [field.name for field in ImportJob._meta.fields]
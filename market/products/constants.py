@@ -1 +1,5 @@
 KEY_FOR_CACHE_PRODUCTS = "products"
+KEY_FOR_CACHE_PRODUCTS_VERSION = "products_version"
+SEARCH_CONFIG = "russian"
+KEY_FOR_CACHE_CATEGORIES = "categories_tree"
+IMPORT_RESOLVE_LOCK_ID = 4242001  # ключ advisory-блокировки PostgreSQL для создания категорий, магазинов и товаров
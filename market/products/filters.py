@@ -1,12 +1,22 @@
+from collections import defaultdict
 from decimal import Decimal
-from django.db.models import Avg, QuerySet, Count
-from django.db.models.functions import Round
-from django_filters import FilterSet, NumberFilter, OrderingFilter
+from typing import Dict, List, Set
 
-from .models import Product
+from django import forms
+from django.db.models import QuerySet
+from django_filters import CharFilter, Filter, FilterSet, NumberFilter, OrderingFilter
+
+from .models import Product, ProductDetail
+from .search import get_search_backend
+from .services.categories_services import CategoryTreeService
 
 
 class ProductFilter(FilterSet):
+    q = CharFilter(
+        method="search_filter",
+        help_text="Полнотекстовый поиск по названию и описанию товара с сортировкой по релевантности.",
+    )
+
     avg_price__gte = NumberFilter(
         method="avg_price__gte_filter",
         help_text="Фильтр по минимальной средней цене товара.",
@@ -17,15 +27,44 @@ class ProductFilter(FilterSet):
         help_text="Фильтр по максимальной средней цене товара.",
     )
 
-    reviews__lte = NumberFilter(method="reviews__lte_filter", help_text="Фильтр по минимальному количеству на товар")
+    discounted_price__gte = NumberFilter(
+        method="discounted_price__gte_filter",
+        help_text="Фильтр по минимальной цене товара со скидкой.",
+    )
 
-    reviews__gte = NumberFilter(method="reviews__gte_filter", help_text="Фильтр по максимальному количеству на товар")
+    discounted_price__lte = NumberFilter(
+        method="discounted_price__lte_filter",
+        help_text="Фильтр по максимальной цене товара со скидкой.",
+    )
+
+    category = NumberFilter(
+        method="category_filter",
+        help_text="Фильтр по категории вместе со всеми её подкатегориями.",
+    )
+
+    detail = Filter(
+        method="detail_filter",
+        widget=forms.SelectMultiple,
+        help_text="Фильтр по характеристикам в формате <id характеристики>:<значение>. "
+        "Значения одной характеристики объединяются через ИЛИ, разные характеристики - через И.",
+    )
+
+    reviews__lte = NumberFilter(
+        method="reviews_count__lte_filter",
+        help_text="Фильтр по максимальному количеству отзывов на товар",
+    )
+
+    reviews__gte = NumberFilter(
+        method="reviews_count__gte_filter",
+        help_text="Фильтр по минимальному количеству отзывов на товар",
+    )
 
     o = OrderingFilter(
         # https://django-filter.readthedocs.io/en/stable/ref/filters.html#orderingfilter
         fields=(
             ("date_of_publication", "publication"),
             ("avg_price", "avg_price"),
+            ("discounted_price", "discounted_price"),
             ("reviews_count", "reviews_count"),
         ),
     )
@@ -36,38 +75,69 @@ class ProductFilter(FilterSet):
             "name": ["iexact", "icontains"],
         }
 
+    def search_filter(self, queryset: QuerySet[Product], _: str, value: str) -> QuerySet[Product]:
+        """Поиск по названию и описанию товара с учётом опечаток"""
+        return get_search_backend().search(queryset, value)
+
+    def category_filter(self, queryset: QuerySet[Product], _: str, value: Decimal) -> QuerySet[Product]:
+        """Фильтрация по категории и её подкатегориям по материализованному пути"""
+        path = CategoryTreeService().get_path(int(value))
+        if path is None:
+            return queryset.none()
+        return queryset.filter(category__path__startswith=path)
+
+    def detail_filter(self, queryset: QuerySet[Product], _: str, value: List[str]) -> QuerySet[Product]:
+        """Фильтрация по значениям характеристик товара"""
+        return filter_by_details(queryset, parse_detail_values(value))
+
     def avg_price__gte_filter(self, queryset: QuerySet[Product], _: str, value: Decimal) -> QuerySet[Product]:
         """Фильтрация по минимальной средней цене товара."""
-        queryset = self._annotate_avg_price(queryset)
-        return queryset.filter(
-            avg_price__gte=value,
-        )
+        return queryset.filter(summary__avg_price__gte=value)
 
     def avg_price__lte_filter(self, queryset: QuerySet[Product], _: str, value: Decimal) -> QuerySet[Product]:
         """Фильтрация по максимальной средней цене товара."""
-        queryset = self._annotate_avg_price(queryset)
-        return queryset.filter(
-            avg_price__lte=value,
-        )
+        return queryset.filter(summary__avg_price__lte=value)
+
+    def discounted_price__gte_filter(self, queryset: QuerySet[Product], _: str, value: Decimal) -> QuerySet[Product]:
+        """Фильтрация по минимальной цене товара со скидкой."""
+        return queryset.filter(summary__discounted_price__gte=value)
 
-    def reviews_count__lte_filter(self, queryset, _, value):
+    def discounted_price__lte_filter(self, queryset: QuerySet[Product], _: str, value: Decimal) -> QuerySet[Product]:
+        """Фильтрация по максимальной цене товара со скидкой."""
+        return queryset.filter(summary__discounted_price__lte=value)
+
+    def reviews_count__lte_filter(self, queryset: QuerySet[Product], _: str, value: Decimal) -> QuerySet[Product]:
         """Фильтрация по максимальному количеству отзывов на товар"""
-        queryset = self._annotate_reviews(queryset)
-        return queryset.filter(
-            avg_price__lte=value,
-        )
+        return queryset.filter(summary__reviews_count__lte=value)
 
-    def reviews_count__gte_filter(self, queryset, _, value):
+    def reviews_count__gte_filter(self, queryset: QuerySet[Product], _: str, value: Decimal) -> QuerySet[Product]:
         """Фильтрация по минимальному количеству отзывов на товар"""
-        queryset = self._annotate_reviews(queryset)
-        return queryset.filter(
-            avg_price__lte=value,
-        )
+        return queryset.filter(summary__reviews_count__gte=value)
 
-    @staticmethod
-    def _annotate_avg_price(queryset: QuerySet[Product]) -> QuerySet[Product]:
-        return queryset.annotate(avg_price=Round(Avg("offers__price"), 2))
 
-    @staticmethod
-    def _annotate_reviews(queryset: QuerySet[Product]) -> QuerySet[Product]:
-        return queryset.annotate(reviews_count=Count("reviews"))
+def parse_detail_values(value: List[str]) -> Dict[int, Set[str]]:
+    """
+    Разбирает значения фильтра характеристик
+    :param value: список строк вида "<id характеристики>:<значение>"
+    :return: словарь id характеристики - множество выбранных значений
+    """
+    selected: Dict[int, Set[str]] = defaultdict(set)
+    for item in value or ():
+        detail_id, _, detail_value = item.partition(":")
+        if detail_id.isdigit() and detail_value:
+            selected[int(detail_id)].add(detail_value)
+    return selected
+
+
+def filter_by_details(queryset: QuerySet[Product], selected: Dict[int, Set[str]]) -> QuerySet[Product]:
+    """
+    Фильтрует товары по выбранным значениям характеристик
+    :param queryset: выборка товаров
+    :param selected: словарь id характеристики - множество выбранных значений
+    :return: товары, у которых для каждой характеристики есть одно из выбранных значений
+    """
+    for detail_id, values in selected.items():
+        queryset = queryset.filter(
+            pk__in=ProductDetail.objects.filter(detail_id=detail_id, value__in=values).values("product_id")
+        )
+    return queryset
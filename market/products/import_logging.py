@@ -0,0 +1,219 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Union
+
+from django.conf import settings
+
+IMPORT_LOGGER_NAME = "products.import"
+
+ROW_FIELDS = (
+    "is_success",
+    "product_name",
+    "category",
+    "shop_name",
+    "phone",
+    "address",
+    "shop_email",
+    "offer_shop",
+    "offer_product",
+    "offer_price",
+    "remains",
+)
+
+TEXT_FORMAT = (
+    "%(asctime)s - %(is_success)s - %(product_name)s - %(category)s - %(shop_name)s - %(phone)s - "
+    "%(address)s - %(shop_email)s - %(offer_shop)s - %(offer_product)s - %(offer_price)s - %(remains)s"
+)
+DATE_FORMAT = "%d-%b-%y %H:%M:%S"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Компактный формат лога импорта: одна строка JSON на запись"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {"time": self.formatTime(record, DATE_FORMAT), "level": record.levelname}
+        data.update((field, getattr(record, field, None)) for field in ROW_FIELDS)
+        message = record.getMessage()
+        if message:
+            data["message"] = message
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Прореживает записи ниже заданного уровня, пропуская каждую rate-ю.
+    Записи уровня level и выше пропускаются всегда.
+
+    Args:
+        rate (int): пропускается каждая rate-я запись ниже уровня level
+        level (int | str): уровень, начиная с которого записи не прореживаются
+    """
+
+    def __init__(self, rate: int = 1, level: Union[int, str] = logging.WARNING) -> None:
+        super().__init__()
+        self.rate = max(int(rate), 1)
+        self.level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        if not isinstance(self.level, int):
+            raise ValueError(f"Неизвестный уровень логирования: {level!r}")
+        self.counter = itertools.count(1)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level or self.rate == 1:
+            return True
+        return next(self.counter) % self.rate == 0
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    Файловый обработчик, который не сбрасывает буфер после каждой записи,
+    а пишет на диск раз в flush_every записей или по явному вызову flush().
+    Файл открывается при первой записи.
+
+    Args:
+        filename (str): путь к файлу лога
+        flush_every (int): количество записей между сбросами буфера
+        buffer_size (int): размер буфера файла в байтах
+    """
+
+    def __init__(self, filename: str, flush_every: int = 500, buffer_size: int = 64 * 1024) -> None:
+        self.flush_every = flush_every
+        self.buffer_size = buffer_size
+        self.pending = 0
+        super().__init__(filename, encoding="utf-8", delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size, encoding=self.encoding)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        super().flush()
+        self.pending = 0
+
+
+class BatchingQueueListener(QueueListener):
+    """Слушатель очереди, сбрасывающий буферы обработчиков, когда очередь простаивает flush_interval секунд"""
+
+    flush_interval = 1.0
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        try:
+            return self.queue.get(block, self.flush_interval)
+        except queue.Empty:
+            for handler in self.handlers:
+                handler.flush()
+            return self.queue.get(block)
+
+
+class ImportLogHandler(QueueHandler):
+    """
+    Неблокирующий обработчик лога импорта: записи строк кладутся в очередь,
+    а в файл их пачками пишет фоновый поток. Поток запускается при первой записи
+    и останавливается в flush(), который дожидается записи всей очереди на диск.
+
+    Args:
+        filename (str): путь к файлу лога
+        log_format (str): "text" - прежний строчный формат, "json" - JSON Lines
+        sample_rate (int): в лог попадает каждая sample_rate-я запись ниже уровня sample_level
+        sample_level (int | str): уровень, начиная с которого записи не прореживаются
+        flush_every (int): количество записей между сбросами буфера файла
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        log_format: str = "text",
+        sample_rate: int = 1,
+        sample_level: Union[int, str] = logging.WARNING,
+        flush_every: int = 500,
+    ) -> None:
+        super().__init__(queue.SimpleQueue())
+        self.target = BufferedFileHandler(filename, flush_every=flush_every)
+        if log_format == "json":
+            self.target.setFormatter(JsonLinesFormatter())
+        else:
+            self.target.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+        self.addFilter(SamplingFilter(sample_rate, sample_level))
+        self.listener: Optional[QueueListener] = None
+        self.listener_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Запускает фоновый поток записи, если он ещё не запущен. Вызывается под listener_lock"""
+
+        if self.listener is None:
+            self.listener = BatchingQueueListener(self.queue, self.target)
+            self.listener.start()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # запись кладётся в очередь под той же блокировкой, что и остановка потока в flush(),
+        # иначе запись другой задачи может попасть в очередь после стоп-сигнала и остаться незаписанной
+        with self.listener_lock:
+            self.start()
+            super().enqueue(record)
+
+    def flush(self) -> None:
+        """Дожидается записи очереди, останавливает фоновый поток и сбрасывает буфер файла"""
+
+        with self.listener_lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+        self.target.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.target.close()
+        super().close()
+
+
+_import_logger: Optional[logging.Logger] = None
+_import_logger_lock = threading.Lock()
+
+
+def get_import_logger() -> logging.Logger:
+    """
+    Возвращает логгер строк импорта, настраивая его по settings при первом вызове,
+    а не при запуске Django
+    """
+
+    global _import_logger
+    if _import_logger is None:
+        with _import_logger_lock:
+            if _import_logger is None:
+                logger = logging.getLogger(IMPORT_LOGGER_NAME)
+                logger.setLevel(logging.DEBUG)
+                logger.propagate = False
+                logger.addHandler(
+                    ImportLogHandler(
+                        settings.IMPORT_LOG_FILE,
+                        log_format=settings.IMPORT_LOG_FORMAT,
+                        sample_rate=settings.IMPORT_LOG_SAMPLE_RATE,
+                        sample_level=settings.IMPORT_LOG_SAMPLE_LEVEL,
+                        flush_every=settings.IMPORT_LOG_FLUSH_EVERY,
+                    )
+                )
+                _import_logger = logger
+    return _import_logger
+
+
+def flush_import_logger() -> None:
+    """Дописывает на диск накопленные записи лога импорта"""
+
+    if _import_logger is not None:
+        for handler in _import_logger.handlers:
+            handler.flush()
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Avg, Count, Min, OuterRef, Subquery
+
+
+def fill_product_summary(apps, schema_editor):
+    """Заполнение сводной таблицы каталога для уже существующих продуктов"""
+    Product = apps.get_model("products", "Product")
+    ProductImage = apps.get_model("products", "ProductImage")
+    ProductSummary = apps.get_model("products", "ProductSummary")
+
+    images = ProductImage.objects.filter(product=OuterRef("pk")).order_by("sort_image")
+    reviews = Product.objects.annotate(reviews_count=Count("reviews")).values_list("pk", "reviews_count")
+    prices = Product.objects.annotate(
+        avg_price=Avg("offers__price"),
+        min_price=Min("offers__price"),
+        image=Subquery(images.values("image")[:1]),
+    ).values_list("pk", "avg_price", "min_price", "image")
+    reviews_count = dict(reviews)
+
+    ProductSummary.objects.bulk_create(
+        [
+            ProductSummary(
+                product_id=pk,
+                reviews_count=reviews_count.get(pk, 0),
+                avg_price=round(avg_price, 2) if avg_price is not None else None,
+                min_price=min_price,
+                image=image or "",
+            )
+            for pk, avg_price, min_price, image in prices
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0001_initial"),
+        ("shops", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSummary",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="products.product",
+                    ),
+                ),
+                (
+                    "reviews_count",
+                    models.PositiveIntegerField(db_index=True, default=0, verbose_name="количество отзывов"),
+                ),
+                (
+                    "avg_price",
+                    models.DecimalField(
+                        db_index=True, decimal_places=2, max_digits=10, null=True, verbose_name="средняя цена"
+                    ),
+                ),
+                (
+                    "min_price",
+                    models.DecimalField(
+                        db_index=True, decimal_places=2, max_digits=10, null=True, verbose_name="минимальная цена"
+                    ),
+                ),
+                (
+                    "image",
+                    models.CharField(blank=True, default="", max_length=255, verbose_name="основное изображение"),
+                ),
+            ],
+            options={
+                "verbose_name": "Сводка продукта",
+                "verbose_name_plural": "Сводки продуктов",
+            },
+        ),
+        migrations.RunPython(fill_product_summary, migrations.RunPython.noop),
+    ]
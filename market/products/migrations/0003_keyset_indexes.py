@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0002_productsummary"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productsummary",
+            name="avg_price",
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True, verbose_name="средняя цена"),
+        ),
+        migrations.AlterField(
+            model_name="productsummary",
+            name="reviews_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="количество отзывов"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["date_of_publication", "id"], name="product_publication_seek_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(fields=["avg_price", "product"], name="summary_avg_price_seek_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(fields=["reviews_count", "product"], name="summary_reviews_seek_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(fields=["product", "created_at", "id"], name="review_product_seek_idx"),
+        ),
+    ]
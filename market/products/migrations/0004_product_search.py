@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:24
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    """Создание GIN-индексов и заполнение поисковых векторов, только для PostgreSQL"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS product_search_vector_idx ON products_product USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON products_product USING gin (name gin_trgm_ops)"
+    )
+    Product = apps.get_model("products", "Product")
+    Product.objects.update(
+        search_vector=SearchVector("name", weight="A", config="russian")
+        + SearchVector("description", weight="B", config="russian")
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS product_search_vector_idx")
+    schema_editor.execute("DROP INDEX IF EXISTS product_name_trgm_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0003_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0004_product_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productdetail",
+            index=models.Index(fields=["detail", "value", "product"], name="product_detail_facet_idx"),
+        ),
+    ]
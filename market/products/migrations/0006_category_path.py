@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:26
+
+from django.db import migrations, models
+
+
+def fill_category_path(apps, schema_editor):
+    """Заполнение материализованного пути для существующих категорий обходом дерева от корней"""
+    Category = apps.get_model("products", "Category")
+
+    categories = []
+    level = {pk: f"{pk}/" for pk in Category.objects.filter(parent__isnull=True).values_list("pk", flat=True)}
+    while level:
+        categories.extend(Category(pk=pk, path=path) for pk, path in level.items())
+        children = Category.objects.filter(parent_id__in=level.keys()).values_list("pk", "parent_id")
+        level = {pk: f"{level[parent_id]}{pk}/" for pk, parent_id in children}
+    Category.objects.bulk_update(categories, ["path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0005_product_detail_facet_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(blank=True, db_index=True, default="", editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_category_path, migrations.RunPython.noop),
+    ]
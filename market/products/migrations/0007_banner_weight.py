@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0006_category_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="banner",
+            name="weight",
+            field=models.PositiveIntegerField(default=1, verbose_name="вес показа"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0007_banner_weight"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsummary",
+            name="discounted_price",
+            field=models.DecimalField(
+                decimal_places=2, max_digits=10, null=True, verbose_name="минимальная цена со скидкой"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(fields=["discounted_price", "product"], name="summary_discounted_seek_idx"),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+def clear_empty_images(apps, schema_editor):
+    """Пустое основное изображение хранится как NULL, а не пустая строка"""
+    ProductSummary = apps.get_model("products", "ProductSummary")
+    ProductSummary.objects.filter(image="").update(image=None)
+
+
+def restore_empty_images(apps, schema_editor):
+    ProductSummary = apps.get_model("products", "ProductSummary")
+    ProductSummary.objects.filter(image__isnull=True).update(image="")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0009_import_job"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productsummary",
+            name="image",
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name="основное изображение"),
+        ),
+        migrations.RunPython(clear_empty_images, restore_empty_images),
+    ]
@@ -1,26 +1,73 @@
 import os
 import uuid
 from decimal import Decimal
+from typing import Iterable
 
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Avg, Min, OuterRef, Subquery
+from django.db.models.functions import Cast
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from accounts.models import User
-from .constants import KEY_FOR_CACHE_PRODUCTS
-from django.core.cache import cache
+from .constants import KEY_FOR_CACHE_CATEGORIES
+from .search import get_search_backend
+from .utils import bump_products_cache_version
 from django.db.models import signals
 
 
-def save_product(**kwargs):
-    """Удаление кэша при получении сигнала об изменении или создании продукта"""
-    cache.delete(KEY_FOR_CACHE_PRODUCTS)
+def save_product(instance: "Product", **kwargs):
+    """Сброс кэша каталога и обновление поискового индекса при изменении или создании продукта"""
+    bump_products_cache_version()
+    get_search_backend().update(instance)
+
+
+def delete_product(instance: "Product", **kwargs):
+    """Сброс кэша каталога и удаление из поискового индекса при удалении продукта"""
+    bump_products_cache_version()
+    get_search_backend().remove(instance.pk)
+
+
+def update_category_paths(instance: "Category", created: bool, **kwargs) -> None:
+    """Пересчёт материализованного пути категории и её потомков, сброс кэша дерева категорий"""
+    Category.objects.rebuild_paths(instance, force=created)
+    cache.delete(KEY_FOR_CACHE_CATEGORIES)
+
 
+def delete_category(**kwargs) -> None:
+    """Сброс кэша дерева категорий при удалении категории"""
+    cache.delete(KEY_FOR_CACHE_CATEGORIES)
 
-def delete_product(**kwargs):
-    """Удаление кэша при получении сигнала об удалении продукта"""
-    cache.delete(KEY_FOR_CACHE_PRODUCTS)
+
+class CategoryManager(models.Manager):
+    """Менеджер категорий, поддерживающий материализованный путь вида "1/3/7/" """
+
+    def rebuild_paths(self, category: "Category", force: bool = False) -> None:
+        """
+        Пересчитывает путь категории и, если он изменился, пути всех её потомков
+        :param category: категория
+        :param force: пересчитать потомков, даже если путь категории не изменился
+        """
+        parent_path = ""
+        if category.parent_id:
+            parent_path = self.filter(pk=category.parent_id).values_list("path", flat=True).first() or ""
+        path = f"{parent_path}{category.pk}/"
+        if path == category.path and not force:
+            return
+
+        updates = []
+        seen = set()
+        level = {category.pk: path}
+        while level:
+            seen.update(level)
+            updates.extend(self.model(pk=pk, path=level_path) for pk, level_path in level.items())
+            children = self.filter(parent_id__in=level.keys()).exclude(pk__in=seen).values_list("pk", "parent_id")
+            level = {pk: f"{level[parent_id]}{pk}/" for pk, parent_id in children}
+        self.bulk_update(updates, ["path"])
+        category.path = path
 
 
 class Category(models.Model):
@@ -35,6 +82,9 @@ class Category(models.Model):
     parent = models.ForeignKey("self", on_delete=models.CASCADE, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     sort_index = models.CharField(verbose_name=_("индекс сортировки"), blank=True)
+    path = models.CharField(max_length=255, db_index=True, editable=False, blank=True, default="")
+
+    objects = CategoryManager()
 
     @property
     def description_short(self) -> str:
@@ -46,18 +96,24 @@ class Category(models.Model):
         return f"{self.name}"
 
 
+signals.post_save.connect(receiver=update_category_paths, sender=Category)
+signals.post_delete.connect(receiver=delete_category, sender=Category)
+
+
 class Product(models.Model):
     """Модель продукта"""
 
     class Meta:
         verbose_name = _("Продукт")
         verbose_name_plural = _("Продукты")
+        indexes = [models.Index(fields=["date_of_publication", "id"], name="product_publication_seek_idx")]
 
     name = models.CharField(max_length=512, verbose_name=_("наименование"))
     description = models.TextField(verbose_name=_("описание"), blank=True)
     date_of_publication = models.DateTimeField(default=timezone.now)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True)
     details = models.ManyToManyField("Detail", through="ProductDetail", verbose_name=_("характеристики"))
+    search_vector = SearchVectorField(null=True, editable=False)
 
     @property
     def num_of_purchases(self):
@@ -91,6 +147,38 @@ signals.post_save.connect(receiver=save_product, sender=Product)
 signals.post_delete.connect(receiver=delete_product, sender=Product)
 
 
+def create_product_summary(instance: "Product", created: bool, **kwargs) -> None:
+    """Создание строки сводной таблицы каталога для нового продукта"""
+    if created:
+        ProductSummary.objects.get_or_create(product_id=instance.pk)
+
+
+def refresh_summary_reviews(instance: "Review", **kwargs) -> None:
+    """Пересчёт количества отзывов в сводной таблице каталога"""
+    ProductSummary.objects.refresh_reviews(instance.product_id)
+    bump_products_cache_version()
+
+
+def refresh_summary_prices(instance, **kwargs) -> None:
+    """Пересчёт цен в сводной таблице каталога при изменении предложения магазина"""
+    ProductSummary.objects.refresh_prices(instance.product_id)
+    bump_products_cache_version()
+
+
+def refresh_summary_image(instance: "ProductImage", **kwargs) -> None:
+    """Пересчёт основного изображения в сводной таблице каталога"""
+    ProductSummary.objects.refresh_image(instance.product_id)
+    bump_products_cache_version()
+
+
+def refresh_catalog_details(**kwargs) -> None:
+    """Сброс кэша каталога и фасетов при изменении характеристики продукта"""
+    bump_products_cache_version()
+
+
+signals.post_save.connect(receiver=create_product_summary, sender=Product)
+
+
 class Detail(models.Model):
     """Модель характеристики продукта"""
 
@@ -116,10 +204,15 @@ class ProductDetail(models.Model):
 
     class Meta:
         constraints = [models.UniqueConstraint("product", "detail", name="unique_detail_for_product")]
+        indexes = [models.Index(fields=["detail", "value", "product"], name="product_detail_facet_idx")]
         verbose_name = _("Характеристика продукта")
         verbose_name_plural = _("Характеристики продукта")
 
 
+signals.post_save.connect(receiver=refresh_catalog_details, sender=ProductDetail)
+signals.post_delete.connect(receiver=refresh_catalog_details, sender=ProductDetail)
+
+
 def product_image_directory_path(instance: "ProductImage", filename: str) -> str:
     """Функция создания уникального пути к изображениям продукта"""
 
@@ -169,6 +262,7 @@ class Banner(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="banners")
     image = models.ImageField(upload_to=banner_preview_directory_path, verbose_name=_("изображение"))
     is_active = models.BooleanField(default=True)
+    weight = models.PositiveIntegerField(default=1, verbose_name=_("вес показа"))
 
 
 class Review(models.Model):
@@ -178,6 +272,7 @@ class Review(models.Model):
         ordering = ["-created_at"]
         verbose_name = _("Отзыв")
         verbose_name_plural = _("Отзывы")
+        indexes = [models.Index(fields=["product", "created_at", "id"], name="review_product_seek_idx")]
 
     def __str__(self) -> str:
         return f"{self.user} ({self.created_at}): {self.text}"
@@ -208,6 +303,88 @@ class ProductsViews(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
 
 
+class ProductSummaryManager(models.Manager):
+    """Менеджер сводной таблицы каталога, пересчитывающий строки отдельных продуктов"""
+
+    def refresh_reviews(self, product_id: int) -> None:
+        """Пересчитывает количество отзывов продукта"""
+        self.filter(product_id=product_id).update(reviews_count=Review.objects.filter(product_id=product_id).count())
+
+    def refresh_prices(self, product_id: int) -> None:
+        """Пересчитывает среднюю и минимальную цену продукта по предложениям магазинов"""
+        prices = Product.objects.filter(pk=product_id).aggregate(avg=Avg("offers__price"), min=Min("offers__price"))
+        avg_price = prices["avg"]
+        if avg_price is not None:
+            avg_price = Decimal(avg_price).quantize(Decimal("0.01"))
+        self.filter(product_id=product_id).update(avg_price=avg_price, min_price=prices["min"])
+
+    def refresh_prices_many(self, product_ids: Iterable[int]) -> None:
+        """Пересчитывает среднюю и минимальную цену нескольких продуктов одним запросом"""
+        prices = Product.objects.filter(pk=OuterRef("product_id"))
+        price_field = models.DecimalField(max_digits=10, decimal_places=2)
+        self.filter(product_id__in=list(product_ids)).update(
+            avg_price=Subquery(prices.annotate(avg=Cast(Avg("offers__price"), price_field)).values("avg")),
+            min_price=Subquery(prices.annotate(min=Min("offers__price")).values("min")),
+        )
+
+    def refresh_image(self, product_id: int) -> None:
+        """Пересчитывает основное изображение продукта"""
+        image = (
+            ProductImage.objects.filter(product_id=product_id)
+            .order_by("sort_image")
+            .values_list("image", flat=True)
+            .first()
+        )
+        self.filter(product_id=product_id).update(image=image)
+
+    def refresh(self, product_id: int) -> None:
+        """Полностью пересчитывает строку продукта"""
+        self.get_or_create(product_id=product_id)
+        self.refresh_reviews(product_id)
+        self.refresh_prices(product_id)
+        self.refresh_image(product_id)
+
+
+class ProductSummary(models.Model):
+    """
+    Сводная таблица каталога: денормализованные количество отзывов, цены и основное изображение продукта.
+    Обновляется построчно по сигналам Review, Offer и ProductImage.
+    """
+
+    class Meta:
+        verbose_name = _("Сводка продукта")
+        verbose_name_plural = _("Сводки продуктов")
+        indexes = [
+            models.Index(fields=["avg_price", "product"], name="summary_avg_price_seek_idx"),
+            models.Index(fields=["reviews_count", "product"], name="summary_reviews_seek_idx"),
+            models.Index(fields=["discounted_price", "product"], name="summary_discounted_seek_idx"),
+        ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    reviews_count = models.PositiveIntegerField(default=0, verbose_name=_("количество отзывов"))
+    avg_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, verbose_name=_("средняя цена"))
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, db_index=True, verbose_name=_("минимальная цена")
+    )
+    image = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("основное изображение"))
+    discounted_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, verbose_name=_("минимальная цена со скидкой")
+    )
+
+    objects = ProductSummaryManager()
+
+    def __str__(self) -> str:
+        return f"Сводка товара {self.product_id}"
+
+
+signals.post_save.connect(receiver=refresh_summary_reviews, sender=Review)
+signals.post_delete.connect(receiver=refresh_summary_reviews, sender=Review)
+signals.post_save.connect(receiver=refresh_summary_prices, sender="shops.Offer")
+signals.post_delete.connect(receiver=refresh_summary_prices, sender="shops.Offer")
+signals.post_save.connect(receiver=refresh_summary_image, sender=ProductImage)
+signals.post_delete.connect(receiver=refresh_summary_image, sender=ProductImage)
+
+
 class ComparisonList(models.Model):
     """Модель списка сравнения продуктов"""
 
@@ -223,6 +400,63 @@ class ComparisonList(models.Model):
         return f"Список сравнения пользователя {self.user.name}"
 
 
+class ImportStatus(models.TextChoices):
+    """Модель выбора статуса импорта"""
+
+    RUNNING = "running", "В процессе выполнения"
+    DONE = "done", "Выполнен"
+    FAILED = "failed", "Завершён с ошибкой"
+
+
+class ImportJob(models.Model):
+    """
+    Задание импорта продуктов из одного или нескольких файлов.
+    Счётчики строк увеличиваются воркерами после каждой пачки, поэтому прогресс виден во время импорта.
+    """
+
+    class Meta:
+        verbose_name = "Задание импорта"
+        verbose_name_plural = "Задания импорта"
+        ordering = ["-pk"]
+
+    status = models.CharField(max_length=15, choices=ImportStatus.choices, default=ImportStatus.RUNNING)
+    email = models.EmailField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    files_total = models.PositiveIntegerField(default=0)
+    files_done = models.PositiveIntegerField(default=0)
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_created = models.PositiveIntegerField(default=0)
+    rows_updated = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"Импорт №{self.pk} - {self.get_status_display()}"
+
+    @property
+    def throughput(self) -> float:
+        """Количество разобранных строк в секунду"""
+        seconds = ((self.finished_at or timezone.now()) - self.created_at).total_seconds()
+        return round(self.rows_parsed / seconds, 1) if seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        """Возвращает прогресс задания для JSON-ответа"""
+        return {
+            "id": self.pk,
+            "status": self.status,
+            "status_display": self.get_status_display(),
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "rows_parsed": self.rows_parsed,
+            "rows_created": self.rows_created,
+            "rows_updated": self.rows_updated,
+            "rows_failed": self.rows_failed,
+            "throughput": self.throughput,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
 class ProductImport(models.Model):
     """Модель хранения файла импорта продукта"""
 
@@ -231,6 +465,7 @@ class ProductImport(models.Model):
         verbose_name_plural = "Импорт продуктов"
 
     file = models.FileField(upload_to="import/")
+    job = models.ForeignKey(ImportJob, on_delete=models.SET_NULL, null=True, blank=True, related_name="files")
 
     def save(self, *args, **kwargs):
         """Сохраняем файл с рандомной строчкой в начале"""
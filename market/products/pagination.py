@@ -0,0 +1,142 @@
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+
+from django.core.paginator import InvalidPage
+from django.db.models import F, Model, Q, QuerySet
+
+
+class InvalidCursor(InvalidPage):
+    """Курсор keyset-пагинации не удалось разобрать"""
+
+    pass
+
+
+class KeysetPage:
+    """
+    Страница keyset-пагинации.
+    Курсор хранит позицию только следующей страницы, поэтому по страницам можно идти лишь вперёд:
+    has_previous() всегда возвращает False, а номер страницы служит только для отображения.
+
+    Args:
+        object_list (list): объекты страницы
+        number (int): порядковый номер страницы, переносимый в курсоре
+        next_cursor (str): курсор следующей страницы или None, если страница последняя
+    """
+
+    def __init__(self, object_list: List[Model], number: int, next_cursor: Optional[str]) -> None:
+        self.object_list = object_list
+        self.number = number
+        self.next_cursor = next_cursor
+
+    def __repr__(self) -> str:
+        return f"<Keyset page {self.number}>"
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return False
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу сортировки (seek) без COUNT(*) и OFFSET.
+    Страница выбирается условием «после последней строки предыдущей страницы»,
+    pk используется как второй ключ для однозначного порядка.
+
+    Args:
+        queryset (QuerySet): выборка объектов
+        per_page (int): размер страницы
+        ordering (str): поле сортировки, например "date_of_publication" или "-avg_price"
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int, ordering: str) -> None:
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+
+    def get_ordering(self) -> list:
+        """Возвращает сортировку по полю и pk, пустые значения всегда в конце"""
+
+        if self.descending:
+            return [F(self.field).desc(nulls_last=True), "-pk"]
+        return [F(self.field).asc(nulls_last=True), "pk"]
+
+    def get_seek_filter(self, value: Any, pk: int) -> Q:
+        """Возвращает условие для строк, идущих после строки (value, pk)"""
+
+        lookup = "lt" if self.descending else "gt"
+        after_pk = Q(**{f"pk__{lookup}": pk})
+        if value is None:
+            return Q(**{f"{self.field}__isnull": True}) & after_pk
+        return (
+            Q(**{f"{self.field}__{lookup}": value})
+            | Q(**{self.field: value}) & after_pk
+            | Q(**{f"{self.field}__isnull": True})
+        )
+
+    @staticmethod
+    def encode_cursor(value: Any, pk: int, number: int) -> str:
+        """Кодирует позицию страницы в непрозрачную строку"""
+
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        data = json.dumps([value, pk, number], separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[Any, int, int]:
+        """
+        Декодирует курсор
+        :return: значение поля сортировки, pk и номер страницы
+        :raises: InvalidCursor
+        """
+
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            value, pk, number = json.loads(data)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise InvalidCursor("Некорректный курсор страницы")
+        if not isinstance(pk, int) or not isinstance(number, int):
+            raise InvalidCursor("Некорректный курсор страницы")
+        return value, pk, number
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """
+        Возвращает страницу, следующую за позицией курсора, или первую страницу
+        :param cursor: курсор, полученный из предыдущей страницы
+        :return: страница
+        """
+
+        queryset = self.queryset.order_by(*self.get_ordering())
+        number = 1
+        if cursor:
+            value, pk, number = self.decode_cursor(cursor)
+            queryset = queryset.filter(self.get_seek_filter(value, pk))
+
+        objects = list(queryset[: self.per_page + 1])
+        next_cursor = None
+        if len(objects) > self.per_page:
+            objects = objects[: self.per_page]
+            last = objects[-1]
+            next_cursor = self.encode_cursor(getattr(last, self.field), last.pk, number + 1)
+        return KeysetPage(objects, number, next_cursor)
@@ -0,0 +1,225 @@
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, QuerySet, Value, When
+
+from .constants import SEARCH_CONFIG
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на слова в нижнем регистре"""
+
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def edit_distance_at_most(first: str, second: str, limit: int) -> bool:
+    """Проверяет, что расстояние Левенштейна между словами не превышает limit"""
+
+    if abs(len(first) - len(second)) > limit:
+        return False
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, start=1):
+        current = [i]
+        for j, second_char in enumerate(second, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (first_char != second_char)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class PostgresSearchBackend:
+    """
+    Полнотекстовый поиск PostgreSQL: tsvector-колонка Product.search_vector с GIN-индексом
+    и триграммный поиск по названию для опечаток.
+    """
+
+    @staticmethod
+    def get_vector() -> SearchVector:
+        return SearchVector("name", weight="A", config=SEARCH_CONFIG) + SearchVector(
+            "description", weight="B", config=SEARCH_CONFIG
+        )
+
+    def update(self, product) -> None:
+        """Обновляет поисковый вектор продукта"""
+
+        type(product).objects.filter(pk=product.pk).update(search_vector=self.get_vector())
+
+    def update_many(self, product_ids: Iterable[int]) -> None:
+        """Обновляет поисковые векторы продуктов одним запросом"""
+
+        from .models import Product
+
+        Product.objects.filter(pk__in=list(product_ids)).update(search_vector=self.get_vector())
+
+    def remove(self, product_id: int) -> None:
+        """Вектор удаляется вместе со строкой продукта"""
+
+        pass
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        """
+        Возвращает товары, найденные по запросу, отсортированные по релевантности
+        :param queryset: выборка товаров
+        :param query: поисковый запрос
+        :return: выборка с аннотацией rank
+        """
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            queryset.annotate(
+                rank=SearchRank(F("search_vector"), search_query) + TrigramSimilarity("name", query),
+            )
+            .filter(Q(search_vector=search_query) | Q(name__trigram_similar=query))
+            .order_by("-rank", "pk")
+        )
+
+
+class InvertedIndexSearchBackend:
+    """
+    Поиск по инвертированному индексу в памяти процесса для баз без полнотекстового поиска (SQLite).
+    Индекс строится при первом поиске и обновляется по сигналам сохранения и удаления продукта.
+    """
+
+    name_weight = 2.0
+    description_weight = 1.0
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._postings: Optional[Dict[str, Dict[int, float]]] = None
+        self._documents: Dict[int, Set[str]] = {}
+
+    def clear(self) -> None:
+        """Сбрасывает индекс, он будет построен заново при следующем поиске"""
+
+        with self._lock:
+            self._postings = None
+            self._documents = {}
+
+    def _add(self, product_id: int, name: str, description: str) -> None:
+        weights: Dict[str, float] = defaultdict(float)
+        for token in tokenize(name):
+            weights[token] += self.name_weight
+        for token in tokenize(description or ""):
+            weights[token] += self.description_weight
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[product_id] = weight
+        self._documents[product_id] = set(weights)
+
+    def _remove(self, product_id: int) -> None:
+        for token in self._documents.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def _ensure_built(self) -> None:
+        if self._postings is not None:
+            return
+        from .models import Product
+
+        with self._lock:
+            if self._postings is not None:
+                return
+            self._postings = {}
+            for product_id, name, description in Product.objects.values_list("pk", "name", "description").iterator():
+                self._add(product_id, name, description)
+
+    def update(self, product) -> None:
+        """Переиндексирует продукт, если индекс уже построен"""
+
+        with self._lock:
+            if self._postings is None:
+                return
+            self._remove(product.pk)
+            self._add(product.pk, product.name, product.description)
+
+    def update_many(self, product_ids: Iterable[int]) -> None:
+        """Переиндексирует продукты, если индекс уже построен"""
+
+        from .models import Product
+
+        with self._lock:
+            if self._postings is None:
+                return
+            products = Product.objects.filter(pk__in=list(product_ids)).values_list("pk", "name", "description")
+            for product_id, name, description in products:
+                self._remove(product_id)
+                self._add(product_id, name, description)
+
+    def remove(self, product_id: int) -> None:
+        """Удаляет продукт из индекса"""
+
+        with self._lock:
+            if self._postings is not None:
+                self._remove(product_id)
+
+    def _match_tokens(self, token: str) -> Iterable[tuple]:
+        """Возвращает слова индекса, совпадающие с token точно, по префиксу или с опечаткой"""
+
+        if token in self._postings:
+            yield token, 1.0
+        limit = 1 if len(token) < 6 else 2
+        for candidate in self._postings:
+            if candidate == token:
+                continue
+            if len(token) >= 3 and candidate.startswith(token):
+                yield candidate, 0.8
+            elif len(token) >= 4 and edit_distance_at_most(token, candidate, limit):
+                yield candidate, 0.5
+
+    def score(self, query: str) -> Dict[int, float]:
+        """
+        Считает релевантность продуктов для запроса
+        :param query: поисковый запрос
+        :return: словарь pk продукта - релевантность
+        """
+
+        self._ensure_built()
+        scores: Dict[int, float] = defaultdict(float)
+        with self._lock:
+            for token in set(tokenize(query)):
+                best: Dict[int, float] = {}
+                for candidate, factor in self._match_tokens(token):
+                    for product_id, weight in self._postings[candidate].items():
+                        best[product_id] = max(best.get(product_id, 0.0), weight * factor)
+                for product_id, value in best.items():
+                    scores[product_id] += value
+        return scores
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        """
+        Возвращает товары, найденные по запросу, отсортированные по релевантности
+        :param queryset: выборка товаров
+        :param query: поисковый запрос
+        :return: выборка с аннотацией rank
+        """
+
+        scores = self.score(query)
+        if not scores:
+            return queryset.none()
+        rank = Case(
+            *(When(pk=product_id, then=Value(value)) for product_id, value in scores.items()),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=scores.keys()).annotate(rank=rank).order_by("-rank", "pk")
+
+
+_backends = {}
+
+
+def get_search_backend():
+    """Возвращает поисковый бэкенд для текущей базы данных"""
+
+    vendor = connection.vendor
+    if vendor not in _backends:
+        _backends[vendor] = PostgresSearchBackend() if vendor == "postgresql" else InvertedIndexSearchBackend()
+    return _backends[vendor]
@@ -0,0 +1,178 @@
+import hashlib
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count, QuerySet
+from django.http import HttpRequest
+from django.utils.http import urlencode
+from django.utils.translation import get_language
+
+from products.constants import KEY_FOR_CACHE_PRODUCTS
+from products.filters import filter_by_details
+from products.models import Product, ProductDetail
+from products.utils import get_products_cache_version
+
+CatalogRow = namedtuple(
+    "CatalogRow",
+    ("pk", "name", "category", "avg_price", "reviews_count", "image", "date_of_publication"),
+)
+
+
+class CachedCatalogPage:
+    """
+    Закэшированная страница каталога, которую можно передать в Paginator вместо QuerySet.
+    Хранит только строки показываемой страницы и общее количество товаров.
+    """
+
+    def __init__(self, rows: List[CatalogRow], count: int) -> None:
+        self.rows = rows
+        self._count = count
+
+    def count(self) -> int:
+        return self._count
+
+    def __getitem__(self, item) -> List[CatalogRow]:
+        return self.rows
+
+
+class CatalogCacheService:
+    """Сервис кэширования вычисленных страниц каталога"""
+
+    # параметры, которые меняют порядок и позицию страницы, но не состав выборки
+    facets_ignored_params = ("cursor", "o")
+
+    def __init__(self, request: HttpRequest, page_kwarg: str = "page") -> None:
+        self.request = request
+        self.page_kwarg = page_kwarg
+        self.cache_key = self.get_cache_key()
+        self.facets_cache_key = self.get_facets_cache_key()
+
+    def get_params(self, exclude: Iterable[str] = ()) -> List[Tuple[str, str]]:
+        """
+        Возвращает нормализованные параметры фильтрации и сортировки без номера страницы
+        :param exclude: дополнительно исключаемые параметры
+        :return: отсортированный список пар ключ-значение
+        """
+
+        excluded = {self.page_kwarg, *exclude}
+        return sorted(
+            (key, value)
+            for key, values in self.request.GET.lists()
+            if key not in excluded
+            for value in values
+            if value != ""
+        )
+
+    def get_params_digest(self, exclude: Iterable[str] = ()) -> str:
+        """Функция для получения хэша нормализованных параметров"""
+
+        return hashlib.md5(urlencode(self.get_params(exclude)).encode("utf-8")).hexdigest()
+
+    def get_cache_key(self) -> str:
+        """Функция для получения ключа кэша страницы каталога"""
+
+        page = self.request.GET.get(self.page_kwarg) or "1"
+        digest = self.get_params_digest()
+        return f"{KEY_FOR_CACHE_PRODUCTS}:{get_products_cache_version()}:{get_language()}:{page}:{digest}"
+
+    def get_facets_cache_key(self) -> str:
+        """Функция для получения ключа кэша фасетов каталога, общего для всех страниц и сортировок выборки"""
+
+        digest = self.get_params_digest(self.facets_ignored_params)
+        return f"{KEY_FOR_CACHE_PRODUCTS}:facets:{get_products_cache_version()}:{digest}"
+
+    def get_or_set_facets(self, default: Callable[[], List[dict]], timeout: int) -> List[dict]:
+        """Возвращает закэшированные фасеты выборки или вычисляет их"""
+
+        return cache.get_or_set(self.facets_cache_key, default, timeout)
+
+    def get(self) -> Optional[Tuple[List[CatalogRow], int, int]]:
+        """
+        Возвращает закэшированную страницу каталога
+        :return: строки страницы, общее количество товаров и номер страницы, либо None
+        """
+
+        cached = cache.get(self.cache_key)
+        if cached is None:
+            return None
+        rows, count, number = cached
+        return [CatalogRow(*row) for row in rows], count, number
+
+    def set(self, products: Iterable[Product], count: int, number: int, timeout: int) -> List[CatalogRow]:
+        """
+        Кэширует строки показываемых товаров
+        :param products: товары страницы с аннотациями каталога
+        :param count: общее количество товаров
+        :param number: номер страницы
+        :param timeout: время действия кэша
+        :return: строки страницы
+        """
+
+        rows = [
+            CatalogRow(
+                product.pk,
+                product.name,
+                product.category.name if product.category_id else None,
+                product.avg_price,
+                product.reviews_count,
+                product.image,
+                product.date_of_publication,
+            )
+            for product in products
+        ]
+        cache.set(self.cache_key, ([tuple(row) for row in rows], count, number), timeout)
+        return rows
+
+
+class CatalogFacetService:
+    """
+    Сервис подсчёта фасетов по характеристикам для текущей выборки каталога.
+    Значения одной характеристики объединяются через ИЛИ, поэтому значения выбранной характеристики
+    считаются по выборке, отфильтрованной всеми остальными характеристиками, но не ей самой.
+
+    Args:
+        queryset (QuerySet): выборка каталога со всеми фильтрами, кроме фильтра по характеристикам
+        selected (dict): словарь id характеристики - множество выбранных значений
+    """
+
+    def __init__(self, queryset: QuerySet[Product], selected: Dict[int, Set[str]]) -> None:
+        self.queryset = queryset
+        self.selected = selected
+
+    def get_queryset(self, exclude: Optional[int] = None) -> QuerySet[Product]:
+        """Возвращает выборку, отфильтрованную всеми выбранными характеристиками, кроме exclude"""
+
+        selected = {detail_id: values for detail_id, values in self.selected.items() if detail_id != exclude}
+        return filter_by_details(self.queryset, selected)
+
+    @staticmethod
+    def count_values(queryset: QuerySet[Product]) -> QuerySet[ProductDetail]:
+        """Считает количество товаров выборки для каждой пары (характеристика, значение) одним групповым запросом"""
+
+        return (
+            ProductDetail.objects.filter(product__in=queryset.order_by().values("pk"))
+            .values_list("detail_id", "detail__name", "value")
+            .annotate(count=Count("product_id"))
+            .order_by()
+        )
+
+    def get_facets(self) -> List[dict]:
+        """
+        Считает фасеты: невыбранные характеристики одним запросом по всей выборке,
+        каждую выбранную характеристику - отдельным запросом без её собственного фильтра
+        :return: список характеристик со значениями, количеством товаров и признаком выбора
+        """
+
+        counts = list(self.count_values(self.get_queryset()).exclude(detail_id__in=list(self.selected)))
+        for detail_id in self.selected:
+            counts.extend(self.count_values(self.get_queryset(exclude=detail_id)).filter(detail_id=detail_id))
+        counts.sort(key=lambda row: (row[1], row[2]))
+
+        facets: Dict[int, dict] = {}
+        for detail_id, name, value, count in counts:
+            facet = facets.setdefault(detail_id, {"id": detail_id, "name": name, "options": []})
+            facet["options"].append(
+                {"value": value, "count": count, "selected": value in self.selected.get(detail_id, ())}
+            )
+        return list(facets.values())
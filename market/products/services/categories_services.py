@@ -0,0 +1,42 @@
+from collections import namedtuple
+from typing import List, Optional
+
+from django.core.cache import cache
+
+from products.constants import KEY_FOR_CACHE_CATEGORIES
+from products.models import Category
+
+CategoryNode = namedtuple("CategoryNode", ("pk", "name", "parent_id", "path", "depth"))
+
+
+class CategoryTreeService:
+    """Сервис для работы с закэшированным деревом категорий"""
+
+    @staticmethod
+    def build_tree() -> List[CategoryNode]:
+        """Строит плоский список категорий в порядке обхода дерева"""
+
+        categories = Category.objects.order_by("path").values_list("pk", "name", "parent_id", "path")
+        return [
+            CategoryNode(pk, name, parent_id, path, path.count("/") - 1) for pk, name, parent_id, path in categories
+        ]
+
+    def get_tree(self) -> List[CategoryNode]:
+        """
+        Возвращает дерево категорий из кэша
+        :return: список категорий, потомки идут сразу за родителем
+        """
+
+        return cache.get_or_set(KEY_FOR_CACHE_CATEGORIES, self.build_tree, timeout=None)
+
+    def get_path(self, category_id: int) -> Optional[str]:
+        """
+        Возвращает материализованный путь категории
+        :param category_id: id категории
+        :return: путь или None, если категории нет
+        """
+
+        for node in self.get_tree():
+            if node.pk == category_id:
+                return node.path
+        return None
@@ -0,0 +1,367 @@
+import itertools
+import json
+import logging
+from collections import namedtuple
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from django.db import connection, transaction
+from django.db.models import F
+from pydantic import BaseModel, Field, ValidationError
+
+from discounts.services import EffectivePriceService, get_discount_rules
+from products.constants import IMPORT_RESOLVE_LOCK_ID
+from products.models import Category, ImportJob, Product, ProductSummary
+from products.search import get_search_backend
+from products.utils import bump_cache_version, bump_products_cache_version
+from shops.constants import KEY_FOR_CACHE_OFFERS_VERSION
+from shops.models import Offer, Shop
+
+
+class ProductImportFile(BaseModel):
+    """Класс, заранее объявляющий необходимые поля для файла импорта"""
+
+    product_name: str = Field("None", alias="Товар")
+    product_description: str = Field("None", alias="Описание товара")
+    category: str = Field("None", alias="Категория товара")
+    shop_name: str = Field("None", alias="Магазин")
+    shop_description: str = Field("None", alias="Описание магазина")
+    phone: str = Field("None", alias="Телефон")
+    address: str = Field("None", alias="Адрес")
+    shop_email: str = Field("None", alias="Email")
+    offer_shop: str = Field("None", alias="Магазин оффера")
+    offer_product: str = Field("None", alias="Продукт оффера")
+    offer_price: int = Field("None", alias="Цена оффера")
+    remains: int = Field("None", alias="Остатки")
+
+    class Config:
+        """Параметр позволяющий использовать alias как ключ"""
+
+        populate_by_name = True
+
+    @property
+    def is_success(self) -> bool:
+        """Метод возвращает флаг, указывающий на то, все ли поля были указаны явно"""
+        fields_set = self.__fields_set__
+        all_fields = set(self.__fields__.keys())
+        return fields_set == all_fields
+
+
+ImportResult = namedtuple("ImportResult", ("parsed", "created", "updated", "failed", "errors"))
+
+
+class JsonArrayReader:
+    """
+    Потоковый разбор JSON-массива из файла без загрузки файла в память целиком
+
+    Args:
+        fp (TextIO): файл, открытый в текстовом режиме
+        buffer_size (int): размер читаемого блока в символах
+    """
+
+    def __init__(self, fp: TextIO, buffer_size: int = 64 * 1024) -> None:
+        self.fp = fp
+        self.buffer_size = buffer_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Дочитывает следующий блок файла, возвращает False в конце файла"""
+
+        chunk = self.fp.read(self.buffer_size)
+        position = self.position
+        self.buffer = self.buffer[position:] + chunk
+        self.position = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def next_char(self) -> str:
+        """Пропускает пробелы и возвращает следующий символ или пустую строку в конце файла"""
+
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ""
+
+    def read_item(self) -> Any:
+        """Разбирает очередной элемент массива, дочитывая файл, пока элемент не поместится в буфер"""
+
+        while True:
+            self.next_char()
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            if end < len(self.buffer) or self.eof:
+                self.position = end
+                return item
+            self.fill()
+
+    def __iter__(self) -> Iterator:
+        """
+        Возвращает элементы массива по одному
+        :raises: json.JSONDecodeError
+        """
+
+        if self.next_char() != "[":
+            raise json.JSONDecodeError("Ожидается массив", self.buffer, self.position)
+        self.position += 1
+        if self.next_char() == "]":
+            return
+        while True:
+            yield self.read_item()
+            char = self.next_char()
+            if char == "]":
+                return
+            if char != ",":
+                raise json.JSONDecodeError("Ожидается запятая", self.buffer, self.position)
+            self.position += 1
+
+
+class ProductImportService:
+    """
+    Потоковый импорт продуктов из JSON-файла поставщика.
+    Файл разбирается по элементам и обрабатывается пачками: для каждой пачки категории, магазины, товары
+    и предложения находятся одним запросом на модель, недостающие создаются через bulk_create,
+    а предложения создаются или обновляются одним bulk_create(update_conflicts=True).
+    Файлы импортируются параллельными задачами, поэтому категории, магазины и товары ищутся и создаются
+    под блокировкой (см. lock_resolve).
+    Как и раньше, после первой некорректной строки остальные строки файла не импортируются.
+
+    Args:
+        file_path (str): путь к файлу импорта
+        batch_size (int): размер пачки строк
+        row_logger (Logger): логгер строк импорта
+    """
+
+    batch_size = 1000
+    max_errors = 20
+
+    def __init__(
+        self,
+        file_path: str,
+        batch_size: Optional[int] = None,
+        row_logger: Optional[logging.Logger] = None,
+        job_id: Optional[int] = None,
+    ):
+        self.file_path = file_path
+        self.batch_size = batch_size or self.batch_size
+        self.row_logger = row_logger
+        self.job_id = job_id
+        self.parsed = self.created = self.updated = self.failed = 0
+        self.flushed = ImportResult(0, 0, 0, 0, None)
+        self.errors: List[str] = []
+
+    def flush_progress(self) -> None:
+        """Прибавляет к счётчикам задания импорта строки, обработанные с прошлого вызова, одним запросом UPDATE"""
+
+        if self.job_id is None:
+            return
+        ImportJob.objects.filter(pk=self.job_id).update(
+            rows_parsed=F("rows_parsed") + self.parsed - self.flushed.parsed,
+            rows_created=F("rows_created") + self.created - self.flushed.created,
+            rows_updated=F("rows_updated") + self.updated - self.flushed.updated,
+            rows_failed=F("rows_failed") + self.failed - self.flushed.failed,
+        )
+        self.flushed = ImportResult(self.parsed, self.created, self.updated, self.failed, None)
+
+    def add_error(self, error: str) -> None:
+        """Запоминает ошибку для отчёта, в отчёт попадают только первые max_errors ошибок"""
+
+        if len(self.errors) < self.max_errors:
+            self.errors.append(error)
+
+    def validate(self, obj: Any) -> Tuple[Optional[ProductImportFile], Optional[str]]:
+        """
+        Проверяет строку файла
+        :return: строка и описание ошибки или None, если строка корректна
+        """
+
+        try:
+            pif = ProductImportFile(**obj)
+        except (TypeError, ValidationError):
+            return None, f"Строка {self.parsed}: некорректные данные"
+        if not pif.is_success:
+            missing = [field.alias for name, field in pif.model_fields.items() if name not in pif.model_fields_set]
+            return pif, f"Строка {self.parsed}: не заполнены поля {', '.join(missing)}"
+        return pif, None
+
+    def get_rows(self, fp: TextIO) -> Iterator[ProductImportFile]:
+        """Возвращает корректные строки файла до первой некорректной, остальные строки считаются неуспешными"""
+
+        error_row = None
+        for obj in JsonArrayReader(fp):
+            self.parsed += 1
+            if error_row is None:
+                pif, error = self.validate(obj)
+                if error is None:
+                    yield pif
+                    continue
+                error_row = self.parsed
+                self.add_error(error)
+                if pif is not None:
+                    self.log_row(pif, False, logging.WARNING)
+            self.failed += 1
+        if error_row is not None and self.parsed > error_row:
+            self.add_error(f"Строки {error_row + 1}-{self.parsed} не импортированы после ошибки в строке {error_row}")
+
+    def log_row(self, pif: ProductImportFile, is_created: bool, level: int = logging.DEBUG) -> None:
+        """Пишет строку в лог импорта, некорректные строки пишутся с уровнем WARNING и не прореживаются"""
+
+        if self.row_logger is not None and self.row_logger.isEnabledFor(level):
+            log_data = pif.model_dump(exclude={"product_description", "shop_description"})
+            log_data["is_success"] = "Создан" if is_created else "Не создан"
+            self.row_logger.log(level, "", extra=log_data)
+
+    @staticmethod
+    def lock_resolve() -> None:
+        """
+        Блокирует поиск и создание категорий, магазинов и товаров до конца транзакции.
+        Файлы импортируются параллельными задачами, а у магазинов и товаров нет уникального ключа по названию,
+        поэтому без блокировки две задачи могут создать один и тот же магазин или товар дважды.
+        В SQLite запись и так выполняется одной транзакцией за раз.
+        """
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [IMPORT_RESOLVE_LOCK_ID])
+
+    @staticmethod
+    def get_categories(rows: List[ProductImportFile]) -> Dict[str, Category]:
+        """Находит категории пачки одним запросом, недостающие создаёт по одной, чтобы обновились пути дерева"""
+
+        names = {pif.category for pif in rows}
+        categories = Category.objects.in_bulk(names, field_name="name")
+        for name in names - categories.keys():
+            categories[name], _ = Category.objects.get_or_create(name=name)
+        return categories
+
+    @staticmethod
+    def get_shops(rows: List[ProductImportFile]) -> Dict[str, Shop]:
+        """Находит магазины пачки по названию одним запросом, недостающие создаёт одним bulk_create"""
+
+        shops: Dict[str, Shop] = {}
+        for shop in Shop.objects.filter(name__in={pif.shop_name for pif in rows}).order_by("-pk"):
+            shops[shop.name] = shop
+        missing = {
+            pif.shop_name: Shop(
+                name=pif.shop_name,
+                description=pif.shop_description,
+                phone=pif.phone,
+                address=pif.address,
+                email=pif.shop_email,
+            )
+            for pif in rows
+            if pif.shop_name not in shops
+        }
+        shops.update((shop.name, shop) for shop in Shop.objects.bulk_create(missing.values()))
+        return shops
+
+    @staticmethod
+    def get_products(
+        rows: List[ProductImportFile], categories: Dict[str, Category]
+    ) -> Tuple[Dict[Tuple[str, int], Product], List[int]]:
+        """
+        Находит товары пачки по названию и категории одним запросом, недостающие создаёт одним bulk_create
+        :return: словарь (название, id категории) - товар и id созданных товаров
+        """
+
+        products: Dict[Tuple[str, int], Product] = {}
+        existing = Product.objects.filter(
+            name__in={pif.product_name for pif in rows},
+            category__in=[categories[pif.category] for pif in rows],
+        ).order_by("-pk")
+        for product in existing:
+            products[(product.name, product.category_id)] = product
+        missing = {}
+        for pif in rows:
+            key = (pif.product_name, categories[pif.category].pk)
+            if key not in products:
+                missing[key] = Product(
+                    name=pif.product_name, category=categories[pif.category], description=pif.product_description
+                )
+        created = Product.objects.bulk_create(missing.values())
+        products.update((key, product) for key, product in zip(missing, created))
+        ProductSummary.objects.bulk_create(
+            [ProductSummary(product=product) for product in created], ignore_conflicts=True
+        )
+        return products, [product.pk for product in created]
+
+    def import_chunk(self, rows: List[ProductImportFile]) -> None:
+        """
+        Импортирует пачку корректных строк: категории, магазины и товары находятся и создаются в короткой
+        транзакции под блокировкой, предложения создаются или обновляются во второй транзакции
+        """
+
+        with transaction.atomic():
+            self.lock_resolve()
+            categories = self.get_categories(rows)
+            shops = self.get_shops(rows)
+            products, created_products = self.get_products(rows, categories)
+
+        with transaction.atomic():
+            offers: Dict[Tuple[int, int], Offer] = {}
+            for pif in rows:
+                shop = shops[pif.shop_name]
+                product = products[(pif.product_name, categories[pif.category].pk)]
+                offers[(shop.pk, product.pk)] = Offer(
+                    shop=shop, product=product, price=pif.offer_price, remains=pif.remains
+                )
+            shop_ids = {shop_id for shop_id, _ in offers}
+            product_ids = {product_id for _, product_id in offers}
+            existing = set(
+                Offer.objects.filter(shop__in=shop_ids, product__in=product_ids).values_list("shop_id", "product_id")
+            )
+            Offer.objects.bulk_create(
+                offers.values(),
+                update_conflicts=True,
+                unique_fields=["shop", "product"],
+                update_fields=["price", "remains"],
+            )
+
+            ProductSummary.objects.refresh_prices_many(product_ids)
+            prices = EffectivePriceService()
+            price_rows = Offer.objects.filter(shop__in=shop_ids, product__in=product_ids).values_list(
+                "pk", "product_id", "price"
+            )
+            prices.update_summary(prices.save_prices(price_rows, get_discount_rules()))
+            get_search_backend().update_many(created_products)
+
+        for pif in rows:
+            key = (shops[pif.shop_name].pk, products[(pif.product_name, categories[pif.category].pk)].pk)
+            is_created = key not in existing
+            existing.add(key)
+            if is_created:
+                self.created += 1
+            else:
+                self.updated += 1
+            self.log_row(pif, is_created)
+
+    def run(self) -> ImportResult:
+        """
+        Импортирует файл пачками
+        :return: количество разобранных, созданных, обновлённых и неуспешных строк и сообщения для отчёта
+        """
+
+        try:
+            with open(self.file_path, encoding="utf-8") as fp:
+                rows = self.get_rows(fp)
+                while chunk := list(itertools.islice(rows, self.batch_size)):
+                    self.import_chunk(chunk)
+                    self.flush_progress()
+        except json.JSONDecodeError:
+            self.failed += 1
+            self.add_error(f"Строка {self.parsed + 1}: некорректный JSON")
+        finally:
+            self.flush_progress()
+            if self.created or self.updated:
+                bump_products_cache_version()
+                bump_cache_version(KEY_FOR_CACHE_OFFERS_VERSION)
+        return ImportResult(self.parsed, self.created, self.updated, self.failed, self.errors)
@@ -0,0 +1,35 @@
+from django.db.models import Prefetch, QuerySet
+
+from products.models import Product, ProductDetail, ProductImage
+from shops.models import Offer
+
+
+class ProductPageLoader:
+    """
+    Загрузчик товара для детальной страницы.
+    Товар со сводкой, в которой хранится количество отзывов, выбирается одним запросом без агрегации,
+    предложения с магазинами, изображения и характеристики с названиями - ещё одним запросом на каждую связь
+    через prefetch_related, поэтому число запросов не зависит от количества предложений, изображений и отзывов.
+
+    Args:
+        with_details (bool): загружать ли характеристики товара, не нужно, если они уже есть в кэше
+    """
+
+    def __init__(self, with_details: bool = True) -> None:
+        self.with_details = with_details
+
+    def get_prefetches(self) -> list:
+        """Возвращает связи товара, загружаемые вместе с ним"""
+
+        prefetches = [
+            Prefetch("offers", queryset=Offer.objects.select_related("shop")),
+            Prefetch("product_images", queryset=ProductImage.objects.all()),
+        ]
+        if self.with_details:
+            prefetches.append(Prefetch("productdetail_set", queryset=ProductDetail.objects.select_related("detail")))
+        return prefetches
+
+    def get_queryset(self) -> QuerySet[Product]:
+        """Возвращает выборку товаров со сводкой и связями"""
+
+        return Product.objects.select_related("summary").prefetch_related(*self.get_prefetches())
@@ -17,8 +17,7 @@ class ProductsViewsService:
         """Добавляет товар в список просмотренных товаров"""
 
         if self.check_product_in_views():
-            views_last_obj = ProductsViews.objects.first().product
-            if self.product == views_last_obj:
+            if ProductsViews.objects.first().product_id == self.product.pk:
                 return
             else:
                 self.delete_product_from_views()
@@ -37,9 +36,7 @@ class ProductsViewsService:
         :return: флаг
         """
 
-        if ProductsViews.objects.filter(product=self.product):
-            return True
-        return False
+        return ProductsViews.objects.filter(product=self.product).exists()
 
     def get_views(self, count: int = 20) -> QuerySet[ProductsViews]:
         """
@@ -1,10 +1,10 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.db.models import QuerySet
+from django.core.paginator import InvalidPage
 from django.http import HttpRequest
 
 from products.models import Product, Review
+from products.pagination import KeysetPage, KeysetPaginator
 
 User = get_user_model()
 
@@ -16,31 +16,23 @@ class ReviewsService:
         self.request = request
         self.product = product
 
-    def get_reviews_for_product(self) -> (QuerySet[Review], int, bool):
+    def get_reviews_for_product(self) -> (KeysetPage, str, bool):
         """
-        Возвращает отзывы о выбранном товаре
-        :return: пагинатор; номер следующей страницы; флаг, есть ли следующая страницы
+        Возвращает отзывы о выбранном товаре.
+        Страницы выбираются по курсору (created_at, pk), без подсчёта всех отзывов и OFFSET.
+        :return: страница отзывов; курсор следующей страницы; флаг, есть ли следующая страница
         """
 
-        reviews: Review = Review.objects.filter(product=self.product).order_by("product_id")
-        paginator = Paginator(reviews, settings.PAGINATE_REVIEWS_BY)
-        page: str = self.request.GET.get("page")
+        reviews = Review.objects.filter(product=self.product).select_related("user")
+        paginator = KeysetPaginator(reviews, settings.PAGINATE_REVIEWS_BY, "-created_at")
+        cursor: str = self.request.GET.get("cursor")
 
         try:
-            reviews = paginator.page(page)
-        except PageNotAnInteger:
-            reviews = paginator.page(1)
-        except EmptyPage:
-            reviews = paginator.page(paginator.num_pages)
-
-        if reviews.has_next():
-            next_page: int = paginator.get_page(page).next_page_number()
-            has_next: bool = True
-        else:
-            next_page: int = 1
-            has_next: bool = False
-
-        return reviews, next_page, has_next
+            reviews = paginator.page(cursor)
+        except InvalidPage:
+            reviews = paginator.page()
+
+        return reviews, reviews.next_cursor, reviews.has_next()
 
     def get_reviews_count(self) -> int:
         """
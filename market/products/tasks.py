@@ -1,152 +1,152 @@
-import json
+import contextlib
 import logging
 import os
+import smtplib
 import shutil
+from typing import Optional
 
-from celery import shared_task
+from celery import chord, shared_task
 from django.conf import settings
-from django.core.cache import cache
-from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import F
 from django.utils import timezone
-from pydantic import BaseModel, Field
 
-from products.models import Product, Category
-from products.utils import send_email
-from shops.models import Shop, Offer
-
-from products.models import ProductImport
+from products.import_logging import flush_import_logger, get_import_logger
+from products.models import ImportJob, ImportStatus, ProductImport
+from products.services.import_services import ImportResult, ProductImportService
+from products.utils import close_email_connection, send_email
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-file_handler = logging.FileHandler(os.path.join("logs/import/products-import.log"))
-formatter = logging.Formatter(
-    "%(asctime)s - %(is_success)s - %(product_name)s - %(category)s - %(shop_name)s - %(phone)s - "
-    "%(address)s - %(shop_email)s - %(offer_shop)s - %(offer_product)s - %(offer_price)s - %(remains)s",
-    datefmt="%d-%b-%y %H:%M:%S",
-)
-
-logger.addHandler(file_handler)
-file_handler.setFormatter(formatter)
-
-CACHE_TTL = getattr(settings, "CACHE_TTL", DEFAULT_TIMEOUT)
-
-
-class ProductImportFile(BaseModel):
-    """Класс, заранее объявляющий необходимые поля для файла импорта"""
-
-    product_name: str = Field("None", alias="Товар")
-    product_description: str = Field("None", alias="Описание товара")
-    category: str = Field("None", alias="Категория товара")
-    shop_name: str = Field("None", alias="Магазин")
-    shop_description: str = Field("None", alias="Описание магазина")
-    phone: str = Field("None", alias="Телефон")
-    address: str = Field("None", alias="Адрес")
-    shop_email: str = Field("None", alias="Email")
-    offer_shop: str = Field("None", alias="Магазин оффера")
-    offer_product: str = Field("None", alias="Продукт оффера")
-    offer_price: int = Field("None", alias="Цена оффера")
-    remains: int = Field("None", alias="Остатки")
-
-    class Config:
-        """Параметр позволяющий использовать alias как ключ"""
-
-        populate_by_name = True
-
-    @property
-    def is_success(self) -> bool:
-        """Метод возвращает флаг, указывающий на то, все ли поля были указаны явно"""
-        fields_set = self.__fields_set__
-        all_fields = set(self.__fields__.keys())
-        return fields_set == all_fields
 
 
 @shared_task
-def import_products(file_ids: list[id], email: str = None) -> None:  # noqa
-    set_import_status("В процессе выполнения")
-    message = ""
-
-    for file_id in file_ids:
+def import_product_file(file_id: int) -> dict:
+    """
+    Импортирует один файл и перемещает его в папку успешных или неуспешных импортов.
+    Ошибка импорта не выходит за пределы задачи, а возвращается как неуспешный итог файла,
+    иначе chord не вызовет finish_import и задание импорта останется незавершённым
+    :param file_id: id загруженного файла ProductImport
+    :return: итоги импорта файла
+    """
+
+    job_id = file_path = service = None
+    try:
         file_obj = ProductImport.objects.get(id=file_id)
-        file_path = file_obj.file.path
-
-        success_location = os.path.join(settings.MEDIA_ROOT, "import/success/")
-        fail_location = os.path.join(settings.MEDIA_ROOT, "import/fail/")
-
-        with open(file_path, encoding="utf-8") as fp:
-            data = json.load(fp)
-
-        is_success = True
-        is_created = "Не создан"
-
-        for obj in data:
-            pif = ProductImportFile(**obj)
-
-            if not pif.is_success:
-                is_success = False
-
-            if is_success:
-                message += (
-                    f'Успешный импорт продуктов {timezone.now().strftime("%d-%b-%y %H:%M:%S")} от {pif.shop_name}\n'
-                )
-
-                created_category = Category.objects.get_or_create(name=pif.category)[0]
-                created_shop = Shop.objects.get_or_create(
-                    name=pif.shop_name,
-                    description=pif.shop_description,
-                    phone=pif.phone,
-                    address=pif.address,
-                    email=pif.shop_email,
-                )[0]
-                created_product, _ = Product.objects.get_or_create(
-                    name=pif.product_name,
-                    category=created_category,
-                    description=pif.product_description,
-                )
-                offer = Offer.objects.get_or_create(
-                    shop=created_shop,
-                    product=created_product,
-                    price=pif.offer_price,
-                    remains=pif.remains,
-                )[1]
-                created_shop.products.add(created_product)
-
-                if offer is True:
-                    set_import_status("Выполнен")
-                    is_created: str = "Создан"
-                else:
-                    set_import_status("Завершён с ошибкой")
-
-            else:
-                set_import_status("Завершён с ошибкой")
-                message += (
-                    f'Неуспешный импорт продуктов {timezone.now().strftime("%d-%b-%y %H:%M:%S")} от {pif.shop_name}\n'
-                )
-
-            log_data = pif.model_dump(exclude={"product_description", "shop_description"})
-            log_data["is_success"] = is_created
-            logger.debug("", extra=log_data)
-
-        if is_created == "Создан":
-            shutil.move(file_path, success_location)
-        else:
-            shutil.move(file_path, fail_location)
-
-    if email:
-        send_email(email, message)
+        job_id, file_path = file_obj.job_id, file_obj.file.path
+        service = ProductImportService(file_path, row_logger=get_import_logger(), job_id=job_id)
+        try:
+            result = service.run()
+        finally:
+            flush_import_logger()
+        is_success = not result.failed and bool(result.parsed)
+        location = "import/success/" if is_success else "import/fail/"
+        shutil.move(file_path, os.path.join(settings.MEDIA_ROOT, location))
+    except Exception as exc:
+        logger.exception("Ошибка импорта файла %s", file_id)
+        result = get_failed_result(service, f"Ошибка импорта файла: {exc}")
+        is_success = False
+        if file_path is not None and os.path.exists(file_path):
+            with contextlib.suppress(OSError):
+                shutil.move(file_path, os.path.join(settings.MEDIA_ROOT, "import/fail/"))
+
+    ImportJob.objects.filter(pk=job_id).update(files_done=F("files_done") + 1)
+    file_name = os.path.basename(file_path) if file_path else str(file_id)
+    return {**result._asdict(), "file_id": file_id, "file": file_name, "is_success": is_success}
+
+
+def get_failed_result(service: Optional[ProductImportService], error: str) -> ImportResult:
+    """
+    Возвращает итоги файла, импорт которого прерван исключением: счётчики уже обработанных строк и ошибку
+    :param service: сервис импорта файла или None, если он не был создан
+    :param error: текст ошибки
+    :return: итоги импорта файла
+    """
+
+    if service is None:
+        return ImportResult(0, 0, 0, 0, [error])
+    return ImportResult(service.parsed, service.created, service.updated, service.failed, [*service.errors, error])
+
+
+def build_import_report(results: list[dict], max_errors: int = ProductImportService.max_errors) -> str:
+    """
+    Собирает короткий отчёт об импорте: итоговые счётчики и первые max_errors ошибок
+    :param results: итоги импорта файлов
+    :param max_errors: количество ошибок в отчёте
+    :return: текст отчёта
+    """
+
+    totals = {key: sum(result[key] for result in results) for key in ("parsed", "created", "updated", "failed")}
+    lines = [
+        f'Импорт продуктов {timezone.now().strftime("%d-%b-%y %H:%M:%S")}',
+        f"Файлов: {len(results)}, успешно: {sum(result['is_success'] for result in results)}",
+        f"Строк разобрано: {totals['parsed']}, создано: {totals['created']}, "
+        f"обновлено: {totals['updated']}, с ошибкой: {totals['failed']}",
+    ]
+    errors = [f"{result['file']}: {error}" for result in results for error in result["errors"]]
+    if errors:
+        lines.append(f"Ошибки (показано {min(len(errors), max_errors)}):")
+        lines.extend(errors[:max_errors])
+    return "\n".join(lines)
 
 
-def get_import_status() -> str:
-    """Функция получения статуса импорта"""
-    status = cache.get("import_status")
-    if status:
-        return status
+@shared_task
+def finish_import(results: list[dict], job_id: int) -> str:
+    """
+    Собирает итоги импорта всех файлов и устанавливает итоговый статус задания
+    :param results: итоги импорта файлов
+    :param job_id: id задания импорта
+    :return: текст отчёта об импорте
+    """
+
+    is_success = all(result["is_success"] for result in results)
+    ImportJob.objects.filter(pk=job_id).update(
+        status=ImportStatus.DONE if is_success else ImportStatus.FAILED, finished_at=timezone.now()
+    )
+    return build_import_report(results)
+
+
+@shared_task(autoretry_for=(smtplib.SMTPException, OSError), retry_backoff=True, max_retries=5)
+def send_import_report(report: str, email: str) -> None:
+    """
+    Отправляет отчёт об импорте через общее соединение с почтовым сервером.
+    При ошибке соединение закрывается, и задача повторяется с нарастающей задержкой.
+    """
+
+    try:
+        send_email(email, report)
+    except (smtplib.SMTPException, OSError):
+        close_email_connection()
+        raise
+
+
+def create_import_job(file_ids: list[int], email: str = None) -> ImportJob:
+    """Создаёт задание импорта для загруженных файлов"""
+
+    job = ImportJob.objects.create(email=email or "", files_total=len(file_ids))
+    ProductImport.objects.filter(pk__in=file_ids).update(job=job)
+    return job
+
+
+@shared_task(bind=True)
+def import_products(self, file_ids: list[id], email: str = None, job_id: int = None) -> None:  # noqa
+    """
+    Запускает импорт файлов: каждый файл импортируется отдельной задачей, поэтому файлы
+    обрабатываются параллельно всеми воркерами, а итоги собирает задача finish_import.
+    При прямом вызове функции импорт выполняется синхронно в текущем процессе.
+    """
+
+    if job_id is None:
+        job_id = create_import_job(file_ids, email).pk
+    callback = finish_import.s(job_id=job_id)
+    if email:
+        callback |= send_import_report.s(email=email)
+    workflow = chord([import_product_file.s(file_id) for file_id in file_ids], callback)
+    if self.request.called_directly or self.request.is_eager:
+        workflow.apply()
     else:
-        set_import_status("Импорт не начался")
-        status = cache.get("import_status")
-        return status
+        workflow.apply_async()
 
 
-def set_import_status(status: str) -> None:
-    """Функция установки статуса импорта"""
-    cache.set("import_status", status, timeout=settings.CACHE_TTL)
+def get_import_status() -> str:
+    """Функция получения статуса последнего импорта"""
+    job = ImportJob.objects.first()
+    return job.get_status_display() if job else "Импорт не начался"
@@ -1,3 +1,4 @@
+from decimal import Decimal
 from typing import Dict
 
 from accounts.models import User
@@ -12,7 +13,10 @@ from products.models import (
     ProductImage,
     ProductsViews,
     ComparisonList,
+    ProductSummary,
 )
+from products.views import ProductListView
+from shops.models import Shop, Offer
 
 
 class ProductModelTest(TestCase):
@@ -114,6 +118,20 @@ class CategoryTest(TestCase):
     def test_assert_expected_num_of_categories(self):
         self.assertEqual(Category.objects.count(), 12)
 
+    def test_category_path(self):
+        """Проверка материализованного пути категорий, загруженных из фикстуры"""
+        self.assertEqual(Category.objects.get(pk=1).path, "1/")
+        self.assertEqual(Category.objects.get(pk=3).path, "1/3/")
+
+    def test_category_path_updated_on_move(self):
+        """Проверка пересчёта путей потомков при переносе категории"""
+        child = Category.objects.create(name="Подкатегория", parent_id=3)
+        parent = Category.objects.get(pk=1)
+        parent.parent_id = 2
+        parent.save()
+        self.assertEqual(Category.objects.get(pk=3).path, "2/1/3/")
+        self.assertEqual(Category.objects.get(pk=child.pk).path, f"2/1/3/{child.pk}/")
+
 
 class BannerModelTest(TestCase):
     """Класс тестов модели Banner"""
@@ -286,3 +304,76 @@ class ComparisonListTest(TestCase):
         comparison_list.products.clear()
 
         self.assertEqual(comparison_list.products.count(), 0)
+
+
+class ProductSummaryTest(TestCase):
+    """Класс тестов сводной таблицы каталога"""
+
+    fixtures = [
+        "fixtures/04-shops.json",
+        "fixtures/05-categories.json",
+        "fixtures/06-products.json",
+        "fixtures/08-offers.json",
+        "fixtures/11-product-images.json",
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="summary@email.ru", password="qwerty")
+        self.product = Product.objects.create(name="Тестовый продукт")
+        self.shops = Shop.objects.all()[:2]
+
+    def test_summary_created_with_product(self):
+        """Тестирование создания строки сводки вместе с продуктом"""
+
+        summary = ProductSummary.objects.get(product=self.product)
+        self.assertEqual(summary.reviews_count, 0)
+        self.assertIsNone(summary.avg_price)
+        self.assertIsNone(summary.image)
+
+    def test_summary_fixtures_prices(self):
+        """Тестирование заполнения сводки при загрузке фикстур"""
+
+        product = Product.objects.get(pk=1)
+        prices = [offer.price for offer in product.offers.all()]
+        self.assertEqual(product.summary.min_price, min(prices))
+        self.assertEqual(product.summary.image, "products/iPhone/iphone1.jpeg")
+
+    def test_summary_refresh_on_offers(self):
+        """Тестирование пересчёта цен при изменении предложений"""
+
+        Offer.objects.create(shop=self.shops[0], product=self.product, price=100)
+        offer = Offer.objects.create(shop=self.shops[1], product=self.product, price=201)
+        summary = ProductSummary.objects.get(product=self.product)
+        self.assertEqual(summary.avg_price, Decimal("150.50"))
+        self.assertEqual(summary.min_price, Decimal("100"))
+
+        offer.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.avg_price, Decimal("100"))
+
+    def test_summary_refresh_on_reviews_and_images(self):
+        """Тестирование пересчёта отзывов и изображения"""
+
+        review = Review.objects.create(product=self.product, user=self.user, text="Отзыв")
+        ProductImage.objects.create(product=self.product, image="products/test/2.jpg", sort_image=2)
+        ProductImage.objects.create(product=self.product, image="products/test/1.jpg", sort_image=1)
+        summary = ProductSummary.objects.get(product=self.product)
+        self.assertEqual(summary.reviews_count, 1)
+        self.assertEqual(summary.image, "products/test/1.jpg")
+
+        review.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.reviews_count, 0)
+
+    def test_summary_without_images(self):
+        """Тестирование, что у продукта без изображений основное изображение пустое, а не префикс MEDIA_URL"""
+
+        image = ProductImage.objects.create(product=self.product, image="products/test/1.jpg", sort_image=1)
+        image.delete()
+        self.assertIsNone(ProductSummary.objects.get(product=self.product).image)
+
+        product = ProductListView().get_queryset().get(pk=self.product.pk)
+        self.assertIsNone(product.image)
+        self.assertTrue(
+            ProductListView().get_queryset().get(pk=1).image.endswith("uploads/products/iPhone/iphone1.jpeg")
+        )
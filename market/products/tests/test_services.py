@@ -0,0 +1,369 @@
+import io
+import json
+import email
+import logging
+import os
+import socketserver
+import tempfile
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DataError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.constants import IMPORT_RESOLVE_LOCK_ID
+from products.import_logging import ImportLogHandler, SamplingFilter
+from products.models import Category, ImportJob, ImportStatus, Product, ProductImport, ProductSummary
+from products.services.import_services import JsonArrayReader, ProductImportService
+from products.tasks import (
+    build_import_report,
+    finish_import,
+    get_import_status,
+    import_product_file,
+    import_products,
+    send_import_report,
+)
+from products.utils import close_email_connection
+from shops.models import Offer, Shop
+
+TEST_FILES_DIR = os.path.join(os.path.dirname(__file__), "test_files")
+
+
+class JsonArrayReaderTest(TestCase):
+    """Класс тестов потокового разбора JSON-массива"""
+
+    def test_read_with_small_buffer(self):
+        data = [{"name": "Товар, [1]", "price": 100}, 12345, None, {"nested": {"list": [1, 2]}}]
+        reader = JsonArrayReader(io.StringIO(json.dumps(data, ensure_ascii=False, indent=2)), buffer_size=3)
+        self.assertEqual(list(reader), data)
+
+    def test_invalid_json(self):
+        for text in ("", "{}", "[1,", "[1 2]"):
+            with self.subTest(text=text), self.assertRaises(json.JSONDecodeError):
+                list(JsonArrayReader(io.StringIO(text), buffer_size=2))
+
+
+class ProductImportServiceTest(TestCase):
+    """Класс тестов потокового импорта продуктов"""
+
+    def setUp(self):
+        self.file_path = os.path.join(TEST_FILES_DIR, "test_valid_file.json")
+
+    def test_import(self):
+        """Проверка создания товаров и предложений пачками и обновления при повторном импорте"""
+
+        result = ProductImportService(self.file_path, batch_size=2).run()
+        self.assertEqual((result.parsed, result.created, result.updated, result.failed), (5, 5, 0, 0))
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(Offer.objects.count(), 5)
+        self.assertEqual(ProductSummary.objects.filter(min_price__isnull=False).count(), 5)
+        self.assertTrue(all(category.path for category in Category.objects.all()))
+
+        Offer.objects.update(price=1, remains=0)
+        result = ProductImportService(self.file_path, batch_size=2).run()
+        self.assertEqual((result.created, result.updated), (0, 5))
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(Shop.objects.count(), len(set(Offer.objects.values_list("shop_id", flat=True))))
+        self.assertFalse(Offer.objects.filter(price=1).exists())
+
+    def test_queries_do_not_depend_on_rows_count(self):
+        """Проверка, что количество запросов на пачку не зависит от количества строк"""
+
+        ProductImportService(self.file_path).run()
+        with open(self.file_path, encoding="utf-8") as fp:
+            first_row = json.load(fp)[:1]
+        with tempfile.NamedTemporaryFile("w", suffix=".json", encoding="utf-8", delete=False) as fp:
+            json.dump(first_row, fp, ensure_ascii=False)
+        self.addCleanup(os.remove, fp.name)
+
+        with CaptureQueriesContext(connection) as one_row:
+            ProductImportService(fp.name).run()
+        with CaptureQueriesContext(connection) as five_rows:
+            ProductImportService(self.file_path).run()
+        self.assertEqual(len(five_rows), len(one_row))
+
+    def test_category_created_by_concurrent_import(self):
+        """Проверка, что категория, созданная параллельной задачей после поиска, не приводит к IntegrityError"""
+
+        with open(self.file_path, encoding="utf-8") as fp:
+            names = {row["Категория товара"] for row in json.load(fp)}
+        for name in names:
+            Category.objects.create(name=name)
+
+        with mock.patch.object(type(Category.objects), "in_bulk", return_value={}):
+            result = ProductImportService(self.file_path).run()
+        self.assertEqual(result.created, 5)
+        self.assertEqual(Category.objects.count(), len(names))
+
+    def test_resolve_lock_on_postgresql(self):
+        """Проверка, что в PostgreSQL поиск и создание магазинов и товаров идут под advisory-блокировкой"""
+
+        with mock.patch.object(connection, "vendor", "postgresql"), mock.patch.object(connection, "cursor") as cursor:
+            ProductImportService.lock_resolve()
+        cursor.return_value.__enter__.return_value.execute.assert_called_once_with(
+            "SELECT pg_advisory_xact_lock(%s)", [IMPORT_RESOLVE_LOCK_ID]
+        )
+
+    def test_invalid_rows(self):
+        """Проверка, что строки после первой некорректной не импортируются"""
+
+        result = ProductImportService(os.path.join(TEST_FILES_DIR, "test_invalid_file.json")).run()
+        self.assertEqual((result.parsed, result.created, result.failed), (5, 0, 5))
+        self.assertFalse(Product.objects.exists())
+
+
+class ImportLogHandlerTest(TestCase):
+    """Класс тестов буферизованного лога строк импорта"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_path = os.path.join(directory.name, "import", "products-import.log")
+        self.logger = logging.getLogger("products.import.test")
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+
+    def run_import(self, file_name: str, **handler_kwargs) -> list:
+        handler = ImportLogHandler(self.log_path, **handler_kwargs)
+        self.logger.addHandler(handler)
+        try:
+            ProductImportService(os.path.join(TEST_FILES_DIR, file_name), row_logger=self.logger).run()
+            handler.flush()
+        finally:
+            self.logger.removeHandler(handler)
+            handler.close()
+        with open(self.log_path, encoding="utf-8") as fp:
+            return fp.read().splitlines()
+
+    def test_text_format(self):
+        """Проверка, что после flush в файле есть все строки импорта в прежнем формате"""
+
+        lines = self.run_import("test_valid_file.json")
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(all(" - Создан - " in line for line in lines))
+
+    def test_json_lines_format(self):
+        """Проверка компактного формата JSON Lines"""
+
+        lines = self.run_import("test_valid_file.json", log_format="json")
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row["is_success"] for row in rows}, {"Создан"})
+        self.assertTrue(all(row["product_name"] and row["level"] == "DEBUG" for row in rows))
+
+    def test_sampling(self):
+        """Проверка, что успешные строки прореживаются, а строки с ошибками пишутся всегда"""
+
+        self.assertEqual(len(self.run_import("test_valid_file.json", sample_rate=2)), 2)
+        os.remove(self.log_path)
+        lines = self.run_import("test_invalid_file.json", log_format="json", sample_rate=100)
+        self.assertEqual([json.loads(line)["level"] for line in lines], ["WARNING"])
+
+    def test_sample_level(self):
+        """Проверка, что уровень прореживания задаётся именем в любом регистре, а неизвестный уровень отклоняется"""
+
+        self.assertEqual(SamplingFilter(level="error").level, logging.ERROR)
+        self.assertEqual(SamplingFilter(level=logging.INFO).level, logging.INFO)
+        with self.assertRaises(ValueError):
+            SamplingFilter(level="WARNIGN")
+
+    def test_records_after_flush_are_written(self):
+        """Проверка, что записи после flush() снова запускают поток записи и попадают в файл"""
+
+        handler = ImportLogHandler(self.log_path, log_format="json")
+        self.addCleanup(handler.close)
+        for message in ("first", "second"):
+            handler.handle(logging.makeLogRecord({"levelno": logging.DEBUG, "msg": message}))
+            handler.flush()
+        self.assertIsNone(handler.listener)
+        with open(self.log_path, encoding="utf-8") as fp:
+            self.assertEqual(len(fp.read().splitlines()), 2)
+
+
+class ImportTasksTest(TestCase):
+    """Класс тестов задач импорта продуктов"""
+
+    def test_import_products_fans_out_per_file(self):
+        """Проверка, что каждый файл импортируется отдельной задачей, а итоги собирает finish_import"""
+
+        with mock.patch("products.tasks.chord") as workflow:
+            import_products(file_ids=[1, 2, 3], email="admin@example.com")
+
+        header, body = workflow.call_args.args
+        self.assertEqual([signature.args for signature in header], [(1,), (2,), (3,)])
+        self.assertEqual({signature.task for signature in header}, {import_product_file.name})
+        job = ImportJob.objects.get()
+        self.assertEqual(
+            [(task.task, task.kwargs) for task in body.tasks],
+            [(finish_import.name, {"job_id": job.pk}), (send_import_report.name, {"email": "admin@example.com"})],
+        )
+        self.assertEqual((job.status, job.files_total), (ImportStatus.RUNNING, 3))
+        workflow.return_value.apply.assert_called_once()
+
+    def test_finish_import(self):
+        """Проверка итогового статуса и короткого отчёта по итогам всех файлов"""
+
+        result = {"parsed": 30, "created": 10, "updated": 0, "failed": 20}
+        results = [
+            {**result, "file": "first.json", "is_success": True, "errors": []},
+            {**result, "file": "second.json", "is_success": False, "errors": [f"Строка {i}" for i in range(20)]},
+        ]
+        job = ImportJob.objects.create(files_total=2)
+        report = finish_import(results, job_id=job.pk)
+
+        self.assertIn("Файлов: 2, успешно: 1", report)
+        self.assertIn("Строк разобрано: 60, создано: 20, обновлено: 0, с ошибкой: 40", report)
+        self.assertIn("second.json: Строка 19", report)
+        self.assertEqual(build_import_report(results, max_errors=5).count("second.json"), 5)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportStatus.FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(get_import_status(), "Завершён с ошибкой")
+
+    def test_failed_file_finishes_job(self):
+        """Проверка, что исключение при импорте одного файла не оставляет задание незавершённым"""
+
+        run = ProductImportService.run
+
+        def run_or_fail(service):
+            if service.file_path.endswith("broken.json"):
+                raise DataError("value too long for type character varying(255)")
+            return run(service)
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            for location in ("import/success", "import/fail"):
+                os.makedirs(os.path.join(media_root, location))
+            file_ids = []
+            for name in ("test_valid_file.json", "broken.json"):
+                with open(os.path.join(TEST_FILES_DIR, "test_valid_file.json"), "rb") as file:
+                    file_ids.append(ProductImport.objects.create(file=SimpleUploadedFile(name, file.read())).pk)
+            with mock.patch.object(ProductImportService, "run", autospec=True, side_effect=run_or_fail):
+                with mock.patch("products.tasks.send_import_report.run") as send_report, self.assertLogs(
+                    "products.tasks"
+                ):
+                    import_products(file_ids=file_ids, email="admin@example.com")
+            self.assertEqual(len(os.listdir(os.path.join(media_root, "import/success"))), 1)
+            self.assertEqual(len(os.listdir(os.path.join(media_root, "import/fail"))), 1)
+
+        job = ImportJob.objects.get()
+        self.assertEqual((job.status, job.files_done), (ImportStatus.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+        report = send_report.call_args.args[0]
+        self.assertIn("Файлов: 2, успешно: 1", report)
+        self.assertIn("broken.json: Ошибка импорта файла: value too long", report)
+
+    def test_job_progress(self):
+        """Проверка счётчиков задания, обновляемых после каждой пачки, и JSON-прогресса в админке"""
+
+        job = ImportJob.objects.create(files_total=1)
+        file_path = os.path.join(TEST_FILES_DIR, "test_valid_file.json")
+        with CaptureQueriesContext(connection) as context:
+            ProductImportService(file_path, batch_size=2, job_id=job.pk).run()
+        updates = [query for query in context.captured_queries if 'UPDATE "products_importjob"' in query["sql"]]
+        self.assertEqual(len(updates), 4)
+        ProductImportService(file_path, job_id=job.pk).run()
+
+        user = get_user_model().objects.create_superuser(email="admin@example.com", password="password")
+        self.client.force_login(user)
+        response = self.client.get(reverse("admin:import_job_progress", kwargs={"pk": job.pk}))
+        progress = response.json()
+        self.assertEqual(
+            [progress[key] for key in ("rows_parsed", "rows_created", "rows_updated", "rows_failed")], [10, 5, 5, 0]
+        )
+        self.assertEqual(progress["status"], ImportStatus.RUNNING)
+
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    """Обработчик минимального SMTP-сервера: принимает письма и сохраняет их на сервере"""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost ESMTP")
+        lines = None
+        for raw in self.rfile:
+            line = raw.rstrip(b"\r\n")
+            if lines is not None:
+                if line == b".":
+                    self.server.messages.append(email.message_from_bytes(b"\n".join(lines)))
+                    lines = None
+                    self.reply("250 OK")
+                else:
+                    lines.append(line[1:] if line.startswith(b"..") else line)
+                continue
+            command = line[:4].decode("ascii").upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                lines = []
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Локальный SMTP-сервер вместо настоящего почтового сервера"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), LocalSMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+
+class SendImportReportTest(TestCase):
+    """Класс тестов отправки отчёта об импорте"""
+
+    def setUp(self):
+        server = LocalSMTPServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+
+        email_settings = self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=server.server_address[1],
+            EMAIL_USE_SSL=False,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            DEFAULT_FROM_EMAIL="shop@example.com",
+        )
+        email_settings.enable()
+        self.addCleanup(email_settings.disable)
+        self.addCleanup(close_email_connection)
+
+    def test_reports_share_connection(self):
+        """Проверка отправки отчётов через одно соединение с почтовым сервером"""
+
+        send_import_report("Первый отчёт", email="admin@example.com")
+        send_import_report("Второй отчёт", email="manager@example.com")
+
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(
+            [message["To"] for message in self.server.messages], ["admin@example.com", "manager@example.com"]
+        )
+        self.assertEqual(self.server.messages[0].get_payload(decode=True).decode("utf-8").strip(), "Первый отчёт")
+
+    def test_reconnect_after_failure(self):
+        """Проверка, что после ошибки отправки следующий отчёт открывает новое соединение"""
+
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError):
+            with self.assertRaises(OSError):
+                send_import_report("Отчёт", email="admin@example.com")
+        send_import_report("Отчёт", email="admin@example.com")
+
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(len(self.server.messages), 1)
@@ -1,6 +1,6 @@
 from unittest.mock import patch
 
-from django.db.models import Avg
+from django.db.models import Avg, F
 from django.db.models.functions import Round
 import os
 
@@ -11,11 +11,29 @@ from django.test import TestCase
 from django.urls import reverse_lazy
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
-from django.test import Client
-
-from products.models import Product, ProductsViews, ComparisonList, ProductImport
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from django.utils.http import urlencode
+
+from products.models import (
+    Category,
+    ComparisonList,
+    Detail,
+    Product,
+    ProductDetail,
+    ProductImage,
+    ProductImport,
+    ProductsViews,
+    Review,
+)
+from products.search import get_search_backend
+from products.services.catalog_services import CatalogCacheService
 from products.services.products_views_services import ProductsViewsService
 from products.tasks import import_products
+from products.views import ProductDetailView
+from shops.models import Offer, Shop
 
 User = get_user_model()
 
@@ -119,6 +137,227 @@ class TestProductListView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context_data["object_list"][0].image, "/uploads/products/Smeg/smeg1.jpg")
 
+    def test_catalog_page_cached(self):
+        """Проверка кэширования вычисленной страницы каталога"""
+
+        url = reverse("products:product-list") + "?o=avg_price&page=2"
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url)
+        self.assertFalse([query for query in queries if "products_product" in query["sql"]])
+        self.assertEqual(first.context_data["object_list"], second.context_data["object_list"])
+        self.assertEqual(second.context_data["page_obj"].number, 2)
+
+    def test_catalog_cursor_pagination(self):
+        """Проверка keyset-пагинации каталога: страницы по курсору покрывают весь каталог без повторов"""
+
+        url = reverse("products:product-list") + "?o=-avg_price&cursor="
+        seen = []
+        while url:
+            response = self.client.get(url)
+            page = response.context_data["page_obj"]
+            seen.extend(product.pk for product in page)
+            self.assertFalse(page.has_previous())
+            url = None
+            if page.has_next():
+                url = reverse("products:product-list") + f"?o=-avg_price&cursor={page.next_cursor}"
+
+        expected = list(
+            Product.objects.order_by(F("summary__avg_price").desc(nulls_last=True), "-pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_catalog_invalid_cursor(self):
+        """Проверка ответа на некорректный курсор"""
+
+        response = self.client.get(reverse("products:product-list") + "?cursor=broken")
+        self.assertEqual(response.status_code, 404)
+
+    def test_catalog_cache_invalidated_on_product_change(self):
+        """Проверка сброса кэша каталога при изменении продукта"""
+
+        url = reverse("products:product-list") + "?name__icontains=smeg"
+        self.client.get(url)
+        Product.objects.create(name="Smeg 2")
+        response = self.client.get(url)
+        self.assertEqual(len(response.context_data["object_list"]), 2)
+
+
+class ProductFacetTest(TestCase):
+    """Класс тестов фасетного фильтра по характеристикам"""
+
+    fixtures = [
+        "04-shops.json",
+        "05-categories.json",
+        "06-products.json",
+        "08-offers.json",
+        "17-details.json",
+        "18-product-details.json",
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    @patch("products.views.ProductListView.paginate_by", None)
+    def test_filter_by_detail_values(self):
+        """Проверка фильтра по нескольким значениям одной характеристики"""
+
+        values = list(ProductDetail.objects.filter(detail_id=1).values_list("value", flat=True).distinct()[:2])
+        url = reverse("products:product-list") + "?" + urlencode([("detail", f"1:{value}") for value in values])
+        response = self.client.get(url)
+        expected = set(
+            ProductDetail.objects.filter(detail_id=1, value__in=values).values_list("product_id", flat=True)
+        )
+        self.assertEqual({product.pk for product in response.context_data["object_list"]}, expected)
+
+    @patch("products.views.ProductListView.paginate_by", None)
+    def test_facet_counts(self):
+        """Проверка подсчёта фасетов: выбранная характеристика считается без собственного фильтра"""
+
+        value = ProductDetail.objects.filter(detail_id=1).values_list("value", flat=True).first()
+        url = reverse("products:product-list") + "?" + urlencode({"detail": f"1:{value}"})
+        response = self.client.get(url)
+        products = response.context_data["object_list"]
+        facets = {facet["id"]: facet for facet in response.context_data["facets"]}
+
+        ram = {option["value"]: option for option in facets[1]["options"]}
+        self.assertEqual(ram[value]["count"], len(products))
+        self.assertTrue(ram[value]["selected"])
+        for facet in facets.values():
+            for option in facet["options"]:
+                expected = ProductDetail.objects.filter(detail_id=facet["id"], value=option["value"])
+                if facet["id"] != 1:
+                    expected = expected.filter(product__in=products)
+                self.assertEqual(option["count"], expected.count())
+
+    @patch("products.views.ProductListView.paginate_by", None)
+    def test_selected_detail_keeps_other_values(self):
+        """Проверка, что выбор значения характеристики не обнуляет другие значения этой характеристики"""
+
+        values = list(ProductDetail.objects.filter(detail_id=1).values_list("value", flat=True).distinct())
+        self.assertGreater(len(values), 1)
+        url = reverse("products:product-list") + "?" + urlencode({"detail": f"1:{values[0]}"})
+        response = self.client.get(url)
+        facets = {facet["id"]: facet for facet in response.context_data["facets"]}
+
+        ram = {option["value"]: option["count"] for option in facets[1]["options"]}
+        self.assertEqual(set(ram), set(values))
+        for other in values[1:]:
+            self.assertEqual(ram[other], ProductDetail.objects.filter(detail_id=1, value=other).count())
+
+    def test_facets_cache_key_shared_by_pages_and_orderings(self):
+        """Проверка, что фасеты кэшируются одним ключом для всех страниц, курсоров и сортировок выборки"""
+
+        def get_key(query: str) -> str:
+            return CatalogCacheService(RequestFactory().get(f"/?{query}")).facets_cache_key
+
+        key = get_key("detail=1:8")
+        for query in ("detail=1:8&page=2", "detail=1:8&o=-avg_price", "detail=1:8&o=name&cursor=abc"):
+            with self.subTest(query=query):
+                self.assertEqual(get_key(query), key)
+        self.assertNotEqual(get_key("detail=1:16"), key)
+
+
+class ProductCategoryFilterTest(TestCase):
+    """Класс тестов фильтра каталога по дереву категорий"""
+
+    fixtures = [
+        "04-shops.json",
+        "05-categories.json",
+        "06-products.json",
+        "08-offers.json",
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    @patch("products.views.ProductListView.paginate_by", None)
+    def test_filter_by_category_with_descendants(self):
+        """Проверка, что фильтр по категории включает товары подкатегорий"""
+
+        response = self.client.get(reverse("products:product-list") + "?category=1")
+        expected = set(Product.objects.filter(category_id__in=[1, 3, 4]).values_list("pk", flat=True))
+        self.assertEqual({product.pk for product in response.context_data["object_list"]}, expected)
+
+    @patch("products.views.ProductListView.paginate_by", None)
+    def test_filter_by_unknown_category(self):
+        """Проверка пустой выборки для несуществующей категории"""
+
+        response = self.client.get(reverse("products:product-list") + "?category=999")
+        self.assertEqual(list(response.context_data["object_list"]), [])
+
+    def test_category_tree_cached(self):
+        """Проверка, что дерево категорий в шапке берётся из кэша и сбрасывается при изменении категории"""
+
+        self.client.get(reverse("products:product-list"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("products:product-list"))
+        self.assertFalse([query for query in queries if "products_category" in query["sql"]])
+
+        category = Category.objects.create(name="Новая категория", parent_id=1)
+        response = self.client.get(reverse("products:product-list"))
+        self.assertContains(response, f"?category={category.pk}")
+
+
+class ProductSearchTest(TestCase):
+    """Класс тестов полнотекстового поиска по каталогу"""
+
+    fixtures = [
+        "04-shops.json",
+        "05-categories.json",
+        "06-products.json",
+        "08-offers.json",
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        get_search_backend().clear()
+
+    def search(self, query: str) -> list:
+        url = reverse("products:product-list") + f"?q={query}"
+        with patch("products.views.ProductListView.paginate_by", None):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context_data["object_list"])
+
+    def test_search_by_name(self):
+        """Проверка поиска по названию"""
+
+        products = self.search("smeg")
+        self.assertTrue(products)
+        self.assertEqual(products[0].name, "Smeg")
+
+    def test_search_with_typo(self):
+        """Проверка поиска с опечаткой"""
+
+        products = self.search("iphine")
+        self.assertIn("iPhone", [product.name for product in products])
+
+    def test_search_relevance_order(self):
+        """Проверка сортировки по релевантности: совпадение в названии выше совпадения в описании"""
+
+        Product.objects.create(name="Чехол", description="Чехол для smeg")
+        products = self.search("smeg")
+        self.assertEqual([product.name for product in products][:2], ["Smeg", "Чехол"])
+
+    def test_search_ignores_cursor(self):
+        """Проверка, что при поиске курсор не отменяет сортировку по релевантности"""
+
+        Product.objects.create(name="Чехол", description="Чехол для smeg")
+        response = self.client.get(reverse("products:product-list") + "?q=smeg&cursor=")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.context_data["page_obj"], "next_cursor"))
+        self.assertEqual([product.name for product in response.context_data["object_list"]][:2], ["Smeg", "Чехол"])
+
+    def test_search_index_updated_on_save(self):
+        """Проверка обновления индекса при сохранении и удалении продукта"""
+
+        self.search("smeg")
+        product = Product.objects.create(name="Квазар")
+        self.assertEqual([item.pk for item in self.search("квазар")], [product.pk])
+        product.delete()
+        self.assertEqual(self.search("квазар"), [])
+
 
 class ProductDetailReviewTest(TestCase):
     """Класс тестов представлений отзывов детальной страницы продукта"""
@@ -152,6 +391,18 @@ class ProductDetailReviewTest(TestCase):
         self.assertEqual(reviews.number, 1)
         self.assertEqual(len(reviews), 3)
 
+    def test_view_reviews_next_cursor(self):
+        """Тестирование перехода к следующей странице отзывов по курсору"""
+
+        pk: int = 1
+        first = self.client.get(reverse("products:product-detail", args=[pk]))
+        cursor = first.context_data.get("next_page")
+        response = self.client.get(reverse("products:product-detail", args=[pk]) + f"?cursor={cursor}")
+        reviews = response.context_data.get("reviews")
+
+        self.assertEqual(reviews.number, 2)
+        self.assertFalse(set(first.context_data["reviews"]) & set(reviews))
+
     def test_view_without_reviews(self):
         """Тестирование контекста без отзывов"""
 
@@ -204,6 +455,80 @@ class ProductDetailViewTest(TestCase):
         self.assertContains(response, self.product)
 
 
+class ProductDetailViewQueriesTest(TestCase):
+    """Класс тестов количества запросов детальной страницы продукта"""
+
+    fixtures = [
+        "fixtures/01-users.json",
+        "fixtures/01-users-permissions.json",
+        "fixtures/01-groups.json",
+        "fixtures/04-shops.json",
+        "fixtures/05-categories.json",
+        "fixtures/06-products.json",
+        "fixtures/08-offers.json",
+        "fixtures/11-product-images.json",
+        "fixtures/16-reviews.json",
+        "fixtures/17-details.json",
+        "fixtures/18-product-details.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.get(pk=1)
+        self.product = Product.objects.get(pk=1)
+        self.url = reverse("products:product-detail", args=[self.product.pk])
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+
+    def get_queries_count(self) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_depend_on_related_objects(self):
+        """Проверка, что число запросов не зависит от количества предложений, изображений, отзывов и характеристик"""
+
+        with self.assertNumQueries(10):
+            self.client.get(self.url)
+        ProductDetailView.clear_cache_for_product_detail(self.product.pk)
+        queries_count = self.get_queries_count()
+
+        for shop in Shop.objects.exclude(offers__product=self.product):
+            Offer.objects.create(shop=shop, product=self.product, price=100, remains=1)
+        for index in range(5):
+            ProductImage.objects.create(product=self.product, image=f"products/test/{index}.jpeg", sort_image=index)
+            Review.objects.create(product=self.product, user=self.user, text=f"Отзыв {index}")
+        for detail in Detail.objects.exclude(productdetail__product=self.product):
+            ProductDetail.objects.create(product=self.product, detail=detail, value="1")
+
+        self.assertEqual(self.get_queries_count(), queries_count)
+
+    def test_product_query_without_aggregation(self):
+        """Проверка, что количество отзывов берётся из сводки товара без агрегации по отзывам"""
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        sql = next(query["sql"] for query in queries if 'FROM "products_product"' in query["sql"])
+        self.assertIn("products_productsummary", sql)
+        self.assertNotIn("GROUP BY", sql)
+
+    def test_context(self):
+        """Проверка данных страницы, собранных загрузчиком"""
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context_data["reviews_count"], Review.objects.filter(product=self.product).count())
+        self.assertEqual(
+            {offer.pk for offer in response.context_data["offers"]},
+            set(Offer.objects.filter(product=self.product).values_list("pk", flat=True)),
+        )
+        self.assertEqual(
+            len(response.context_data["product_details"]), ProductDetail.objects.filter(product=self.product).count()
+        )
+        self.assertFalse(response.context_data["is_product_in_comparison"])
+        self.assertEqual(response.context_data["comparison_count"], 0)
+
+
 class ProductsViewsServiceTest(TestCase):
     """Класс тестов для сервиса истории просмотров продуктов"""
 
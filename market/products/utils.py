@@ -1,26 +1,73 @@
 import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import time
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
 
+from .constants import KEY_FOR_CACHE_PRODUCTS_VERSION
 
-def send_email(receiver: str, message: str) -> None:
+
+_email_connections = {}
+
+
+def get_email_connection():
+    """
+    Возвращает открытое соединение с почтовым сервером, общее для всех писем процесса.
+    Соединение открывается при первом письме и переиспользуется, поэтому подключение, STARTTLS
+    и авторизация не повторяются для каждого письма.
+    """
+    key = (settings.EMAIL_BACKEND, settings.EMAIL_HOST, settings.EMAIL_PORT)
+    connection = _email_connections.get(key)
+    if connection is None:
+        connection = _email_connections[key] = get_connection()
+    connection.open()
+    return connection
+
+
+def close_email_connection() -> None:
+    """Закрывает соединения с почтовым сервером, например после обрыва, следующее письмо откроет новое"""
+    while _email_connections:
+        _, connection = _email_connections.popitem()
+        try:
+            connection.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+def send_email(receiver: str, message: str, subject: str = "Импорт продуктов") -> None:
     """
-    Отправляет пользователю receiver письмо с сообщением message
+    Отправляет пользователю receiver письмо с сообщением message через общее соединение процесса
     :param receiver: Email пользователя
     :param message: Сообщение
+    :param subject: Тема письма
+    """
+    EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [receiver], connection=get_email_connection()).send()
+
+
+def get_cache_version(key: str) -> int:
     """
-    with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT) as server:
-        server.starttls()
-        server.login(settings.DEFAULT_FROM_EMAIL, settings.EMAIL_HOST_PASSWORD)
+    Возвращает текущую версию кэша по ключу версии.
+    Начальное значение берётся из времени, чтобы после вытеснения ключа не подхватить старые данные.
+    :param key: ключ версии
+    :return: версия кэша
+    """
+    return cache.get_or_set(key, int(time.time()), timeout=None)
+
+
+def bump_cache_version(key: str) -> None:
+    """Увеличивает версию кэша по ключу версии, делая недействительными все записи с прежней версией"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time()), timeout=None)
+
 
-        email = MIMEMultipart()
-        email["Subject"] = "Импорт продуктов"
-        email["From"] = settings.DEFAULT_FROM_EMAIL
-        email["To"] = receiver
+def get_products_cache_version() -> int:
+    """Возвращает текущую версию кэша каталога продуктов"""
+    return get_cache_version(KEY_FOR_CACHE_PRODUCTS_VERSION)
 
-        text = MIMEText(message)
-        email.attach(text)
 
-        server.sendmail(settings.DEFAULT_FROM_EMAIL, receiver, email.as_string())
+def bump_products_cache_version() -> None:
+    """Увеличивает версию кэша каталога продуктов, делая недействительными все закэшированные страницы"""
+    bump_cache_version(KEY_FOR_CACHE_PRODUCTS_VERSION)
@@ -1,12 +1,13 @@
-from typing import Any, Dict, Type
+from typing import Any, Dict, List, Tuple, Type
 
 from django.db import ProgrammingError
-from django.db.models import Avg, Subquery, OuterRef, CharField, Value, Count
-from django.db.models.functions import Round, Concat
+from django.db.models import Case, CharField, F, QuerySet, Value, When
+from django.db.models.functions import Concat
 from django.core.cache import cache
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.http import HttpRequest, HttpResponseNotFound, HttpResponse
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpRequest, HttpResponseNotFound, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404  # noqa F401
 from django.views import View
 
@@ -17,8 +18,10 @@ from django_filters.views import FilterView
 from accounts.models import User
 from settings.models import SiteSetting
 from .models import Product, ProductDetail, ProductImage, ProductsViews, ComparisonList
-from .constants import KEY_FOR_CACHE_PRODUCTS
-from .filters import ProductFilter
+from .filters import ProductFilter, parse_detail_values
+from .pagination import KeysetPaginator
+from .services.catalog_services import CatalogCacheService, CachedCatalogPage, CatalogFacetService
+from .services.product_page_services import ProductPageLoader
 from .services.products_views_services import ProductsViewsService
 from .services.reviews_services import ReviewsService
 from .forms import ReviewForm, ProductDetailForm, ProductImageForm
@@ -26,14 +29,14 @@ from .forms import ReviewForm, ProductDetailForm, ProductImageForm
 from shops.models import Offer
 from shops.forms import OfferForm
 from cart.forms import CartAddProductForm
-from cart.services import CartServices
+from cart.services import get_cart
 
 
 def get_products_list_cache_time() -> int:
     """Lazy-функция для получения времени действия кэша каталога продуктов"""
 
     try:
-        timeout = SiteSetting.objects.first().product_list_cache_time
+        timeout = SiteSetting.load().product_list_cache_time
     except (AttributeError, SiteSetting.DoesNotExist, ProgrammingError):
         timeout = settings.PRODUCT_LIST_CACHE_TIME
     return timeout
@@ -46,44 +49,99 @@ class ProductListView(FilterView):
     context_object_name = "products"
     paginate_by = settings.PAGINATE_PRODUCTS_BY
     filterset_class = ProductFilter
+    cursor_kwarg = "cursor"
 
     def get_queryset(self):
-        queryset = cache.get(KEY_FOR_CACHE_PRODUCTS)
-        if queryset is not None:
-            return queryset
-        images = ProductImage.objects.filter(product=OuterRef("pk")).order_by("sort_image")
         queryset = (
-            Product.objects.annotate(reviews_count=Count("reviews"))
-            .annotate(avg_price=Round(Avg("offers__price"), 2))
-            .annotate(
-                image=Concat(
-                    Value(settings.MEDIA_URL),
-                    Subquery(images.values("image")[:1]),
+            Product.objects.annotate(
+                reviews_count=F("summary__reviews_count"),
+                avg_price=F("summary__avg_price"),
+                discounted_price=F("summary__discounted_price"),
+                image=Case(
+                    When(summary__image__isnull=False, then=Concat(Value(settings.MEDIA_URL), F("summary__image"))),
+                    default=Value(None),
                     output_field=CharField(),
                 ),
             )
+            .select_related("category")
             .order_by("date_of_publication")
         )
-        cache.set(KEY_FOR_CACHE_PRODUCTS, queryset)
         return queryset
 
+    def get_catalog_cache(self) -> CatalogCacheService:
+        """Возвращает сервис кэша каталога для текущего запроса"""
+
+        if not hasattr(self, "_catalog_cache"):
+            self._catalog_cache = CatalogCacheService(self.request, self.page_kwarg)
+        return self._catalog_cache
+
+    def get_keyset_ordering(self) -> str:
+        """Возвращает поле сортировки каталога для keyset-пагинации"""
+
+        ordering = self.filterset.form.cleaned_data.get("o") if self.filterset.is_valid() else None
+        if not ordering:
+            return "date_of_publication"
+        return self.filterset.filters["o"].get_ordering_value(ordering[0])
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Пагинация с кэшированием строк показываемой страницы каталога.
+        При наличии параметра cursor используется keyset-пагинация без COUNT(*) и OFFSET, только вперёд.
+        Результаты поиска q упорядочены по релевантности, которую нельзя выразить ключом курсора,
+        поэтому при поиске курсор игнорируется и используется обычная пагинация.
+        """
+
+        if self.cursor_kwarg in self.request.GET and not self.request.GET.get("q"):
+            paginator = KeysetPaginator(queryset, page_size, self.get_keyset_ordering())
+            try:
+                page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+            except InvalidPage as e:
+                raise Http404(str(e))
+            return paginator, page, page.object_list, page.has_other_pages()
+
+        catalog_cache = self.get_catalog_cache()
+        cached = catalog_cache.get()
+        if cached is None:
+            paginator, page, products, _ = super().paginate_queryset(queryset, page_size)
+            rows = catalog_cache.set(products, paginator.count, page.number, get_products_list_cache_time())
+            cached = rows, paginator.count, page.number
+
+        rows, count, number = cached
+        paginator = self.get_paginator(CachedCatalogPage(rows, count), page_size)
+        page = paginator.page(number)
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
         context["query"] = dict()
         context["cart_form"] = CartAddProductForm(initial={"quantity": 1, "update": False})
         for k, v in context["filter"].data.items():
-            if k != "page":
+            if k not in (self.page_kwarg, self.cursor_kwarg):
                 context["query"][k] = v
+        query = self.request.GET.copy()
+        query.pop(self.page_kwarg, None)
+        query.pop(self.cursor_kwarg, None)
+        context["query_string"] = query.urlencode()
+        context["facets"] = self.get_facets()
 
         return context
 
+    def get_facets(self) -> list:
+        """Возвращает фасеты характеристик для текущей выборки каталога"""
+
+        data = self.request.GET.copy()
+        data.pop("detail", None)
+        queryset = self.filterset_class(data, queryset=self.get_queryset(), request=self.request).qs
+        facet_service = CatalogFacetService(queryset, parse_detail_values(self.request.GET.getlist("detail")))
+        return self.get_catalog_cache().get_or_set_facets(facet_service.get_facets, get_products_list_cache_time())
+
     def post(self, request: HttpRequest, **kwargs):
         cart_form = CartAddProductForm(request.POST)
         if cart_form.is_valid():
             product_name = request.POST["product_name"]
             product = Product.objects.get(name=product_name)
             quantity = cart_form.cleaned_data["quantity"]
-            cart_services = CartServices(request)
+            cart_services = get_cart(request)
             cart_services.add(
                 product=product,
                 shop=None,
@@ -119,6 +177,19 @@ class BaseComparisonView(View):
         count = user_comparison_list.products.count()
         return count if count < limit else False
 
+    def get_comparison_state(
+        self, request: HttpRequest, product_id: int, limit=3
+    ) -> Tuple["ComparisonList", bool, int | bool]:
+        """
+        Функция для получения списка сравнения, признака наличия продукта в нём и количества продуктов
+        одним запросом к продуктам списка
+        """
+
+        comparison_list = self.get_comparison_list(request)
+        product_ids = set(comparison_list.products.values_list("id", flat=True))
+        count = len(product_ids)
+        return comparison_list, product_id in product_ids, count if count < limit else False
+
     def is_product_in_comparison(self, user: "User", product_id: int) -> int:
         """Функция для проверки наличия продукта в списке сравнения"""
 
@@ -157,7 +228,7 @@ class ComparisonListView(ListView, BaseComparisonView):
             product_name = request.POST["product_name"]
             product = Product.objects.get(name=product_name)
             quantity = cart_form.cleaned_data["quantity"]
-            cart_services = CartServices(request)
+            cart_services = get_cart(request)
             cart_services.add(
                 product=product,
                 shop=None,
@@ -180,6 +251,8 @@ class ProductDetailView(DetailView, BaseComparisonView):
     model = Product
     template_name = "products/product-details.jinja2"
     context_object_name = "product"
+    loader = None
+    product_details = None
 
     @staticmethod
     def get_cache_key(product_id: int) -> str:
@@ -197,38 +270,55 @@ class ProductDetailView(DetailView, BaseComparisonView):
         """Lazy-функция для получения времени действия кэша характеристик продукта"""
 
         try:
-            timeout = SiteSetting.objects.first().product_cache_time
+            timeout = SiteSetting.load().product_cache_time
         except (AttributeError, SiteSetting.DoesNotExist, ProgrammingError):
             timeout = settings.CACHE_TIME_DETAIL_PRODUCT_PAGE / 86400
         return timeout
 
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        self.product_details = cache.get(self.get_cache_key(kwargs[self.pk_url_kwarg]))
+        self.loader = ProductPageLoader(with_details=self.product_details is None)
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self) -> QuerySet[Product]:
+        """Для страницы товара связи загружаются загрузчиком страницы, POST-запросам нужен только товар"""
+
+        if self.loader is not None:
+            return self.loader.get_queryset()
+        return super().get_queryset()
+
+    def get_product_details(self) -> List[ProductDetail]:
+        """Функция для получения характеристик продукта из кэша или из загруженного товара"""
+
+        if self.product_details is None:
+            self.product_details = list(self.object.productdetail_set.all())
+            cache.set(self.get_cache_key(self.object.pk), self.product_details, self.get_product_cache_time() * 86400)
+        return self.product_details
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cache_key = self.get_cache_key(self.object.pk)
-        context["product_details"] = cache.get_or_set(
-            cache_key,
-            ProductDetail.objects.filter(product=self.object),
-            self.get_product_cache_time() * 86400,
-        )
+        context["product_details"] = self.get_product_details()
 
-        review_service = ReviewsService(self.request, self.get_object())
-        views_service = ProductsViewsService(self.get_object(), self.request.user)
+        review_service = ReviewsService(self.request, self.object)
+        views_service = ProductsViewsService(self.object, self.request.user)
 
-        comparison_list = self.get_comparison_list(self.request)
+        comparison_list, is_product_in_comparison, comparison_count = self.get_comparison_state(
+            self.request, self.object.pk
+        )
 
         context["reviews"], context["next_page"], context["has_next"] = review_service.get_reviews_for_product()
         context["review_form"] = ReviewForm()
         context["cart_form"] = CartAddProductForm(initial={"quantity": 1, "update": False})
-        context["reviews_count"] = review_service.get_reviews_count()
+        context["reviews_count"] = self.object.summary.reviews_count
         context["product_details_form"] = ProductDetailForm()
-        context["images"] = ProductImage.objects.filter(product=self.object)
+        context["images"] = self.object.product_images.all()
         context["images_form"] = ProductImageForm()
-        context["offers"] = Offer.objects.filter(product=self.object)
+        context["offers"] = self.object.offers.all()
         context["offers_form"] = OfferForm()
         context["products_views"] = views_service.get_views()
         context["comparison_list"] = comparison_list
-        context["is_product_in_comparison"] = self.is_product_in_comparison(self.request.user, self.object.pk)
-        context["comparison_count"] = self.get_comparison_count(self.request)
+        context["is_product_in_comparison"] = is_product_in_comparison
+        context["comparison_count"] = comparison_count
 
         if self.request.user.is_authenticated:
             views_service.add_product_view()
@@ -266,7 +356,7 @@ class ProductDetailView(DetailView, BaseComparisonView):
         if cart_form.is_valid():
             shop_name = request.POST["shop_name"]
             quantity = cart_form.cleaned_data["quantity"]
-            cart_services = CartServices(request)
+            cart_services = get_cart(request)
             cart_services.add(
                 product=self.get_object(),
                 shop=shop_name,
@@ -0,0 +1,22 @@
+from typing import Callable
+
+from django.http import HttpRequest, HttpResponse
+
+from settings.singleton_model import request_versions
+
+
+class SingletonVersionMiddleware:
+    """
+    Запоминает версии записей SingletonModel на время запроса, чтобы многократные вызовы load()
+    в представлениях, шаблонах и контекстных процессорах читали версию из общего кэша только один раз
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        token = request_versions.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            request_versions.reset(token)
@@ -1,17 +1,89 @@
+import time
+from collections import namedtuple
+from contextvars import ContextVar
+from typing import Optional
+
+from django.core.cache import cache
 from django.db import models
 
+_snapshots = {}
+request_versions: ContextVar[Optional[dict]] = ContextVar("singletonrequest_versions", default=None)
+
 
 class SingletonModel(models.Model):
+    """
+    Модель с единственной записью.
+    load() возвращает неизменяемый снимок записи, закэшированный в памяти процесса.
+    Снимок перечитывается из базы, когда меняется версия в общем кэше (Redis), а версия
+    увеличивается при каждом сохранении или удалении записи в любом процессе.
+    Внутри запроса версия читается из общего кэша один раз (см. SingletonVersionMiddleware),
+    поэтому изменение записи в другом процессе становится видно со следующего запроса.
+    """
+
     class Meta:
         abstract = True
 
     def save(self, *args, **kwargs):
         self.__class__.objects.exclude(id=self.id).delete()
         super(SingletonModel, self).save(*args, **kwargs)
+        self.__class__.bump_version()
+
+    def delete(self, *args, **kwargs):
+        result = super(SingletonModel, self).delete(*args, **kwargs)
+        self.__class__.bump_version()
+        return result
 
     @classmethod
-    def load(cls):
+    def get_version_key(cls) -> str:
+        """Функция для получения ключа кэша версии записи"""
+
+        return f"{cls._meta.label_lower}_version"
+
+    @classmethod
+    def get_version(cls) -> int:
+        """Функция для получения текущей версии записи, в запросе - запомненной при первом обращении"""
+
+        versions = request_versions.get()
+        if versions is None:
+            return cache.get_or_set(cls.get_version_key(), time.time_ns, timeout=None)
+        if cls not in versions:
+            versions[cls] = cache.get_or_set(cls.get_version_key(), time.time_ns, timeout=None)
+        return versions[cls]
+
+    @classmethod
+    def bump_version(cls) -> None:
+        """Функция для увеличения версии записи, снимки во всех процессах будут перечитаны"""
+
         try:
-            return cls.objects.get()
-        except cls.DoesNotExist:
-            return cls()
+            cache.incr(cls.get_version_key())
+        except ValueError:
+            cache.set(cls.get_version_key(), time.time_ns(), timeout=None)
+        versions = request_versions.get()
+        if versions is not None:
+            versions.pop(cls, None)
+
+    @classmethod
+    def make_snapshot(cls, instance: "SingletonModel") -> tuple:
+        """Функция для создания неизменяемого снимка записи"""
+
+        fields = [field.attname for field in cls._meta.concrete_fields]
+        snapshot_class = namedtuple(f"{cls.__name__}Snapshot", fields)
+        return snapshot_class(*(getattr(instance, field) for field in fields))
+
+    @classmethod
+    def load(cls) -> tuple:
+        """
+        Возвращает снимок записи, при отсутствии записи - снимок значений по умолчанию
+        :return: неизменяемый снимок с полями модели
+        """
+
+        version = cls.get_version()
+        snapshot = _snapshots.get(cls)
+        if snapshot is None or snapshot[0] != version:
+            try:
+                instance = cls.objects.get()
+            except cls.DoesNotExist:
+                instance = cls()
+            snapshot = (version, cls.make_snapshot(instance))
+            _snapshots[cls] = snapshot
+        return snapshot[1]
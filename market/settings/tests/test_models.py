@@ -1,5 +1,10 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from settings.middleware import SingletonVersionMiddleware
 from settings.models import SiteSetting
 
 
@@ -46,3 +51,44 @@ class SiteSettingModelTests(TestCase):
             self.site_setting.banners_count = 4
             self.site_setting.full_clean()
             self.site_setting.save()
+
+    def test_load_snapshot_cached(self):
+        snapshot = SiteSetting.load()
+        self.assertEqual(snapshot.banners_count, 2)
+        with self.assertNumQueries(0):
+            self.assertIs(SiteSetting.load(), snapshot)
+
+    def test_load_snapshot_refreshed_on_save(self):
+        SiteSetting.load()
+        self.site_setting.banners_count = 3
+        self.site_setting.save()
+        self.assertEqual(SiteSetting.load().banners_count, 3)
+
+    def test_load_snapshot_refreshed_on_version_change(self):
+        SiteSetting.load()
+        SiteSetting.objects.update(top_items_count=7)
+        self.assertEqual(SiteSetting.load().top_items_count, 5)
+        cache.delete(SiteSetting.get_version_key())
+        self.assertEqual(SiteSetting.load().top_items_count, 7)
+
+    def test_load_reads_version_once_per_request(self):
+        def view(request):
+            SiteSetting.objects.update(top_items_count=7)
+            cache.delete(SiteSetting.get_version_key())
+            return HttpResponse(",".join(str(SiteSetting.load().top_items_count) for _ in range(3)))
+
+        SiteSetting.load()
+        with mock.patch.object(cache, "get_or_set", wraps=cache.get_or_set) as get_or_set:
+            response = SingletonVersionMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(response.content, b"7,7,7")
+        get_or_set.assert_called_once()
+
+    def test_load_refreshed_on_save_within_request(self):
+        def view(request):
+            SiteSetting.load()
+            self.site_setting.banners_count = 3
+            self.site_setting.save()
+            return HttpResponse(SiteSetting.load().banners_count)
+
+        response = SingletonVersionMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(response.content, b"3")
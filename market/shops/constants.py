@@ -0,0 +1,5 @@
+KEY_FOR_CACHE_BANNERS_VERSION = "index_banners_version"
+KEY_FOR_CACHE_OFFERS_VERSION = "index_offers_version"
+KEY_FOR_CACHE_DISCOUNT_PRODUCTS_VERSION = "index_discount_products_version"
+KEY_FOR_CACHE_INDEX_OFFERS = "index_offers"
+KEY_FOR_CACHE_SAMPLE_IDS = "sample_ids"
@@ -2,10 +2,10 @@ from typing import Dict
 
 from django.http import HttpRequest
 
-from products.models import Category
+from products.services.categories_services import CategoryTreeService
 
 
 def categories_obj(request: HttpRequest) -> Dict:
     "Возвращает данные для отображения в базовом шаблоне категории"
 
-    return {"categories": Category.objects.all()}
+    return {"categories": CategoryTreeService().get_tree()}
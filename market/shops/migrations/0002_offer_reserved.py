@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shops", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="offer",
+            name="reserved",
+            field=models.PositiveIntegerField(default=0, verbose_name="зарезервировано"),
+        ),
+    ]
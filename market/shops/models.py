@@ -1,9 +1,31 @@
 from django.db import models
+from django.db.models import signals
 from django.utils.translation import gettext_lazy as _
 
+from products.utils import bump_cache_version
+from .constants import (
+    KEY_FOR_CACHE_BANNERS_VERSION,
+    KEY_FOR_CACHE_DISCOUNT_PRODUCTS_VERSION,
+    KEY_FOR_CACHE_OFFERS_VERSION,
+)
 from .utils import shop_preivew_directory_path
 
 
+def bump_banners_version(**kwargs) -> None:
+    """Сброс кэша блока баннеров главной страницы"""
+    bump_cache_version(KEY_FOR_CACHE_BANNERS_VERSION)
+
+
+def bump_offers_version(**kwargs) -> None:
+    """Сброс кэша блоков с предложениями магазинов на главной странице"""
+    bump_cache_version(KEY_FOR_CACHE_OFFERS_VERSION)
+
+
+def bump_discount_products_version(**kwargs) -> None:
+    """Сброс кэша блока предложения дня на главной странице"""
+    bump_cache_version(KEY_FOR_CACHE_DISCOUNT_PRODUCTS_VERSION)
+
+
 class Shop(models.Model):
     """Магазин"""
 
@@ -40,6 +62,7 @@ class Offer(models.Model):
     product = models.ForeignKey("products.Product", on_delete=models.CASCADE, related_name="offers")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("цена"))
     remains = models.IntegerField(default=0, verbose_name=_("остатки"))
+    reserved = models.PositiveIntegerField(default=0, verbose_name=_("зарезервировано"))
 
     class Meta:
         constraints = [models.UniqueConstraint("shop", "product", name="unique_product_in_shop")]
@@ -48,3 +71,12 @@ class Offer(models.Model):
 
     def __str__(self):
         return f"Offer(pk={self.pk}, shop={self.shop.name})"
+
+
+signals.post_save.connect(receiver=bump_offers_version, sender=Offer)
+signals.post_delete.connect(receiver=bump_offers_version, sender=Offer)
+signals.post_save.connect(receiver=bump_banners_version, sender="products.Banner")
+signals.post_delete.connect(receiver=bump_banners_version, sender="products.Banner")
+signals.post_save.connect(receiver=bump_discount_products_version, sender="discounts.DiscountProduct")
+signals.post_delete.connect(receiver=bump_discount_products_version, sender="discounts.DiscountProduct")
+signals.m2m_changed.connect(receiver=bump_discount_products_version, sender="discounts.DiscountProduct_products")
@@ -0,0 +1,196 @@
+import bisect
+import hashlib
+import itertools
+import random
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Model, QuerySet
+
+from discounts.models import DiscountProduct
+from products.models import Banner
+from products.utils import get_cache_version
+from .constants import (
+    KEY_FOR_CACHE_BANNERS_VERSION,
+    KEY_FOR_CACHE_DISCOUNT_PRODUCTS_VERSION,
+    KEY_FOR_CACHE_INDEX_OFFERS,
+    KEY_FOR_CACHE_OFFERS_VERSION,
+    KEY_FOR_CACHE_SAMPLE_IDS,
+)
+from .models import Offer
+
+ProductCard = namedtuple("ProductCard", ("pk", "name", "image", "min_price", "category"))
+OfferCard = namedtuple("OfferCard", ("pk", "product"))
+
+
+class RandomSampleService:
+    """
+    Выбор случайных объектов по закэшированному массиву id без выборки всех строк.
+    Массив id (и накопленных весов) хранится в кэше под версией модели и хэшем условий выборки
+    и перечитывается после изменения модели. Условия выборки не должны зависеть от текущего времени,
+    иначе ключ кэша будет меняться при каждом вызове.
+
+    Args:
+        queryset (QuerySet): выборка объектов, из которых делается выбор
+        version_key (str): ключ версии кэша, увеличиваемой при сохранении и удалении объектов
+        weight_field (str): поле веса объекта, если выбор должен быть взвешенным
+    """
+
+    def __init__(self, queryset: QuerySet, version_key: str, weight_field: Optional[str] = None) -> None:
+        self.queryset = queryset
+        self.version_key = version_key
+        self.weight_field = weight_field
+
+    def get_query_digest(self) -> str:
+        """Функция для получения хэша условий выборки и поля веса, чтобы разные выборки одной модели не смешивались"""
+
+        try:
+            query = str(self.queryset.query)
+        except EmptyResultSet:
+            query = "empty"
+        return hashlib.md5(f"{query}:{self.weight_field}".encode("utf-8")).hexdigest()
+
+    def get_cache_key(self) -> str:
+        """Функция для получения ключа кэша массива id"""
+
+        label = self.queryset.model._meta.label_lower
+        return f"{KEY_FOR_CACHE_SAMPLE_IDS}:{label}:{self.get_query_digest()}:{get_cache_version(self.version_key)}"
+
+    def build_population(self) -> Tuple[List[int], Optional[List[int]]]:
+        """
+        Читает id объектов и накопленные веса
+        :return: список id и список накопленных весов или None для равновероятного выбора
+        """
+
+        if self.weight_field is None:
+            return list(self.queryset.order_by("pk").values_list("pk", flat=True)), None
+        rows = self.queryset.filter(**{f"{self.weight_field}__gt": 0}).order_by("pk")
+        ids, weights = [], []
+        for pk, weight in rows.values_list("pk", self.weight_field):
+            ids.append(pk)
+            weights.append(weight)
+        return ids, list(itertools.accumulate(weights))
+
+    def get_population(self) -> Tuple[List[int], Optional[List[int]]]:
+        """Возвращает закэшированные id объектов и накопленные веса"""
+
+        return cache.get_or_set(self.get_cache_key(), self.build_population, timeout=None)
+
+    def sample_ids(self, k: int, unique: bool = False) -> List[int]:
+        """
+        Выбирает k случайных id
+        :param k: количество id
+        :param unique: не повторять id в пределах выборки, если объектов меньше k - вернуть все
+        :return: список id
+        """
+
+        ids, cum_weights = self.get_population()
+        if not ids or k <= 0:
+            return []
+        if not unique:
+            return random.choices(ids, cum_weights=cum_weights, k=k)
+        if k >= len(ids):
+            return random.sample(ids, len(ids))
+        if cum_weights is None:
+            return random.sample(ids, k)
+
+        chosen, seen = [], set()
+        for _ in range(k * 10):
+            index = bisect.bisect_right(cum_weights, random.random() * cum_weights[-1])
+            if ids[index] not in seen:
+                seen.add(ids[index])
+                chosen.append(ids[index])
+                if len(chosen) == k:
+                    return chosen
+        rest = [pk for pk in ids if pk not in seen]
+        return chosen + random.sample(rest, k - len(chosen))
+
+    def sample(self, k: int, unique: bool = False) -> List[Model]:
+        """
+        Выбирает k случайных объектов одним запросом по выбранным id
+        :param k: количество объектов
+        :param unique: не повторять объекты в пределах выборки
+        :return: список объектов в порядке выбора
+        """
+
+        ids = self.sample_ids(k, unique)
+        objects = self.queryset.in_bulk(set(ids))
+        return [objects[pk] for pk in ids if pk in objects]
+
+
+class IndexPageService:
+    """Сервис данных блоков главной страницы с версионированным кэшем"""
+
+    @staticmethod
+    def get_versions() -> Dict[str, int]:
+        """
+        Возвращает версии данных, от которых зависят блоки главной страницы
+        :return: словарь с версиями баннеров, предложений магазинов и скидок на товары
+        """
+
+        return {
+            "banners_version": get_cache_version(KEY_FOR_CACHE_BANNERS_VERSION),
+            "offers_version": get_cache_version(KEY_FOR_CACHE_OFFERS_VERSION),
+            "discount_products_version": get_cache_version(KEY_FOR_CACHE_DISCOUNT_PRODUCTS_VERSION),
+        }
+
+    @staticmethod
+    def get_banners(count: int) -> List[Banner]:
+        """
+        Возвращает случайные неповторяющиеся активные баннеры с учётом веса показа
+        :param count: количество баннеров
+        :return: список баннеров
+        """
+
+        banners = Banner.objects.filter(is_active=True).select_related("product")
+        return RandomSampleService(banners, KEY_FOR_CACHE_BANNERS_VERSION, weight_field="weight").sample(
+            count, unique=True
+        )
+
+    @staticmethod
+    def get_discount_product() -> Optional[DiscountProduct]:
+        """Возвращает случайную скидку на товар для блока предложения дня"""
+
+        discount_products = RandomSampleService(
+            DiscountProduct.objects.all(), KEY_FOR_CACHE_DISCOUNT_PRODUCTS_VERSION
+        ).sample(1)
+        return discount_products[0] if discount_products else None
+
+    @staticmethod
+    def build_offer_cards(count: int) -> List[OfferCard]:
+        """
+        Собирает карточки предложений с малым остатком одним запросом
+        :param count: количество карточек
+        :return: список карточек
+        """
+
+        offers = Offer.objects.filter(remains__lte=50).select_related("product__category", "product__summary")
+        return [
+            OfferCard(
+                offer.pk,
+                ProductCard(
+                    offer.product_id,
+                    offer.product.name,
+                    f"{settings.MEDIA_URL}{offer.product.summary.image}" if offer.product.summary.image else None,
+                    offer.product.summary.min_price,
+                    offer.product.category.name if offer.product.category_id else "",
+                ),
+            )
+            for offer in offers[:count]
+        ]
+
+    def get_offer_cards(self, count: int, timeout: int) -> List[OfferCard]:
+        """
+        Возвращает закэшированные карточки предложений для блоков популярных товаров и ограниченного тиража.
+        Карточки кэшируются данными, а не разметкой, так как содержат форму корзины с CSRF-токеном.
+        :param count: количество карточек
+        :param timeout: время действия кэша
+        :return: список карточек
+        """
+
+        version = get_cache_version(KEY_FOR_CACHE_OFFERS_VERSION)
+        key = f"{KEY_FOR_CACHE_INDEX_OFFERS}:{version}:{count}"
+        return cache.get_or_set(key, lambda: self.build_offer_cards(count), timeout)
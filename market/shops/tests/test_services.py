@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from products.models import Banner
+from shops.constants import KEY_FOR_CACHE_BANNERS_VERSION
+from shops.services import RandomSampleService
+
+
+class RandomSampleServiceTest(TestCase):
+    """Класс тестов сервиса случайного выбора по закэшированному массиву id"""
+
+    fixtures = [
+        "fixtures/05-categories.json",
+        "fixtures/06-products.json",
+        "fixtures/15-banners.json",
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.service = RandomSampleService(
+            Banner.objects.filter(is_active=True), KEY_FOR_CACHE_BANNERS_VERSION, weight_field="weight"
+        )
+
+    def test_sample_without_queries_after_first_call(self):
+        """Проверка, что выбор id берётся из кэша без запросов к базе"""
+
+        self.service.sample_ids(2)
+        with self.assertNumQueries(0):
+            ids = self.service.sample_ids(5)
+        self.assertEqual(len(ids), 5)
+        self.assertTrue(set(ids) <= set(Banner.objects.filter(is_active=True).values_list("pk", flat=True)))
+
+    def test_sample_unique(self):
+        """Проверка выбора без повторов"""
+
+        count = Banner.objects.filter(is_active=True).count()
+        for k in (1, count, count + 2):
+            with self.subTest(k=k):
+                ids = self.service.sample_ids(k, unique=True)
+                self.assertEqual(len(ids), min(k, count))
+                self.assertEqual(len(set(ids)), len(ids))
+
+    def test_sample_weighted(self):
+        """Проверка, что объекты с нулевым весом не выбираются, а массив id обновляется при сохранении"""
+
+        banner = Banner.objects.filter(is_active=True).first()
+        Banner.objects.exclude(pk=banner.pk).update(weight=0)
+        banner.save()
+        self.assertEqual(set(self.service.sample_ids(10)), {banner.pk})
+        self.assertEqual([item.pk for item in self.service.sample(2, unique=True)], [banner.pk])
+
+    def test_different_querysets_do_not_share_cache(self):
+        """Проверка, что выборки одной модели с разными условиями и полем веса кэшируются раздельно"""
+
+        banner = Banner.objects.filter(is_active=True).first()
+        single = RandomSampleService(Banner.objects.filter(pk=banner.pk), KEY_FOR_CACHE_BANNERS_VERSION)
+        self.service.sample_ids(1)
+        self.assertEqual(set(single.sample_ids(10)), {banner.pk})
+        unweighted = RandomSampleService(Banner.objects.filter(is_active=True), KEY_FOR_CACHE_BANNERS_VERSION)
+        self.assertNotEqual(unweighted.get_cache_key(), self.service.get_cache_key())
+        self.assertIsNone(unweighted.get_population()[1])
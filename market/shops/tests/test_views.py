@@ -1,8 +1,12 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from shops.models import Shop
-from products.models import Banner
+from shops.models import Shop, Offer
+from products.models import Banner, ProductSummary
+from shops.services import IndexPageService
 
 
 class ShopDetailViewTest(TestCase):
@@ -54,3 +58,66 @@ class BannerInIndexPageViewTest(TestCase):
 
         for _ in range(3):
             self.assertContains(response, "Slider-item")
+
+
+class IndexPageCacheTest(TestCase):
+    """Класс тестов кэширования блоков главной страницы"""
+
+    fixtures = [
+        "fixtures/04-shops.json",
+        "fixtures/05-categories.json",
+        "fixtures/06-products.json",
+        "fixtures/08-offers.json",
+        "fixtures/11-product-images.json",
+        "fixtures/15-banners.json",
+        "fixtures/21-discount-products.json",
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def get_index_queries(self) -> str:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("shops:home"))
+        self.assertEqual(response.status_code, 200)
+        return " ".join(query["sql"] for query in queries)
+
+    def test_index_blocks_cached(self):
+        """Проверка, что повторный запрос главной страницы не обращается к баннерам, скидкам и предложениям"""
+
+        self.get_index_queries()
+        sql = self.get_index_queries()
+        for table in ("products_banner", "discounts_discountproduct", "shops_offer"):
+            with self.subTest(table=table):
+                self.assertNotIn(table, sql)
+
+    def test_index_blocks_invalidated(self):
+        """Проверка сброса кэша блоков при изменении баннера и предложения"""
+
+        self.get_index_queries()
+        Banner.objects.first().save()
+        self.assertIn("products_banner", self.get_index_queries())
+
+        offer = Offer.objects.filter(remains__lte=50).first()
+        offer.price += 1
+        offer.save()
+        sql = self.get_index_queries()
+        self.assertIn("shops_offer", sql)
+        self.assertIn("products_banner", sql)
+
+    def test_index_blocks_cached_per_language(self):
+        """Проверка, что закэшированные блоки не отдают ссылки на другом языке"""
+
+        self.assertContains(self.client.get("/ru/"), 'href="/ru/products/')
+        response = self.client.get("/en/")
+        self.assertContains(response, 'href="/en/products/')
+        self.assertNotContains(response, 'href="/ru/')
+
+    def test_offer_card_without_image(self):
+        """Проверка, что у карточки товара без изображения нет пустого изображения"""
+
+        offer = Offer.objects.filter(remains__lte=50).select_related("product__summary").first()
+        ProductSummary.objects.filter(product=offer.product_id).update(image=None)
+        card = next(card for card in IndexPageService.build_offer_cards(100) if card.pk == offer.pk)
+        self.assertIsNone(card.product.image)
+        self.assertNotContains(self.client.get(reverse("shops:home")), "None")
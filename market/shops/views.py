@@ -2,24 +2,23 @@ from django.db import ProgrammingError
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render, redirect  # noqa F401
 from django.conf import settings
-
+from django.utils.translation import get_language
 from django.views.generic import TemplateView, View
 
 from cart.forms import CartAddProductForm
-from cart.services import CartServices
-from discounts.models import DiscountProduct
+from cart.services import get_cart
 from .models import Shop, Offer
+from .services import IndexPageService
 from settings.models import SiteSetting
 
-import random
-from products.models import Banner, Product, Category
+from products.models import Product
 
 
 def get_products_list_cache_time() -> int:
     """Lazy-функция для получения времени действия кэша каталога продуктов"""
 
     try:
-        timeout = SiteSetting.objects.first().product_list_cache_time
+        timeout = SiteSetting.load().product_list_cache_time
     except (AttributeError, SiteSetting.DoesNotExist, ProgrammingError):
         timeout = settings.PRODUCT_LIST_CACHE_TIME
     return timeout
@@ -31,18 +30,28 @@ class IndexPageView(TemplateView):
     template_name = "shops/index.jinja2"
 
     def get_context_data(self, **kwargs):
-        """Добавление баннеров и времени кэша в контекст шаблона"""
+        """
+        Добавление блоков и времени кэша в контекст шаблона.
+        Баннеры и предложение дня передаются функциями и вычисляются только при промахе кэша фрагмента.
+        Фрагменты кэшируются для каждого языка отдельно, так как содержат ссылки с префиксом языка и переводы.
+        """
 
         context = super().get_context_data(**kwargs)
-        context["discount_product"] = random.choice(DiscountProduct.objects.all())
-        context["filtered_offers"] = Offer.objects.filter(remains__lte=50)
+        index_service = IndexPageService()
+        banners_count = self.get_banners_count()
+        context["get_banners"] = lambda: index_service.get_banners(banners_count)
+        context["get_discount_product"] = index_service.get_discount_product
         context["cart_form"] = CartAddProductForm(initial={"quantity": 1, "update": False})
-        context["categories"] = Category.objects.all()
-        context["banners"] = random.choices(Banner.objects.filter(is_active=True), k=self.get_banners_count())
         context["banner_cache_time"] = self.get_banner_cache_time()
+        context["offers_cache_time"] = get_products_list_cache_time()
         context["show_days_offer"] = self.get_show_days_offer()
         context["top_items_count"] = self.get_top_items_count()
         context["limited_edition_count"] = self.get_limited_edition_count()
+        context["filtered_offers"] = index_service.get_offer_cards(
+            max(context["top_items_count"], context["limited_edition_count"]), context["offers_cache_time"]
+        )
+        context.update(index_service.get_versions())
+        context["language"] = get_language()
         return context
 
     def post(self, request: HttpRequest, **kwargs):
@@ -58,7 +67,7 @@ class IndexPageView(TemplateView):
                 else:
                     shop = None
             quantity = cart_form.cleaned_data["quantity"]
-            cart_services = CartServices(request)
+            cart_services = get_cart(request)
             cart_services.add(
                 product=product,
                 shop=shop,
@@ -71,7 +80,7 @@ class IndexPageView(TemplateView):
         """Lazy-функция для получения времени действия кэша баннеров"""
 
         try:
-            timeout = SiteSetting.objects.first().banner_cache_time
+            timeout = SiteSetting.load().banner_cache_time
         except (AttributeError, SiteSetting.DoesNotExist, ProgrammingError):
             timeout = settings.BANNER_CACHE_TIME
         return timeout
@@ -80,7 +89,7 @@ class IndexPageView(TemplateView):
         """Lazy-функция для получения количества баннеров"""
 
         try:
-            count = SiteSetting.objects.first().banners_count
+            count = SiteSetting.load().banners_count
         except (AttributeError, SiteSetting.DoesNotExist, ProgrammingError):
             count = settings.BANNERS_COUNT
         return count
@@ -89,7 +98,7 @@ class IndexPageView(TemplateView):
         """Lazy-функция для получения значения отображения предложения дня"""
 
         try:
-            days_offer = SiteSetting.objects.first().days_offer
+            days_offer = SiteSetting.load().days_offer
         except (AttributeError, SiteSetting.DoesNotExist, ProgrammingError):
             days_offer = settings.DAYS_OFFER
         return days_offer
@@ -98,7 +107,7 @@ class IndexPageView(TemplateView):
         """Lazy-функция для получения количества популярных товаров"""
 
         try:
-            count = SiteSetting.objects.first().top_items_count
+            count = SiteSetting.load().top_items_count
         except (AttributeError, SiteSetting.DoesNotExist, ProgrammingError):
             count = settings.TOP_ITEMS_COUNT
         return count
@@ -107,7 +116,7 @@ class IndexPageView(TemplateView):
         """Lazy-функция для получения количества ограниченных тиражей"""
 
         try:
-            count = SiteSetting.objects.first().limited_edition_count
+            count = SiteSetting.load().limited_edition_count
         except (AttributeError, SiteSetting.DoesNotExist, ProgrammingError):
             count = settings.LIMITED_EDITION_COUNT
         return count